@@ -7,9 +7,14 @@ PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "../../")
 if PROJECT_ROOT not in sys.path:
     sys.path.insert(0, PROJECT_ROOT)
 
+import argparse
 import json
 import re
-from transformers import AutoTokenizer
+from itertools import chain
+
+from src.cache import DEFAULT_CACHE_PATH
+from src.json_stream import cached_length, iter_json_array
+from src.token_count import TokenCounter, TOKENIZE_BATCH
 
 
 # ====【根据你的实际路径修改这里】====
@@ -27,19 +32,21 @@ DEEPSEEK_MODEL = os.path.join(PROJECT_ROOT, "3rdparty", "deepseek_ocr")
 
 
 def step2_read_annotations():
-    with open(ANN_PATH, "r", encoding="utf-8") as f:
-        anns = json.load(f)
-    print("总条目数（总页数）:", len(anns))
-    print("示例 keys:", list(anns[0].keys()))
-    print("示例 image:", anns[0].get("image", None))
-    print("示例 conversations[1]:", anns[0]["conversations"][1])
-    return anns
-
-def step3_count_tokens(anns):
-    print("\n=== 加载 DeepSeek-OCR tokenizer ===")
-    tokenizer = AutoTokenizer.from_pretrained(DEEPSEEK_MODEL)
-    print("词表大小 vocab_size:", tokenizer.vocab_size)
-
+    # 标注逐条流式返回，不把整份 JSON 一次读进内存。
+    # 总数只在 image -> 字节区间 索引（ANN_PATH.idx.npz）已经建好时直接取；
+    # 否则不为了一个数字多扫一遍文件，step3 流式读完时会打印总样本数
+    n_total = cached_length(ANN_PATH)
+    if n_total is not None:
+        print("总条目数（总页数）:", n_total)
+
+    anns = iter_json_array(ANN_PATH)
+    first = next(anns)
+    print("示例 keys:", list(first.keys()))
+    print("示例 image:", first.get("image", None))
+    print("示例 conversations[1]:", first["conversations"][1])
+    return chain([first], anns)
+
+def step3_count_tokens(anns, batch_size=TOKENIZE_BATCH, workers=1, cache=True, cache_path=DEFAULT_CACHE_PATH):
     records = []
     for idx, ann in enumerate(anns):
         img_name = ann["image"]
@@ -48,21 +55,24 @@ def step3_count_tokens(anns):
         # 1) 直接拿原始 GT 文本
         gt_text = ann["conversations"][1]["value"]
 
-        # 2) 不做任何规范化，直接送进 tokenizer
-        enc = tokenizer(gt_text, add_special_tokens=False)
-        n_tok = len(enc.input_ids)
-
-        rec = {
+        records.append({
             "idx": idx,
             "image": img_name,
             "img_path": img_path,
-            "n_tokens": n_tok,
             "gt_text": gt_text,
-        }
-        records.append(rec)
+        })
 
-        if idx < 3:
-            print(f"[样例 {idx}] {img_name}, tokens={n_tok}")
+    # 2) 不做任何规范化，整批送进 tokenizer（按批调用、可多进程）；
+    #    token 数按 (文本哈希, tokenizer 指纹) 缓存，GT 没变时不会再加载 tokenizer
+    with TokenCounter(DEEPSEEK_MODEL, batch_size=batch_size, workers=workers,
+                      cache=cache, cache_path=cache_path) as counter:
+        counts = counter.count_many([r["gt_text"] for r in records])
+        print(f"token 数缓存: 命中 {counter.hits}，新算 {counter.misses}")
+    for rec, n_tok in zip(records, counts):
+        rec["n_tokens"] = n_tok
+
+    for rec in records[:3]:
+        print(f"[样例 {rec['idx']}] {rec['image']}, tokens={rec['n_tokens']}")
 
     print("统计完毕，总样本数:", len(records))
     return records
@@ -111,8 +121,16 @@ def step5_check_bins(selected):
 
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="从 Fox 英文页面里按 GT token 数挑选子集")
+    parser.add_argument("--batch-size", type=int, default=TOKENIZE_BATCH, help="每批送进 tokenizer 的文本条数")
+    parser.add_argument("--workers", type=int, default=1, help="分词进程数（各自加载一份 tokenizer）")
+    parser.add_argument("--token-cache", default=DEFAULT_CACHE_PATH, help="token 数缓存文件（SQLite）")
+    parser.add_argument("--no-token-cache", action="store_true", help="不使用 token 数缓存，全部重新分词")
+    args = parser.parse_args()
+
     anns = step2_read_annotations()
-    records = step3_count_tokens(anns)
+    records = step3_count_tokens(anns, batch_size=args.batch_size, workers=args.workers,
+                                 cache=not args.no_token_cache, cache_path=args.token_cache)
     selected = step4_filter_600_1300(records)
     step5_check_bins(selected)
     save_selected_list(selected)
@@ -0,0 +1,105 @@
+# 跨模式错误对比：把各模式的带类型错误按 (image, gt_index) 哈希连接（src/mode_diff.py），
+# 每个 GT 位置分为 fixed / regressed / persistent / new，并按错误类型输出状态转移矩阵。
+# 默认按清单顺序相邻两两比较（vt64 -> vt100 -> ...），--baseline 时都和基线比。
+import sys
+import os
+# 动态计算项目根目录 (scripts/xx/xx.py -> ../../ -> root)
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "../../"))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+import argparse
+import json
+
+from src.mode_diff import STATUSES, STATES, load_modes, diff_modes, mode_pairs
+from src.manifest import DEFAULT_CONFIGS, resolve_configs, load_manifest
+from src.metrics import CRITICAL_TYPES
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+FOX_DIR = os.path.join(PROJECT_ROOT, "data", "Fox")
+EXP_DIR = os.path.join(FOX_DIR, "exp_fox100")
+
+OUT_PATH = os.path.join(EXP_DIR, "fox100_mode_diff.json")
+
+
+def common_images(modes):
+    """各模式都评测过的页面（来自 stats_{mode}_pages.json）；有模式缺统计文件时返回 None（不过滤）。"""
+    common = None
+    for mode in modes:
+        path = os.path.join(EXP_DIR, f"stats_{mode}_pages.json")
+        if not os.path.exists(path):
+            return None
+        with open(path, "r", encoding="utf-8") as f:
+            images = {p["image"] for p in json.load(f)["pages"]}
+        common = images if common is None else common & images
+    return common
+
+
+def print_diff(d):
+    c = d["counts"]
+    print(f"\n=== {d['from']} -> {d['to']} ===")
+    print("  " + "  ".join(f"{s} {c[s]}" for s in STATUSES))
+    for t, row in d["by_type"].items():
+        mark = "*" if t in CRITICAL_TYPES else " "
+        print(f" {mark}{t:14s} " + "  ".join(f"{row[s]:6d}" for s in STATUSES))
+    print("  关键类型转移矩阵（行 = 前者，列 = 后者）：")
+    print("    " + " " * 14 + "".join(f"{s:>7s}" for s in STATES))
+    for t, matrix in d["transitions"].items():
+        if t not in CRITICAL_TYPES:
+            continue
+        for s_from in STATES:
+            if any(matrix[s_from].values()):
+                label = f"{t}:{s_from}"
+                print(f"    {label:14s}" + "".join(f"{matrix[s_from][s]:7d}" for s in STATES))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="跨模式逐位置错误对比（fixed / regressed / persistent / new）")
+    parser.add_argument("--manifest", default=None, help="配置清单 JSON（默认 vt64 / vt100）")
+    parser.add_argument("--baseline", default=None, help="所有模式都与这个模式比较（默认相邻两两比较）")
+    parser.add_argument("--records", action="store_true",
+                        help="另外写出逐位置明细 fox100_mode_diff_{A}_{B}.jsonl")
+    args = parser.parse_args()
+
+    if args.manifest:
+        configs = load_manifest(args.manifest, EXP_DIR)
+    else:
+        configs = resolve_configs(DEFAULT_CONFIGS, EXP_DIR)
+
+    paths = {}
+    for cfg in configs:
+        mode = cfg["name"]
+        path = os.path.join(EXP_DIR, f"fox100_errors_{mode}_typed.jsonl")
+        if not os.path.exists(path):
+            print(f"⚠ 找不到 {path}，跳过 {mode}（先跑 3_tag_errors.py）")
+            continue
+        paths[mode] = path
+    if args.baseline is not None and args.baseline not in paths:
+        parser.error(f"基线模式 {args.baseline} 没有错误文件")
+    pairs = mode_pairs(list(paths), args.baseline)
+    if not pairs:
+        print("⚠ 至少需要两个模式才能对比")
+        return
+
+    images = common_images(paths)
+    modes, image_names = load_modes(paths, images)
+    result = {"pairs": []}
+    for mode_a, mode_b in pairs:
+        res = diff_modes(modes[mode_a], modes[mode_b], image_names, keep_records=args.records)
+        d = res.to_dict()
+        result["pairs"].append(d)
+        print_diff(d)
+        if args.records:
+            rec_path = os.path.join(EXP_DIR, f"fox100_mode_diff_{mode_a}_{mode_b}.jsonl")
+            with open(rec_path, "w", encoding="utf-8") as f:
+                for rec in res.records:
+                    f.write(json.dumps(rec, ensure_ascii=False) + "\n")
+            print(f"  明细: {rec_path}")
+
+    with open(OUT_PATH, "w", encoding="utf-8") as f:
+        json.dump(result, f, ensure_ascii=False, indent=2)
+    print(f"\n✅ 结果已保存到: {OUT_PATH}")
+
+
+if __name__ == "__main__":
+    main()
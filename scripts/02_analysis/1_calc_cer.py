@@ -7,9 +7,17 @@ PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "../../")
 if PROJECT_ROOT not in sys.path:
     sys.path.insert(0, PROJECT_ROOT)
 
-import json
+import argparse
+from functools import partial
 
-from src.normalization import normalize_text   # 导入文本规范化函数
+from src import dataset
+from src.normalization import item_norm, NormalizationCache, attach_normalized   # 导入文本规范化函数
+from src.cache import DEFAULT_CACHE_PATH
+from src.page_cache import PageResultCache, PAGE_CER_FINGERPRINT
+from src.edit_distance import get_backend, cer_within, BACKENDS, DEFAULT_BACKEND
+from src.parallel import imap_pages
+from src import page_eval
+from src.page_eval import PageMetric
 
 
 # ========== 0. 路径设置（根据你现在的目录结构） ==========
@@ -31,146 +39,117 @@ OUT_STATS_VT100 = os.path.join(EXP_DIR, "stats_vt100_pages.json")
 
 
 # ========== 2. Levenshtein 距离（字符级），用于 CER ==========
-
-def levenshtein_distance(a: str, b: str) -> int:
-    """
-    计算字符串 a, b 的 Levenshtein 编辑距离（字符级）。
-    这里用经典 DP，仅返回距离，不回溯路径。
-    为了效率，用两行滚动数组。
-    """
-    n, m = len(a), len(b)
-    if n == 0:
-        return m
-    if m == 0:
-        return n
-
-    # prev[j] = distance(a[:i-1], b[:j])
-    prev = list(range(m + 1))
-    curr = [0] * (m + 1)
-
-    for i in range(1, n + 1):
-        curr[0] = i
-        ca = a[i - 1]
-        for j in range(1, m + 1):
-            cb = b[j - 1]
-            cost = 0 if ca == cb else 1
-            # 删除 a 中一个字符、插入一个字符、替换
-            curr[j] = min(
-                prev[j] + 1,      # deletion
-                curr[j - 1] + 1,  # insertion
-                prev[j - 1] + cost
-            )
-        prev, curr = curr, prev
-
-    return prev[m]
+# 实现放在 src/edit_distance.py：
+#   - levenshtein_distance: 经典 DP，作为参考答案
+#   - levenshtein_bitparallel: 位并行实现，eval_pairs 默认使用
+#   - levenshtein_adaptive: 自适应带宽（先窄带、不够再加倍），backend="adaptive"
+#   - levenshtein_bounded / cer_within: 只判断是否超过阈值，超过就提前退出
+# 自检：python -m src.edit_distance
 
 
 # ========== 3. 读取 GT 和预测，并对齐 image 名 ==========
 
+# 通用读取 / 对齐逻辑在 src/dataset.py
+
 def load_gt():
-    with open(GT_PATH, "r", encoding="utf-8") as f:
-        anns = json.load(f)
-    gt_by_image = {
-        ann["image"]: ann["conversations"][1]["value"]
-        for ann in anns
-    }
-    return gt_by_image
+    return dataset.load_gt(GT_PATH)
 
 
-def load_pred(pred_path):
-    with open(pred_path, "r", encoding="utf-8") as f:
-        preds = json.load(f)
-    pred_by_image = {p["image"]: p["pred"] for p in preds}
-    return pred_by_image
+load_pred = dataset.load_pred
+build_pairs = dataset.build_pairs
 
 
-def build_pairs(gt_by_image, pred_by_image):
-    """
-    把 GT 和预测按 image 对齐，返回一个列表：
-    [
-      {"image": "...", "gt": "...", "pred": "..."},
-      ...
-    ]
-    """
-    images = sorted(gt_by_image.keys())
-    pairs = []
-    missing = []
-
-    for img in images:
-        if img not in pred_by_image:
-            missing.append(img)
-            continue
-        pairs.append({
-            "image": img,
-            "gt": gt_by_image[img],
-            "pred": pred_by_image[img],
-        })
-
-    if missing:
-        print(f"⚠ 预测中缺少 {len(missing)} 张图片，例如: {missing[:5]}")
-    print(f"✅ 成功对齐图片数量: {len(pairs)}")
-    return pairs
+# ========== 4. 对一组 pairs 计算 CER，并保存每页统计 ==========
 
+def page_cer_value(item, backend=DEFAULT_BACKEND):
+    """单页：规范化 + 编辑距离（进程池里跑的就是它）；不含 image，可以直接放进逐页结果缓存。"""
+    gt = item_norm(item, "gt")
+    pred = item_norm(item, "pred")
+
+    dist = get_backend(backend)(gt, pred)
+    n_char = len(gt)
+    cer = dist / n_char if n_char > 0 else 0.0
+
+    return {
+        "n_char": n_char,
+        "edit_distance": dist,
+        "cer": cer,
+    }
 
-# ========== 4. 对一组 pairs 计算 CER，并保存每页统计 ==========
 
-def eval_pairs(pairs, out_path, tag="vt64"):
+# 与 7_calc_wer.py 共用 src/page_eval.eval_pairs 的流式评测流程
+CER_METRIC = PageMetric("cer", page_cer_value, count_key="n_char", total_key="total_chars", unit="字符")
+
+
+def eval_pairs(pairs, out_path, tag="vt64", backend=DEFAULT_BACKEND, workers=1, page_cache=None):
     """
     计算给定预测下，每页的 CER 和整体 CER。
     结果写入 out_path (JSON)。
+    backend: 编辑距离后端，"bitparallel"（默认）或 "dp"（参考实现）。
+    workers: >1 时按页分块分发到进程池；结果按 image 顺序流式收回，输出与顺序执行逐字节相同。
+    page_cache: 逐页结果缓存；只重算 GT / 预测有变化的页面，整体 CER 由各页数值重新累加。
+    每页统计收到就写出，内存不随页数增长（文件格式与一次 json.dump 相同）。
     """
-    page_stats = []
-    total_chars = 0
-    total_dist = 0
-
-    print(f"\n=== 开始评测 {tag}，样本数 = {len(pairs)} ===")
+    return page_eval.eval_pairs(CER_METRIC, pairs, out_path, tag=tag, backend=backend,
+                                workers=workers, page_cache=page_cache)
 
-    for i, item in enumerate(pairs):
-        img = item["image"]
-        gt_raw = item["gt"]
-        pred_raw = item["pred"]
 
-        gt = normalize_text(gt_raw)
-        pred = normalize_text(pred_raw)
+def page_within(item, max_cer):
+    """单页筛查（进程池里跑的就是它）：CER 不超过 max_cer 时为 True。"""
+    return cer_within(item_norm(item, "gt"), item_norm(item, "pred"), max_cer)
 
-        dist = levenshtein_distance(gt, pred)
-        n_char = len(gt)
-        cer = dist / n_char if n_char > 0 else 0.0
 
-        total_chars += n_char
-        total_dist += dist
-
-        page_stats.append({
-            "image": img,
-            "n_char": n_char,
-            "edit_distance": dist,
-            "cer": cer,
-        })
-
-        if i < 3:
-            print(f"[样例 {i}] {img}: n_char={n_char}, dist={dist}, CER={cer:.4f}")
+def screen_pairs(pairs, max_cer, tag="vt64", workers=1):
+    """
+    只判断每页 CER 是否超过 max_cer，不计算精确距离。
+    距离一旦必然超过阈值就提前退出，用于挑出需要换更高分辨率模式重跑的页面。
+    workers: >1 时与 eval_pairs 一样按页分发到进程池，结果按输入顺序收回。
+    返回超过阈值的 image 列表。
+    """
+    over = []
+    results = imap_pages(partial(page_within, max_cer=max_cer), pairs, workers=workers)
+    for item, ok in zip(pairs, results):
+        if not ok:
+            over.append(item["image"])
 
-    overall_cer = total_dist / total_chars if total_chars > 0 else 0.0
+    print(f"\n✅ {tag} 筛查完成：{len(over)} / {len(pairs)} 页 CER > {max_cer:.2%}")
+    if over:
+        print(f"   例如: {over[:10]}")
+    return over
 
-    # 保存每页统计
-    with open(out_path, "w", encoding="utf-8") as f:
-        json.dump({
-            "overall_cer": overall_cer,
-            "total_chars": total_chars,
-            "total_edit_distance": total_dist,
-            "pages": page_stats,
-        }, f, ensure_ascii=False, indent=2)
 
-    print(f"\n✅ {tag} 评测完成：")
-    print(f"   总字符数 = {total_chars}")
-    print(f"   总编辑距离 = {total_dist}")
-    print(f"   整体 CER = {overall_cer:.4%}")
-    print(f"   详细结果已保存到: {out_path}")
+# ========== 5. 主函数：分别评 vt64 / vt100 ==========
 
+def parse_args():
+    parser = argparse.ArgumentParser(description="Fox-100 字符级 CER 评测")
+    parser.add_argument("--backend", choices=sorted(BACKENDS), default=DEFAULT_BACKEND,
+                        help="编辑距离后端（默认位并行；adaptive 为自适应带宽）")
+    parser.add_argument("--screen-cer", type=float, default=None,
+                        help="只筛查 CER 超过该阈值的页面（如 0.05），不写每页统计")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="并行进程数（默认 1，即顺序执行）")
+    parser.add_argument("--norm-cache", default=DEFAULT_CACHE_PATH,
+                        help="规范化结果缓存文件（SQLite）")
+    parser.add_argument("--no-norm-cache", action="store_true",
+                        help="不使用规范化缓存，每次现算")
+    parser.add_argument("--page-cache", default=DEFAULT_CACHE_PATH,
+                        help="逐页结果缓存文件（SQLite），只重算 GT / 预测有变化的页面")
+    parser.add_argument("--no-page-cache", action="store_true",
+                        help="不使用逐页结果缓存，全部重算")
+    return parser.parse_args()
+
+
+def run_mode(pairs, out_path, tag, args, norm_cache=None, page_cache=None):
+    attach_normalized(pairs, norm_cache)
+    if args.screen_cer is not None:
+        screen_pairs(pairs, args.screen_cer, tag=tag, workers=args.workers)
+    else:
+        eval_pairs(pairs, out_path, tag=tag, backend=args.backend, workers=args.workers,
+                   page_cache=page_cache)
 
-# ========== 5. 主函数：分别评 vt64 / vt100 ==========
 
 def main():
+    args = parse_args()
     print("SCRIPT_DIR:", SCRIPT_DIR)
     print("GT_PATH:", GT_PATH)
     print("PRED_VT64_PATH:", PRED_VT64_PATH)
@@ -179,13 +158,16 @@ def main():
     # 1) 读取 GT
     gt_by_image = load_gt()
     print(f"读取 GT 条目数: {len(gt_by_image)}")
+    norm_cache = None if args.no_norm_cache else NormalizationCache(args.norm_cache)
+    page_cache = None if args.no_page_cache else PageResultCache("page_cer", PAGE_CER_FINGERPRINT,
+                                                                 path=args.page_cache)
 
     # 2) 评测 vt64（如果预测文件存在）
     if os.path.exists(PRED_VT64_PATH):
         print("\n--- 评测 vt64 ---")
         pred64 = load_pred(PRED_VT64_PATH)
         pairs64 = build_pairs(gt_by_image, pred64)
-        eval_pairs(pairs64, OUT_STATS_VT64, tag="vt64")
+        run_mode(pairs64, OUT_STATS_VT64, "vt64", args, norm_cache, page_cache)
     else:
         print(f"⚠ 找不到 {PRED_VT64_PATH}，跳过 vt64 评测")
 
@@ -194,10 +176,17 @@ def main():
         print("\n--- 评测 vt100 ---")
         pred100 = load_pred(PRED_VT100_PATH)
         pairs100 = build_pairs(gt_by_image, pred100)
-        eval_pairs(pairs100, OUT_STATS_VT100, tag="vt100")
+        run_mode(pairs100, OUT_STATS_VT100, "vt100", args, norm_cache, page_cache)
     else:
         print(f"⚠ 找不到 {PRED_VT100_PATH}，跳过 vt100 评测")
 
+    if norm_cache is not None:
+        print(f"\n规范化缓存: 命中 {norm_cache.hits}，新算 {norm_cache.misses}（{norm_cache.store.path}）")
+        norm_cache.close()
+    if page_cache is not None:
+        print(f"逐页结果缓存: 命中 {page_cache.hits} 页，重算 {page_cache.misses} 页")
+        page_cache.close()
+
 
 if __name__ == "__main__":
     main()
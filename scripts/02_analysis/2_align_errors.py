@@ -8,9 +8,16 @@ PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "../../")
 if PROJECT_ROOT not in sys.path:
     sys.path.insert(0, PROJECT_ROOT)
 
+import argparse
 import json
 
-from src.normalization import normalize_text  # 使用统一的规范化函数
+from src import dataset
+from src.alignment import HIRSCHBERG_CELLS
+from src.errors import iter_page_errors, anchored_cost_report, ALIGNERS
+from src.vocab import Vocab
+from src.normalization import NormalizationCache, attach_normalized
+from src.cache import DEFAULT_CACHE_PATH
+from src.page_cache import PageResultCache, PAGE_ERRORS_FINGERPRINT, page_errors_namespace
 
 SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
 
@@ -24,175 +31,50 @@ PRED_VT100_PATH = os.path.join(EXP_DIR, "preds_vt100.json")
 OUT_ERR_VT64 = os.path.join(EXP_DIR, "fox100_errors_vt64.jsonl")
 OUT_ERR_VT100 = os.path.join(EXP_DIR, "fox100_errors_vt100.jsonl")
 
+# 语料级 token 词表（GT + 所有模式的预测共用），3_tag_errors.py 会复用它
+VOCAB_PATH = os.path.join(EXP_DIR, "fox100_vocab.json")
+
 
 # ---------- 1. 读入 GT / 预测，并按 image 对齐 ----------
+# 通用读取 / 对齐逻辑在 src/dataset.py
 
 def load_gt():
-    with open(GT_PATH, "r", encoding="utf-8") as f:
-        anns = json.load(f)
-    return {ann["image"]: ann["conversations"][1]["value"] for ann in anns}
-
-
-def load_pred(pred_path):
-    with open(pred_path, "r", encoding="utf-8") as f:
-        preds = json.load(f)
-    return {p["image"]: p["pred"] for p in preds}
-
-
-def build_pairs(gt_by_image, pred_by_image):
-    images = sorted(gt_by_image.keys())
-    pairs = []
-    missing = []
-    for img in images:
-        if img not in pred_by_image:
-            missing.append(img)
-            continue
-        pairs.append({
-            "image": img,
-            "gt": gt_by_image[img],
-            "pred": pred_by_image[img],
-        })
-    if missing:
-        print(f"⚠ 预测中缺少 {len(missing)} 张图片，例如: {missing[:5]}")
-    print(f"✅ 成功对齐图片数量: {len(pairs)}")
-    return pairs
-
-
-# ---------- 2. 分词 & 对齐 ----------
-
-def tokenize_words(text: str):
-    """
-    先用 normalize_text 做统一规范化，再按空白切分成“词级 token”。
-    注意：split() 会把换行也当成空白处理掉。
-    """
-    norm = normalize_text(text)
-    if not norm:
-        return []
-    return norm.split()
-
-
-def align_tokens(gt_tokens, pred_tokens):
-    """
-    用 Levenshtein 在“词级”上对齐，返回一个操作序列：
-    每个元素: {"op": "eq/sub/ins/del", "gt_idx": int or None, "pred_idx": int or None}
-    """
-    n, m = len(gt_tokens), len(pred_tokens)
-    dp = [[0] * (m + 1) for _ in range(n + 1)]
-    back = [[None] * (m + 1) for _ in range(n + 1)]
-
-    # 初始化边界：全删 / 全插入
-    for i in range(1, n + 1):
-        dp[i][0] = i
-        back[i][0] = ("del", i - 1, 0)
-    for j in range(1, m + 1):
-        dp[0][j] = j
-        back[0][j] = ("ins", 0, j - 1)
-
-    # 动态规划
-    for i in range(1, n + 1):
-        for j in range(1, m + 1):
-            if gt_tokens[i - 1] == pred_tokens[j - 1]:
-                dp[i][j] = dp[i - 1][j - 1]
-                back[i][j] = ("eq", i - 1, j - 1)
-            else:
-                del_cost = dp[i - 1][j] + 1
-                ins_cost = dp[i][j - 1] + 1
-                sub_cost = dp[i - 1][j - 1] + 1
-
-                best = min(del_cost, ins_cost, sub_cost)
-                dp[i][j] = best
-                if best == sub_cost:
-                    back[i][j] = ("sub", i - 1, j - 1)
-                elif best == del_cost:
-                    back[i][j] = ("del", i - 1, j)
-                else:
-                    back[i][j] = ("ins", i, j - 1)
-
-    # 回溯，生成操作序列
-    i, j = n, m
-    ops = []
-    while i > 0 or j > 0:
-        op, pi, pj = back[i][j]
-
-        if op in ("eq", "sub"):
-            gt_idx = i - 1
-            pred_idx = j - 1
-        elif op == "del":
-            gt_idx = i - 1
-            pred_idx = None
-        elif op == "ins":
-            gt_idx = None
-            pred_idx = j - 1
-        else:
-            raise ValueError(f"未知操作: {op}")
-
-        ops.append({
-            "op": op,
-            "gt_idx": gt_idx,
-            "pred_idx": pred_idx,
-        })
-
-        i, j = pi, pj
-
-    ops.reverse()
-    return ops
-
-
-# ---------- 3. 抽取单页错误 ----------
-
-def extract_errors_for_page(image_name, gt_text, pred_text, mode):
-    """
-    对单页做：
-      GT / pred 规范化 + 分词 + 对齐
-    返回一个 list，每个元素是一条“非 eq”的错误记录。
-    """
-    gt_tokens = tokenize_words(gt_text)
-    pred_tokens = tokenize_words(pred_text)
-
-    ops = align_tokens(gt_tokens, pred_tokens)
-
-    errors = []
-    for step in ops:
-        op = step["op"]
-        gt_idx = step["gt_idx"]
-        pred_idx = step["pred_idx"]
-
-        if op == "eq":
-            continue  # 正确 token 不记录
-
-        gt_tok = gt_tokens[gt_idx] if gt_idx is not None and 0 <= gt_idx < len(gt_tokens) else ""
-        pred_tok = pred_tokens[pred_idx] if pred_idx is not None and 0 <= pred_idx < len(pred_tokens) else ""
-
-        # 给一点上下文，方便人工检查
-        gt_prev = gt_tokens[gt_idx - 1] if gt_idx is not None and gt_idx - 1 >= 0 else ""
-        gt_next = gt_tokens[gt_idx + 1] if gt_idx is not None and gt_idx + 1 < len(gt_tokens) else ""
-
-        errors.append({
-            "image": image_name,
-            "mode": mode,          # vt64 / vt100
-            "op": op,              # sub / ins / del
-            "gt_token": gt_tok,
-            "pred_token": pred_tok,
-            "gt_index": gt_idx,
-            "pred_index": pred_idx,
-            "gt_prev": gt_prev,
-            "gt_next": gt_next,
-        })
-
-    return errors
-
-
-# ---------- 4. 整个模式（vt64 / vt100）批量抽取 ----------
-
-def save_errors_for_mode(pairs, mode, out_path):
+    return dataset.load_gt(GT_PATH)
+
+
+load_pred = dataset.load_pred
+build_pairs = dataset.build_pairs
+
+
+# ---------- 2. 分词 & 对齐 & 抽取单页错误 ----------
+# 实现放在 src/errors.py（tokenize_words / extract_errors_for_page），
+# 对齐算法在 src/alignment.py：
+#   - align_tokens: NumPy int32/uint8 紧凑数组 + 反对角线波前（默认）
+#   - align_tokens_reference: 原来的列表版 DP，作为对照答案
+#   - align_tokens_hirschberg: 线性空间分治版，输出与 align_tokens 相同，用于超长页面
+#   - align_lines: 分层对齐（先行后词），--aligner hier 时使用
+#   - align_tokens_anchored: patience 锚点切段后只在缺口里 DP，--aligner anchored 时使用
+# 基准测试：python scripts/04_bench/bench_align.py
+
+
+# ---------- 3. 整个模式（vt64 / vt100）批量抽取 ----------
+
+def report_anchor_mismatch(pairs, mode, workers=1):
+    bad = anchored_cost_report(pairs, workers=workers)
+    if not bad:
+        print(f"✅ {mode}: {len(pairs)} 页锚点对齐的编辑代价都与整页 DP 相同")
+        return
+    print(f"⚠ {mode}: {len(bad)} / {len(pairs)} 页锚点对齐的编辑代价比整页 DP 大")
+    for r in bad:
+        print(f"  {r['image']}: anchored={r['anchored']} optimal={r['optimal']} (+{r['anchored'] - r['optimal']})")
+
+
+def save_errors_for_mode(pairs, mode, out_path, max_cells=HIRSCHBERG_CELLS, vocab=None, workers=1,
+                         page_cache=None, aligner="flat", char_detail=False):
     total_err = 0
     with open(out_path, "w", encoding="utf-8") as f:
-        for item in pairs:
-            img = item["image"]
-            gt = item["gt"]
-            pred = item["pred"]
-
-            errs = extract_errors_for_page(img, gt, pred, mode=mode)
+        for errs in iter_page_errors(pairs, mode, max_cells=max_cells, vocab=vocab, workers=workers,
+                                     page_cache=page_cache, aligner=aligner, char_detail=char_detail):
             total_err += len(errs)
             for e in errs:
                 f.write(json.dumps(e, ensure_ascii=False) + "\n")
@@ -200,7 +82,30 @@ def save_errors_for_mode(pairs, mode, out_path):
     print(f"✅ {mode} 错误抽取完成，共 {total_err} 条错误，写入 {out_path}")
 
 
+def parse_args():
+    parser = argparse.ArgumentParser(description="Fox-100 词级对齐 & 错误抽取")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="并行进程数（默认 1，即顺序执行）")
+    parser.add_argument("--norm-cache", default=DEFAULT_CACHE_PATH,
+                        help="规范化结果缓存文件（SQLite）")
+    parser.add_argument("--no-norm-cache", action="store_true",
+                        help="不使用规范化缓存，每次现算")
+    parser.add_argument("--page-cache", default=DEFAULT_CACHE_PATH,
+                        help="逐页对齐结果缓存文件（SQLite），只重新对齐 GT / 预测有变化的页面")
+    parser.add_argument("--no-page-cache", action="store_true",
+                        help="不使用逐页结果缓存，全部重新对齐")
+    parser.add_argument("--aligner", choices=ALIGNERS, default="flat",
+                        help="flat: 整页词级对齐（默认）；hier: 先按行对齐，再只在不相同的行块里做词级对齐；"
+                             "anchored: 先用 patience 锚点切段，只在锚点之间做词级对齐")
+    parser.add_argument("--validate-anchors", action="store_true",
+                        help="额外检查每页锚点对齐与整页 DP 的编辑代价，列出不一致的页面")
+    parser.add_argument("--char-detail", action="store_true",
+                        help="sub 记录附带词内字符级差异（char_edits 字段）")
+    return parser.parse_args()
+
+
 def main():
+    args = parse_args()
     print("SCRIPT_DIR:", SCRIPT_DIR)
     print("GT_PATH:", GT_PATH)
     print("PRED_VT64_PATH:", PRED_VT64_PATH)
@@ -209,12 +114,22 @@ def main():
     gt_by_image = load_gt()
     print("读取 GT 条目数:", len(gt_by_image))
 
+    # 沿用已有词表，保证多次运行之间 id 稳定
+    vocab = Vocab.load(VOCAB_PATH) if os.path.exists(VOCAB_PATH) else Vocab()
+    norm_cache = None if args.no_norm_cache else NormalizationCache(args.norm_cache)
+    page_cache = None if args.no_page_cache else PageResultCache(
+        page_errors_namespace(args.aligner, args.char_detail), PAGE_ERRORS_FINGERPRINT, path=args.page_cache)
+
     # vt64
     if os.path.exists(PRED_VT64_PATH):
         print("\n--- 抽取 vt64 错误 ---")
         pred64 = load_pred(PRED_VT64_PATH)
-        pairs64 = build_pairs(gt_by_image, pred64)
-        save_errors_for_mode(pairs64, mode="vt64", out_path=OUT_ERR_VT64)
+        pairs64 = attach_normalized(build_pairs(gt_by_image, pred64), norm_cache)
+        save_errors_for_mode(pairs64, mode="vt64", out_path=OUT_ERR_VT64, vocab=vocab,
+                             workers=args.workers, page_cache=page_cache,
+                             aligner=args.aligner, char_detail=args.char_detail)
+        if args.validate_anchors:
+            report_anchor_mismatch(pairs64, "vt64", workers=args.workers)
     else:
         print("⚠ 找不到 preds_vt64.json，跳过 vt64")
 
@@ -222,11 +137,25 @@ def main():
     if os.path.exists(PRED_VT100_PATH):
         print("\n--- 抽取 vt100 错误 ---")
         pred100 = load_pred(PRED_VT100_PATH)
-        pairs100 = build_pairs(gt_by_image, pred100)
-        save_errors_for_mode(pairs100, mode="vt100", out_path=OUT_ERR_VT100)
+        pairs100 = attach_normalized(build_pairs(gt_by_image, pred100), norm_cache)
+        save_errors_for_mode(pairs100, mode="vt100", out_path=OUT_ERR_VT100, vocab=vocab,
+                             workers=args.workers, page_cache=page_cache,
+                             aligner=args.aligner, char_detail=args.char_detail)
+        if args.validate_anchors:
+            report_anchor_mismatch(pairs100, "vt100", workers=args.workers)
     else:
         print("⚠ 找不到 preds_vt100.json，跳过 vt100")
 
+    if norm_cache is not None:
+        print(f"规范化缓存: 命中 {norm_cache.hits}，新算 {norm_cache.misses}")
+        norm_cache.close()
+    if page_cache is not None:
+        print(f"逐页结果缓存: 命中 {page_cache.hits} 页，重新对齐 {page_cache.misses} 页")
+        page_cache.close()
+
+    vocab.save(VOCAB_PATH)
+    print(f"✅ 词表大小 {len(vocab)}，已保存到 {VOCAB_PATH}")
+
 
 if __name__ == "__main__":
     main()
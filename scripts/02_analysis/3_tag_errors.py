@@ -7,9 +7,15 @@ PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "../../")
 if PROJECT_ROOT not in sys.path:
     sys.path.insert(0, PROJECT_ROOT)
 
+import argparse
 import json
 
-from src.taxonomy import guess_type
+from src import dataset
+from src.taxonomy import classify
+from src.vocab import Vocab
+from src.error_store import ErrorStoreWriter, store_path_for
+from src.errors import tokenize_words
+from src.repetition import detect_repetition, loop_start, repetition_type, write_repetition_report
 
 SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
 
@@ -22,12 +28,37 @@ IN_VT100 = os.path.join(EXP_DIR, "fox100_errors_vt100.jsonl")
 OUT_VT64 = os.path.join(EXP_DIR, "fox100_errors_vt64_typed.jsonl")
 OUT_VT100 = os.path.join(EXP_DIR, "fox100_errors_vt100_typed.jsonl")
 
+GT_PATH = os.path.join(EXP_DIR, "en_page_ocr_100.json")
 
-def process(in_path, out_path, tag):
+# 2_align_errors.py 写出的语料级词表；有它时类型按词表条目查表，每个 token 只分类一次
+VOCAB_PATH = os.path.join(EXP_DIR, "fox100_vocab.json")
+
+
+def detect_loops(mode, gt_by_image):
+    """
+    --repetition：逐页检测预测的重复循环，写出 fox100_repetition_{mode}.json，
+    返回 {image: 循环起点（pred token 下标）或 None}。分词与 2_align_errors 相同，下标与 pred_index 一致。
+    """
+    pred_path = os.path.join(EXP_DIR, f"preds_{mode}.json")
+    pairs = dataset.build_pairs(gt_by_image, dataset.load_pred(pred_path))
+    reports = [{"image": item["image"], **detect_repetition(tokenize_words(item["pred"]))} for item in pairs]
+    report_path = os.path.join(EXP_DIR, f"fox100_repetition_{mode}.json")
+    write_repetition_report(report_path, mode, reports)
+    n_loop = sum(r["is_loop"] for r in reports)
+    print(f"重复循环检测: {n_loop} / {len(reports)} 页，报告写入 {report_path}")
+    return {r["image"]: loop_start(r) for r in reports}
+
+
+def process(in_path, out_path, tag, vocab=None, loops=None):
     print(f"\n--- 处理 {tag}: {in_path} ---")
     counts = {}
+    classify_tok = vocab.type_of if vocab is not None else classify
+    loops = loops or {}
 
-    with open(in_path, "r", encoding="utf-8") as fin, \
+    # 同时写一份列式错误库（.npz），4_calc_ker / 5_summ_errors / extract_cases 读它；
+    # 它放在最外层最后关闭，保证比 JSONL 新
+    with ErrorStoreWriter(store_path_for(out_path)) as store, \
+         open(in_path, "r", encoding="utf-8") as fin, \
          open(out_path, "w", encoding="utf-8") as fout:
         for line in fin:
             line = line.strip()
@@ -37,12 +68,15 @@ def process(in_path, out_path, tag):
 
             # 优先用 gt_token，没有就用 pred_token
             tok = rec.get("gt_token") or rec.get("pred_token") or ""
-            t = guess_type(tok)
+            t = classify_tok(tok)
+            # 落在重复循环区间里的错误归为幻觉重复（只有 --repetition 时 loops 非空）
+            t = repetition_type(rec, t, loops.get(rec["image"]))
             rec["type"] = t
 
             counts[t] = counts.get(t, 0) + 1
 
             fout.write(json.dumps(rec, ensure_ascii=False) + "\n")
+            store.append(rec)
 
     print(f"写入带类型的错误日志: {out_path}")
     print("类型分布：")
@@ -51,13 +85,26 @@ def process(in_path, out_path, tag):
 
 
 def main():
+    parser = argparse.ArgumentParser(description="Fox-100 错误类型标注")
+    parser.add_argument("--repetition", action="store_true",
+                        help="检测预测里的重复循环，循环区间里的错误归为 hallucinated_repetition 类型")
+    args = parser.parse_args()
+    gt_by_image = dataset.load_gt(GT_PATH) if args.repetition else None
+
+    vocab = None
+    if os.path.exists(VOCAB_PATH):
+        vocab = Vocab.load(VOCAB_PATH)
+        print(f"使用词表 {VOCAB_PATH}（{len(vocab)} 个条目）")
+
     if os.path.exists(IN_VT64):
-        process(IN_VT64, OUT_VT64, "vt64")
+        loops = detect_loops("vt64", gt_by_image) if args.repetition else None
+        process(IN_VT64, OUT_VT64, "vt64", vocab=vocab, loops=loops)
     else:
         print("⚠ 找不到 fox100_errors_vt64.jsonl")
 
     if os.path.exists(IN_VT100):
-        process(IN_VT100, OUT_VT100, "vt100")
+        loops = detect_loops("vt100", gt_by_image) if args.repetition else None
+        process(IN_VT100, OUT_VT100, "vt100", vocab=vocab, loops=loops)
     else:
         print("⚠ 找不到 fox100_errors_vt100.jsonl")
 
@@ -8,28 +8,20 @@ PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "../../")
 if PROJECT_ROOT not in sys.path:
     sys.path.insert(0, PROJECT_ROOT)
 
-import json
-
-from src.metrics import compute_stats as compute_error_stats
+from src.warehouse import open_warehouse
 
 SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
 FOX_DIR = os.path.join(PROJECT_ROOT, "data", "Fox")
 EXP_DIR = os.path.join(FOX_DIR, "exp_fox100")
-
-def summarize(path):
-    records = []
-    with open(path, "r", encoding="utf-8") as f:
-        for line in f:
-            line = line.strip()
-            if not line:
-                continue
-            records.append(json.loads(line))
-    return compute_error_stats(records)
+WAREHOUSE_PATH = os.path.join(EXP_DIR, "fox100_warehouse.sqlite")
 
 def main():
-    for mode in ["vt64", "vt100"]:
-        path = os.path.join(EXP_DIR, f"fox100_errors_{mode}_typed.jsonl")
-        stats = summarize(path)
+    modes = ["vt64", "vt100"]
+    # 错误仓库里一条聚合 SQL（错误 JOIN 权重表）；源 JSONL 有变化时自动重新导入
+    with open_warehouse(WAREHOUSE_PATH, EXP_DIR, modes, require=("errors",)) as wh:
+        all_stats = {mode: wh.error_stats(mode) for mode in modes}
+    for mode in modes:
+        stats = all_stats[mode]
         print(f"\n=== {mode} ===")
         print(f"总错误数           : {stats['total_err']}")
         print(f"关键类型错误数     : {stats['critical_err']}  "
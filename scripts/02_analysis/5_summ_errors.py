@@ -6,32 +6,27 @@ PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "../../")
 if PROJECT_ROOT not in sys.path:
     sys.path.insert(0, PROJECT_ROOT)
 
-import json
 from collections import Counter
 
+from src.warehouse import open_warehouse
+
 SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
 FOX_DIR = os.path.join(PROJECT_ROOT, "data", "Fox")
 EXP_DIR = os.path.join(FOX_DIR, "exp_fox100")
+WAREHOUSE_PATH = os.path.join(EXP_DIR, "fox100_warehouse.sqlite")
 
-def load_typed_error_counts(path):
-    cnt = Counter()
-    total = 0
-    with open(path, "r", encoding="utf-8") as f:
-        for line in f:
-            line = line.strip()
-            if not line:
-                continue
-            rec = json.loads(line)
-            t = rec.get("type", "unknown")
-            cnt[t] += 1
-            total += 1
-    return total, cnt
+def warehouse_type_counts(wh, mode):
+    # 错误仓库里 GROUP BY type；未打类型的错误 type 为 NULL，记为 unknown
+    cnt = Counter({("unknown" if t is None else t): c for t, c in wh.type_counts(mode).items()})
+    return sum(cnt.values()), cnt
 
 def main():
-    for mode in ["vt64", "vt100"]:
-        path = os.path.join(EXP_DIR, f"fox100_errors_{mode}_typed.jsonl")
+    modes = ["vt64", "vt100"]
+    with open_warehouse(WAREHOUSE_PATH, EXP_DIR, modes, require=("errors",)) as wh:
+        counts = {mode: warehouse_type_counts(wh, mode) for mode in modes}
+    for mode in modes:
         print(f"\n=== {mode} ===")
-        total, cnt = load_typed_error_counts(path)
+        total, cnt = counts[mode]
         print(f"总错误数: {total}")
         print("类型分布：")
         for t, c in cnt.most_common():
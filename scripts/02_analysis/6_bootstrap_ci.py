@@ -0,0 +1,115 @@
+# 给 CER / ECI 加上 bootstrap 置信区间，并用配对 bootstrap 检验 vt64 与 vt100 的差异。
+# 输入：1_calc_cer.py 写出的 stats_{mode}_pages.json（每页 edit_distance / n_char）
+#      + 3_tag_errors.py 写出的带类型错误（按页汇总 ECI 权重）
+import sys
+import os
+# 动态计算项目根目录 (scripts/xx/xx.py -> ../../ -> root)
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "../../"))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+import argparse
+import json
+
+import numpy as np
+
+from src.metrics import WEIGHTS, CRITICAL_TYPES
+from src.error_store import open_error_store
+from src.bootstrap import (PAGE_FIELDS, DEFAULT_N_BOOT, DEFAULT_SEED,
+                           bootstrap_ci, paired_bootstrap)
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+FOX_DIR = os.path.join(PROJECT_ROOT, "data", "Fox")
+EXP_DIR = os.path.join(FOX_DIR, "exp_fox100")
+
+OUT_PATH = os.path.join(EXP_DIR, "fox100_bootstrap_ci.json")
+
+MODES = ["vt64", "vt100"]
+
+
+def load_page_table(mode):
+    """
+    返回 (images, values)：values 每行对应一页，列为 PAGE_FIELDS。
+    错误权重按 image 用 bincount 汇总；没有错误的页面权重为 0。
+    """
+    with open(os.path.join(EXP_DIR, f"stats_{mode}_pages.json"), "r", encoding="utf-8") as f:
+        pages = json.load(f)["pages"]
+    images = [p["image"] for p in pages]
+    row_of = {img: i for i, img in enumerate(images)}
+
+    values = np.zeros((len(pages), len(PAGE_FIELDS)), dtype=np.float64)
+    values[:, 0] = [p["edit_distance"] for p in pages]
+    values[:, 1] = [p["n_char"] for p in pages]
+
+    typed_path = os.path.join(EXP_DIR, f"fox100_errors_{mode}_typed.jsonl")
+    with open_error_store(typed_path) as store:
+        cols = store.load(["image", "type"], decode=False)
+        type_names = store.dictionary("type")
+        w_of_type = np.array([WEIGHTS.get(t, 1.0) for t in type_names])
+        crit_of_type = np.array([t in CRITICAL_TYPES for t in type_names])
+        # 错误库里的 image 编码 -> 页面行号（错误库里有、统计里没有的页面不应出现）
+        page_row = np.array([row_of[img] for img in store.dictionary("image")], dtype=np.int64)
+
+    rows = page_row[cols["image"]] if len(cols["image"]) else np.zeros(0, dtype=np.int64)
+    w = w_of_type[cols["type"]]
+    crit = crit_of_type[cols["type"]]
+    n = len(pages)
+    values[:, 2] = np.bincount(rows, weights=w, minlength=n)
+    values[:, 3] = np.bincount(rows, weights=w * crit, minlength=n)
+    values[:, 4] = np.bincount(rows, minlength=n)
+    values[:, 5] = np.bincount(rows, weights=crit.astype(np.float64), minlength=n)
+    return images, values
+
+
+def align_pages(images_a, values_a, images_b, values_b):
+    """配对 bootstrap 只在两个模式都有的页面上做，按 image 对齐行。"""
+    common = sorted(set(images_a) & set(images_b))
+    ia = {img: i for i, img in enumerate(images_a)}
+    ib = {img: i for i, img in enumerate(images_b)}
+    return common, values_a[[ia[i] for i in common]], values_b[[ib[i] for i in common]]
+
+
+def fmt(name, r):
+    if name == "cer" or name.endswith("share"):
+        return f"{r['point']:.4%}  [{r['lo']:.4%}, {r['hi']:.4%}]"
+    return f"{r['point']:.1f}  [{r['lo']:.1f}, {r['hi']:.1f}]"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="CER / ECI 的 bootstrap 置信区间与配对检验")
+    parser.add_argument("--n-boot", type=int, default=DEFAULT_N_BOOT)
+    parser.add_argument("--alpha", type=float, default=0.05)
+    parser.add_argument("--seed", type=int, default=DEFAULT_SEED)
+    args = parser.parse_args()
+
+    tables = {}
+    result = {"n_boot": args.n_boot, "alpha": args.alpha, "seed": args.seed, "modes": {}}
+    for mode in MODES:
+        if not os.path.exists(os.path.join(EXP_DIR, f"stats_{mode}_pages.json")):
+            print(f"⚠ 找不到 stats_{mode}_pages.json，跳过 {mode}")
+            continue
+        images, values = tables[mode] = load_page_table(mode)
+        ci = bootstrap_ci(values, n_boot=args.n_boot, alpha=args.alpha, seed=args.seed)
+        result["modes"][mode] = {"n_pages": len(images), **ci}
+
+        print(f"\n=== {mode}（{len(images)} 页，{args.n_boot} 次重抽样，{1 - args.alpha:.0%} CI） ===")
+        for name, r in ci.items():
+            print(f"  {name:16s} {fmt(name, r)}")
+
+    if all(m in tables for m in MODES):
+        a, b = MODES
+        common, va, vb = align_pages(*tables[a], *tables[b])
+        paired = paired_bootstrap(va, vb, n_boot=args.n_boot, alpha=args.alpha, seed=args.seed)
+        result["paired"] = {"a": a, "b": b, "n_pages": len(common), **paired}
+
+        print(f"\n=== 配对 bootstrap：{b} - {a}（{len(common)} 页） ===")
+        for name, r in paired.items():
+            print(f"  {name:16s} {fmt(name, r)}  p={r['p_value']:.4f}")
+
+    with open(OUT_PATH, "w", encoding="utf-8") as f:
+        json.dump(result, f, ensure_ascii=False, indent=2)
+    print(f"\n✅ 结果已保存到: {OUT_PATH}")
+
+
+if __name__ == "__main__":
+    main()
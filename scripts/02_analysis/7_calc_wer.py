@@ -0,0 +1,102 @@
+# 词错误率（WER）评测：与 1_calc_cer.py 同样的流程和输出格式，只是距离按词算。
+# 分词与 2_align_errors.py 相同（规范化后按空白切分），距离引擎见 src/wer.py。
+import sys
+import os
+# 动态计算项目根目录 (scripts/xx/xx.py -> ../../ -> root)
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "../../"))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+import argparse
+
+from src import dataset
+from src.normalization import NormalizationCache, attach_normalized
+from src.cache import DEFAULT_CACHE_PATH
+from src.page_cache import PageResultCache, PAGE_WER_FINGERPRINT
+from src.edit_distance import BACKENDS, DEFAULT_BACKEND
+from src.manifest import DEFAULT_CONFIGS, resolve_configs, load_manifest, describe
+from src import page_eval
+from src.wer import WER_METRIC
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+FOX_DIR = os.path.join(PROJECT_ROOT, "data", "Fox")
+EXP_DIR = os.path.join(FOX_DIR, "exp_fox100")
+
+GT_PATH = os.path.join(EXP_DIR, "en_page_ocr_100.json")
+
+
+def stats_path(mode):
+    return os.path.join(EXP_DIR, f"stats_{mode}_wer_pages.json")
+
+
+def eval_pairs(pairs, out_path, tag="vt64", backend=DEFAULT_BACKEND, workers=1, page_cache=None):
+    """
+    计算每页 WER 和整体 WER，写入 out_path (JSON)。
+    参数和 1_calc_cer.eval_pairs 相同（同一套 src/page_eval 流程）；整体 WER = 各页词级编辑距离之和 / GT 总词数。
+    """
+    return page_eval.eval_pairs(WER_METRIC, pairs, out_path, tag=tag, backend=backend,
+                                workers=workers, page_cache=page_cache)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Fox-100 词错误率（WER）评测")
+    parser.add_argument("--backend", choices=sorted(BACKENDS), default=DEFAULT_BACKEND,
+                        help="编辑距离后端（默认位并行）")
+    parser.add_argument("--manifest", default=None,
+                        help="配置清单 JSON（默认只评 vt64 / vt100）")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="并行进程数（默认 1，即顺序执行）")
+    parser.add_argument("--norm-cache", default=DEFAULT_CACHE_PATH,
+                        help="规范化结果缓存文件（SQLite）")
+    parser.add_argument("--no-norm-cache", action="store_true",
+                        help="不使用规范化缓存，每次现算")
+    parser.add_argument("--page-cache", default=DEFAULT_CACHE_PATH,
+                        help="逐页结果缓存文件（SQLite），只重算 GT / 预测有变化的页面")
+    parser.add_argument("--no-page-cache", action="store_true",
+                        help="不使用逐页结果缓存，全部重算")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    print("GT_PATH:", GT_PATH)
+
+    gt_by_image = dataset.load_gt(GT_PATH)
+    print(f"读取 GT 条目数: {len(gt_by_image)}")
+    norm_cache = None if args.no_norm_cache else NormalizationCache(args.norm_cache)
+    page_cache = None if args.no_page_cache else PageResultCache("page_wer", PAGE_WER_FINGERPRINT,
+                                                                 path=args.page_cache)
+
+    if args.manifest:
+        configs = load_manifest(args.manifest, EXP_DIR)
+    else:
+        configs = resolve_configs(DEFAULT_CONFIGS, EXP_DIR)
+
+    overall = {}
+    for cfg in configs:
+        mode = cfg["name"]
+        if not os.path.exists(cfg["pred"]):
+            print(f"⚠ 找不到 {cfg['pred']}，跳过 {mode} 评测")
+            continue
+        print(f"\n--- 评测 {mode}（{describe(cfg)}）---")
+        pairs = dataset.build_pairs(gt_by_image, dataset.load_pred(cfg["pred"]))
+        attach_normalized(pairs, norm_cache)
+        overall[mode] = eval_pairs(pairs, stats_path(mode), tag=mode, backend=args.backend,
+                                   workers=args.workers, page_cache=page_cache)
+
+    if overall:
+        print("\n=== 整体 WER ===")
+        for mode, wer in overall.items():
+            print(f"  {mode:10s} {wer:.4%}")
+
+    if norm_cache is not None:
+        print(f"\n规范化缓存: 命中 {norm_cache.hits}，新算 {norm_cache.misses}")
+        norm_cache.close()
+    if page_cache is not None:
+        print(f"逐页结果缓存: 命中 {page_cache.hits} 页，重算 {page_cache.misses} 页")
+        page_cache.close()
+
+
+if __name__ == "__main__":
+    main()
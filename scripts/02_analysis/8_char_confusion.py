@@ -0,0 +1,93 @@
+# 字符级混淆矩阵：在 3_tag_errors.py 写出的带类型错误里，对每对 sub 词做字符对齐，
+# 按错误类型统计最常见的字符混淆（1->l、0->O、,->. ...），输出每类 top-k。
+# 逐页算局部计数（可多进程），主进程合并；--sketch 时用 count-min sketch 汇总，内存固定。
+import sys
+import os
+# 动态计算项目根目录 (scripts/xx/xx.py -> ../../ -> root)
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "../../"))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+import argparse
+import json
+
+import numpy as np
+
+from src.error_store import open_error_store
+from src.confusion import ConfusionCounter, ConfusionSketch, page_confusion
+from src.manifest import DEFAULT_CONFIGS, resolve_configs, load_manifest
+from src.parallel import imap_pages
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+FOX_DIR = os.path.join(PROJECT_ROOT, "data", "Fox")
+EXP_DIR = os.path.join(FOX_DIR, "exp_fox100")
+
+OUT_PATH = os.path.join(EXP_DIR, "fox100_char_confusion.json")
+
+
+def sub_pairs_by_page(typed_path):
+    """从列式错误库里取出所有 sub 记录，按页分组：[[(type, gt_token, pred_token), ...], ...]"""
+    with open_error_store(typed_path) as store:
+        cols = store.load(["image", "gt_token", "pred_token", "type"], where={"op": "sub"}, decode=False)
+        dec = {c: store.decode(c, cols[c]) for c in ("gt_token", "pred_token", "type")}
+    image = cols["image"]
+    order = np.argsort(image, kind="stable")
+    bounds = np.flatnonzero(np.diff(image[order])) + 1
+    return [[(dec["type"][i], dec["gt_token"][i], dec["pred_token"][i]) for i in rows]
+            for rows in np.split(order, bounds) if len(rows)]
+
+
+def confusion_for_mode(typed_path, workers=1, sketch=None):
+    pages = sub_pairs_by_page(typed_path)
+    acc = ConfusionCounter() if sketch is None else sketch
+    for part in imap_pages(page_confusion, pages, workers=workers):
+        if sketch is None:
+            acc.merge(part)
+        else:
+            acc.add_counter(part)
+    return acc
+
+
+def print_top(mode, acc, top):
+    print(f"\n=== {mode}：{acc.n_pairs} 对 sub 词，{acc.n_edits} 处字符差异 ===")
+    for err_type, rows in top.items():
+        shown = ", ".join(f"{r['gt'] or '∅'}→{r['pred'] or '∅'}×{r['count']}" for r in rows[:8])
+        print(f"  {err_type:14s} {shown}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="sub 词内部的字符级混淆统计")
+    parser.add_argument("--top-k", type=int, default=20, help="每个错误类型输出前 k 个混淆")
+    parser.add_argument("--workers", type=int, default=1, help="并行进程数")
+    parser.add_argument("--manifest", default=None, help="配置清单 JSON（默认只统计 vt64 / vt100）")
+    parser.add_argument("--sketch", action="store_true",
+                        help="用 count-min sketch 汇总（超大语料），计数为估计值（只会偏大）")
+    parser.add_argument("--sketch-width", type=int, default=1 << 16)
+    parser.add_argument("--sketch-depth", type=int, default=4)
+    args = parser.parse_args()
+
+    if args.manifest:
+        configs = load_manifest(args.manifest, EXP_DIR)
+    else:
+        configs = resolve_configs(DEFAULT_CONFIGS, EXP_DIR)
+
+    result = {"top_k": args.top_k, "method": "sketch" if args.sketch else "exact", "modes": {}}
+    for cfg in configs:
+        mode = cfg["name"]
+        typed_path = os.path.join(EXP_DIR, f"fox100_errors_{mode}_typed.jsonl")
+        if not os.path.exists(typed_path):
+            print(f"⚠ 找不到 {typed_path}，跳过 {mode}（先跑 3_tag_errors.py）")
+            continue
+        sketch = ConfusionSketch(args.sketch_width, args.sketch_depth) if args.sketch else None
+        acc = confusion_for_mode(typed_path, workers=args.workers, sketch=sketch)
+        top = acc.top_k(args.top_k)
+        result["modes"][mode] = {"n_sub_pairs": acc.n_pairs, "n_char_edits": acc.n_edits, "by_type": top}
+        print_top(mode, acc, top)
+
+    with open(OUT_PATH, "w", encoding="utf-8") as f:
+        json.dump(result, f, ensure_ascii=False, indent=2)
+    print(f"\n✅ 结果已保存到: {OUT_PATH}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+# 错误仓库：把每页 CER 统计、带类型的错误和页面元数据导入本地 SQLite（src/warehouse.py），
+# 再从仓库里用查询重建对比表 fox100_comparison.md；--sql 可直接跑临时查询，例如
+#   python scripts/02_analysis/9_build_warehouse.py --sql \
+#     "SELECT mode, type, COUNT(*) AS n FROM errors GROUP BY mode, type ORDER BY n DESC LIMIT 10"
+import sys
+import os
+# 动态计算项目根目录 (scripts/xx/xx.py -> ../../ -> root)
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "../../"))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+import argparse
+import time
+
+from src.manifest import DEFAULT_CONFIGS, resolve_configs, load_manifest, write_comparison_table
+from src.warehouse import open_warehouse
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+FOX_DIR = os.path.join(PROJECT_ROOT, "data", "Fox")
+EXP_DIR = os.path.join(FOX_DIR, "exp_fox100")
+
+WAREHOUSE_PATH = os.path.join(EXP_DIR, "fox100_warehouse.sqlite")
+PAGE_META_PATH = os.path.join(EXP_DIR, "selected_pages_raw.json")
+COMPARISON_PATH = os.path.join(EXP_DIR, "fox100_comparison.md")
+
+
+def print_rows(rows, limit=50):
+    if not rows:
+        print("（无结果）")
+        return
+    cols = list(rows[0])
+    print(" | ".join(cols))
+    for r in rows[:limit]:
+        print(" | ".join("" if r[c] is None else str(r[c]) for c in cols))
+    if len(rows) > limit:
+        print(f"... 共 {len(rows)} 行")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="导入错误仓库（SQLite）并从中重建对比表")
+    parser.add_argument("--manifest", default=None, help="配置清单 JSON（默认 vt64 / vt100）")
+    parser.add_argument("--db", default=WAREHOUSE_PATH, help="仓库文件路径")
+    parser.add_argument("--force", action="store_true", help="源文件没变也全部重新导入")
+    parser.add_argument("--sql", default=None, help="导入后执行一条查询并打印结果")
+    parser.add_argument("--no-table", action="store_true", help="不重写对比表")
+    args = parser.parse_args()
+
+    if args.manifest:
+        configs = load_manifest(args.manifest, EXP_DIR)
+    else:
+        configs = resolve_configs(DEFAULT_CONFIGS, EXP_DIR)
+    modes = [c["name"] for c in configs]
+
+    t0 = time.perf_counter()
+    with open_warehouse(args.db, EXP_DIR, modes, page_meta_path=PAGE_META_PATH,
+                        force=args.force, verbose=True) as wh:
+        print(f"仓库: {args.db}（{time.perf_counter() - t0:.2f}s）")
+        for table in ("pages", "errors", "page_meta"):
+            print(f"  {table:10s} {wh.count(table):8d} 行")
+
+        present = [m for m in modes if wh.query("SELECT 1 FROM pages WHERE mode = ? LIMIT 1", (m,))]
+        missing = [m for m in modes if m not in present]
+        if missing:
+            print(f"⚠ 仓库里没有 {missing} 的每页统计（先跑 run_pipeline.py 或 1_calc_cer.py）")
+
+        if not args.no_table and present:
+            t0 = time.perf_counter()
+            summaries = [wh.mode_summary(m) for m in present]
+            write_comparison_table(COMPARISON_PATH, summaries, configs)
+            print(f"✅ 对比表已从仓库重建（{(time.perf_counter() - t0) * 1000:.1f}ms）: {COMPARISON_PATH}")
+
+        if args.sql:
+            t0 = time.perf_counter()
+            rows = wh.query(args.sql)
+            print(f"\n查询用时 {(time.perf_counter() - t0) * 1000:.1f}ms")
+            print_rows(rows)
+
+
+if __name__ == "__main__":
+    main()
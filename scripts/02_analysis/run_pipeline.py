@@ -0,0 +1,140 @@
+# 融合流水线入口：一次运行代替 1_calc_cer → 2_align_errors → 3_tag_errors → 4_calc_ker → 5_summ_errors。
+# GT / 预测只读一次、每页只规范化一次，写出的产物与分开跑五个脚本时相同。
+# --manifest 给出 N 个推理配置（见 manifests/fox100_modes.json），所有配置共用一次 GT 规范化、
+# 同一个进程池和词表 / 规范化缓存，最后写一张汇总对比表。
+import sys
+import os
+# 动态计算项目根目录 (scripts/xx/xx.py -> ../../ -> root)
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "../../"))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+import argparse
+import json
+
+from src import dataset
+from src.edit_distance import BACKENDS, DEFAULT_BACKEND
+from src.alignment import HIRSCHBERG_CELLS
+from src.pipeline import normalize_gt, build_items, run_modes, task_key
+from src.manifest import DEFAULT_CONFIGS, resolve_configs, load_manifest, describe, write_comparison_table
+from src.vocab import Vocab
+from src.normalization import NormalizationCache, attach_normalized
+from src.cache import DEFAULT_CACHE_PATH
+from src.page_cache import PageResultCache, PAGE_ANALYSIS_FINGERPRINT
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+FOX_DIR = os.path.join(PROJECT_ROOT, "data", "Fox")
+EXP_DIR = os.path.join(FOX_DIR, "exp_fox100")
+
+GT_PATH = os.path.join(EXP_DIR, "en_page_ocr_100.json")
+VOCAB_PATH = os.path.join(EXP_DIR, "fox100_vocab.json")
+SUMMARY_PATH = os.path.join(EXP_DIR, "fox100_summary.json")
+COMPARISON_PATH = os.path.join(EXP_DIR, "fox100_comparison.md")
+
+
+def mode_paths(mode):
+    return {
+        "pred": os.path.join(EXP_DIR, f"preds_{mode}.json"),
+        "stats": os.path.join(EXP_DIR, f"stats_{mode}_pages.json"),
+        "errors": os.path.join(EXP_DIR, f"fox100_errors_{mode}.jsonl"),
+        "typed": os.path.join(EXP_DIR, f"fox100_errors_{mode}_typed.jsonl"),
+        "repetition": os.path.join(EXP_DIR, f"fox100_repetition_{mode}.json"),
+    }
+
+
+def print_summary(s):
+    mode = s["mode"]
+    print(f"\n=== {mode} ===")
+    print(f"整体 CER           : {s['overall_cer']:.4%}  ({s['total_edit_distance']} / {s['total_chars']})")
+    if "n_loop_pages" in s:
+        print(f"重复循环页面数     : {s['n_loop_pages']} / {s['n_pages']}")
+
+    total_err = s["total_err"]
+    print(f"总错误数           : {total_err}")
+    if total_err == 0:
+        return
+    print(f"关键类型错误数     : {s['critical_err']}  "
+          f"({s['critical_err']/total_err:.2%} of errors)")
+    print(f"错误总权重 ECI_all : {s['total_weight']:.2f}")
+    print(f"关键错误权重 ECI_crit : {s['critical_weight']:.2f}  "
+          f"({s['critical_weight']/s['total_weight']:.2%} of weight)")
+    print("类型分布：")
+    for t, c in s["type_counts"].items():
+        print(f"  {t:12s} {c:6d}  ({c/total_err:6.2%})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fox-100 融合评测流水线（CER + 对齐 + 类型 + ECI）")
+    parser.add_argument("--backend", choices=sorted(BACKENDS), default=DEFAULT_BACKEND,
+                        help="CER 编辑距离后端")
+    parser.add_argument("--workers", type=int, default=1, help="并行进程数")
+    parser.add_argument("--max-cells", type=int, default=HIRSCHBERG_CELLS,
+                        help="n*m 超过该值的页面改用 Hirschberg 线性空间对齐")
+    parser.add_argument("--manifest", default=None,
+                        help="配置清单 JSON（默认只跑 vt64 / vt100）")
+    parser.add_argument("--norm-cache", default=DEFAULT_CACHE_PATH,
+                        help="规范化结果缓存文件（SQLite）")
+    parser.add_argument("--no-norm-cache", action="store_true",
+                        help="不使用规范化缓存，每次现算")
+    parser.add_argument("--page-cache", default=DEFAULT_CACHE_PATH,
+                        help="逐页结果缓存文件（SQLite），只重算 GT / 预测有变化的页面")
+    parser.add_argument("--no-page-cache", action="store_true",
+                        help="不使用逐页结果缓存，全部重算")
+    parser.add_argument("--repetition", action="store_true",
+                        help="检测预测里的重复循环，写出 fox100_repetition_{mode}.json，"
+                             "循环区间里的错误归为 hallucinated_repetition 类型")
+    args = parser.parse_args()
+
+    norm_cache = None if args.no_norm_cache else NormalizationCache(args.norm_cache)
+    page_cache = None if args.no_page_cache else PageResultCache(
+        "page_analysis", PAGE_ANALYSIS_FINGERPRINT, path=args.page_cache, key=task_key)
+
+    print("GT_PATH:", GT_PATH)
+    gt_norm = normalize_gt(dataset.load_gt(GT_PATH), cache=norm_cache)
+    print(f"读取并规范化 GT 条目数: {len(gt_norm)}")
+
+    vocab = Vocab.load(VOCAB_PATH) if os.path.exists(VOCAB_PATH) else Vocab()
+
+    if args.manifest:
+        configs = load_manifest(args.manifest, EXP_DIR)
+    else:
+        configs = resolve_configs(DEFAULT_CONFIGS, EXP_DIR)
+
+    runs = []
+    for cfg in configs:
+        mode = cfg["name"]
+        if not os.path.exists(cfg["pred"]):
+            print(f"⚠ 找不到 {cfg['pred']}，跳过 {mode}")
+            continue
+        print(f"\n--- 读取 {mode}（{describe(cfg)}）---")
+        items = attach_normalized(build_items(gt_norm, dataset.load_pred(cfg["pred"])),
+                                  norm_cache, fields=("pred",))
+        paths = mode_paths(mode)
+        paths["pred"] = cfg["pred"]
+        runs.append((mode, paths, items))
+
+    print(f"\n共 {len(runs)} 个配置、{sum(len(r[2]) for r in runs)} 页，进程数 = {args.workers}")
+    summaries = run_modes(runs, vocab, backend=args.backend,
+                          max_cells=args.max_cells, workers=args.workers, page_cache=page_cache,
+                          repetition=args.repetition)
+    for s in summaries:
+        print_summary(s)
+
+    if norm_cache is not None:
+        print(f"\n规范化缓存: 命中 {norm_cache.hits}，新算 {norm_cache.misses}")
+        norm_cache.close()
+    if page_cache is not None:
+        print(f"逐页结果缓存: 命中 {page_cache.hits} 页，重算 {page_cache.misses} 页")
+        page_cache.close()
+
+    vocab.save(VOCAB_PATH)
+    with open(SUMMARY_PATH, "w", encoding="utf-8") as f:
+        json.dump(summaries, f, ensure_ascii=False, indent=2)
+    write_comparison_table(COMPARISON_PATH, summaries, configs)
+    print(f"\n✅ 汇总已保存到: {SUMMARY_PATH}")
+    print(f"✅ 对比表已保存到: {COMPARISON_PATH}")
+
+
+if __name__ == "__main__":
+    main()
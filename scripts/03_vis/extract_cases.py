@@ -6,10 +6,18 @@ PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "../../")
 if PROJECT_ROOT not in sys.path:
     sys.path.insert(0, PROJECT_ROOT)
 
+import argparse
 import json
 import random
+from collections import Counter
+
+import numpy as np
 
 from src.metrics import CRITICAL_TYPES
+from src.error_store import open_error_store
+from src.jsonl_index import JsonlIndex
+from src.manifest import DEFAULT_CONFIGS, resolve_configs, load_manifest
+from src.reservoir import StratifiedReservoir, QuotaRule
 
 random.seed(42)
 
@@ -18,53 +26,215 @@ SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
 FOX_DIR = os.path.join(PROJECT_ROOT, "data", "Fox")
 EXP_DIR = os.path.join(FOX_DIR, "exp_fox100")
 
-def load_typed_errors(path):
-    errors = []
+CASES_MD_PATH = os.path.join(EXP_DIR, "fox100_cases_sample.md")
+
+class CaseSampler:
+    """
+    只有抽中的 k 条记录需要 json.loads：
+      - 候选行和分层键来自列式错误库的整数编码列，是对整列的 numpy 运算（O(n)，但不解析 JSON）；
+      - 抽中的行号再通过 JSONL 行偏移索引（mmap）直接定位读取，其余行一概不解析。
+    错误库或行索引不存在 / 过期时，打开时会先完整扫一遍 JSONL 重建（之后复用或增量刷新）。
+    """
+
+    def __init__(self, path):
+        self.store = open_error_store(path)
+        self.index = JsonlIndex(path)
+        if len(self.index) != len(self.store):
+            raise ValueError(f"{path}: 索引行数 {len(self.index)} 与错误库行数 {len(self.store)} 不一致")
+
+    def candidates(self, where=None):
+        return np.flatnonzero(self.store.mask(where)).tolist()
+
+    def strata(self, ids, by):
+        """按 by 里的列把候选行分组：{(值, ...): [行号, ...]}，组内保持原顺序；只解码每组的键。"""
+        if not by:
+            return {(): ids}
+        if not ids:
+            return {}
+        rows = np.asarray(ids, dtype=np.int64)
+        codes = np.stack([self.store.codes(c)[rows].astype(np.int64) for c in by], axis=1)
+        keys, inverse = np.unique(codes, axis=0, return_inverse=True)
+        inverse = inverse.ravel()
+        bounds = np.cumsum(np.bincount(inverse, minlength=len(keys)))[:-1]
+        parts = np.split(rows[np.argsort(inverse, kind="stable")], bounds)
+        values = [self.store.decode(c, keys[:, j]) for j, c in enumerate(by)]
+        groups = {tuple(v[g] for v in values): part.tolist() for g, part in enumerate(parts)}
+        return dict(sorted(groups.items()))
+
+    def sample(self, ids, k, rng=random):
+        """与对完整记录列表做 random.sample 抽到的是同样位置的记录。"""
+        return self.index.read_many(rng.sample(ids, min(k, len(ids))))
+
+    def close(self):
+        self.store.close()
+        self.index.close()
+
+
+def print_case(e, mode):
+    img = e["image"]
+    t = e.get("type")
+    op = e["op"]
+    gt_prev = e.get("gt_prev", "")
+    gt_tok = e.get("gt_token", "")
+    gt_next = e.get("gt_next", "")
+    pred_tok = e.get("pred_token", "")
+
+    print(f"[{img}][{mode}][{t}][{op}]")
+    print(f"  GT  : ... {gt_prev} {gt_tok} {gt_next} ...")
+    print(f"  PRED: ... {pred_tok} ...")
+    print()
+
+
+def iter_errors(path):
+    # 逐行流式读取，不把整个错误日志读进内存
     with open(path, "r", encoding="utf-8") as f:
         for line in f:
-            line = line.strip()
-            if not line:
+            if line.strip():
+                yield json.loads(line)
+
+
+def reservoir_sample(paths, fields, k, quotas, seed, types=None):
+    """
+    对各模式的错误流只扫一遍，每层（fields 的取值组合）一个蓄水池；
+    返回 (StratifiedReservoir, {mode: 候选条数})。内存只与层数 × 配额有关。
+    """
+    sampler = StratifiedReservoir(fields, k=k, quotas=quotas, seed=seed)
+    n_candidates = Counter()
+    for mode, path in paths.items():
+        for rec in iter_errors(path):
+            if types is not None and rec.get("type") not in types:
                 continue
-            errors.append(json.loads(line))
-    return errors
+            rec["mode"] = mode
+            n_candidates[mode] += 1
+            sampler.add(rec)
+    return sampler, n_candidates
+
+
+def _code(s):
+    # Markdown 行内代码：内容里有反引号时换成双反引号包裹
+    return f"`` {s} ``" if "`" in s else f"`{s}`"
 
-def main():
-    vt64_path = os.path.join(EXP_DIR, "fox100_errors_vt64_typed.jsonl")
-    vt100_path = os.path.join(EXP_DIR, "fox100_errors_vt100_typed.jsonl")
 
-    vt64_errs = load_typed_errors(vt64_path)
-    vt100_errs = load_typed_errors(vt100_path)
+def write_cases_markdown(path, strata, modes, fields, k, seed):
+    """按 results/reports/Fox_cases.md 的格式写出抽样案例，每层一节。"""
+    lines = [
+        f"# Fox-100 关键错误案例抽样（{' vs '.join(modes)}）",
+        "",
+        f"按 {' × '.join(fields)} 分层蓄水池抽样，每层默认 {k} 条，seed = {seed}；",
+        "下面的 GT / PRED 片段直接来自带类型的错误日志。",
+        "",
+        "---",
+        "",
+    ]
+    for key, res in strata.items():
+        lines.append(f"## {' / '.join(map(str, key))}（抽样 {len(res.items)} / 共 {res.n_seen} 条）")
+        lines.append("")
+        for e in res.sample():
+            gt = f"GT  : ... {e.get('gt_prev', '')} {e.get('gt_token', '')} {e.get('gt_next', '')} ..."
+            pred = f"PRED: ... {e.get('pred_token', '')} ..."
+            lines.append(f"- **页面**：`{e['image']}`，{e.get('type')}[{e['op']}]")
+            lines.append(f"  - {_code(gt)}")
+            lines.append(f"  - {_code(pred)}")
+        lines += ["", "---", ""]
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("\n".join(lines))
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Fox-100 关键错误案例抽样")
+    parser.add_argument("--k", type=int, default=20, help="每个模式（分层时为每层）抽多少条")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--stratify", nargs="*", default=None,
+                        choices=["type", "op", "mode", "image"],
+                        help="除模式外再按这些列分层，每层各抽 k 条"
+                             "（默认 reservoir 按 type op 分层，index 不分层）")
+    parser.add_argument("--quota", nargs="*", default=[], metavar="RULE",
+                        help="每层配额，如 type=number:10  mode=vt64,op=ins:5  op=del:0（0 表示跳过该层）；"
+                             "只对 reservoir 有效")
+    parser.add_argument("--method", choices=["reservoir", "index"], default="reservoir",
+                        help="reservoir：一遍流式分层蓄水池抽样，内存与日志大小无关；"
+                             "index：列式库 + 行偏移索引上做 random.sample（与旧版抽样结果相同）")
+    parser.add_argument("--all-types", action="store_true", help="所有错误类型都参与抽样（默认只抽关键类型）")
+    parser.add_argument("--manifest", default=None, help="配置清单 JSON（默认 vt64 / vt100）")
+    parser.add_argument("--md", default=CASES_MD_PATH, help="Markdown 案例文件路径（reservoir）")
+    return parser.parse_args()
+
+
+def typed_paths(args):
+    if args.manifest:
+        configs = load_manifest(args.manifest, EXP_DIR)
+    else:
+        configs = resolve_configs(DEFAULT_CONFIGS, EXP_DIR)
+    paths = {}
+    for cfg in configs:
+        path = os.path.join(EXP_DIR, f"fox100_errors_{cfg['name']}_typed.jsonl")
+        if os.path.exists(path):
+            paths[cfg["name"]] = path
+        else:
+            print(f"⚠ 找不到 {path}，跳过 {cfg['name']}")
+    return paths
+
+
+def main_reservoir(args, paths):
+    fields = ["mode"] + [c for c in (["type", "op"] if args.stratify is None else args.stratify) if c != "mode"]
+    quotas = [QuotaRule.parse(q) for q in args.quota]
+    types = None if args.all_types else CRITICAL_TYPES
+    sampler, n_candidates = reservoir_sample(paths, fields, args.k, quotas, args.seed, types)
+
+    for mode in paths:
+        print(f"{mode} {'' if args.all_types else '关键'}错误数:", n_candidates[mode])
+    print()
+
+    modes = list(paths)
+    strata = sampler.strata()
+    strata = {key: strata[key] for key in sorted(strata, key=lambda key: modes.index(key[0]))}
+    for key, res in strata.items():
+        print(f"=== [{' / '.join(map(str, key))}] 抽样 {len(res.items)} / {res.n_seen} 条 ===")
+        for e in res.sample():
+            print_case(e, key[0])
+
+    write_cases_markdown(args.md, strata, modes, fields, args.k, args.seed)
+    print(f"✅ 案例已保存到: {args.md}")
+
+
+def main_index(args, paths):
+    samplers = {mode: CaseSampler(path) for mode, path in paths.items()}
 
     # 只要关键类型
-    vt64_crit = [e for e in vt64_errs if e.get("type") in CRITICAL_TYPES]
-    vt100_crit = [e for e in vt100_errs if e.get("type") in CRITICAL_TYPES]
+    where = None if args.all_types else {"type": CRITICAL_TYPES}
+    crit_ids = {mode: s.candidates(where=where) for mode, s in samplers.items()}
 
-    print("vt64 关键错误数:", len(vt64_crit))
-    print("vt100 关键错误数:", len(vt100_crit))
+    for mode in samplers:
+        print(f"{mode} 关键错误数:", len(crit_ids[mode]))
     print()
 
-    random.seed(42)
-
-    def show_sample(errors, mode, k=20):
-        n = min(k, len(errors))
-        print(f"=== {mode} 随机抽样 {n} 条关键错误 ===")
-        for e in random.sample(errors, n):
-            img = e["image"]
-            t = e.get("type")
-            op = e["op"]
-            gt_prev = e.get("gt_prev", "")
-            gt_tok = e.get("gt_token", "")
-            gt_next = e.get("gt_next", "")
-            pred_tok = e.get("pred_token", "")
-
-            print(f"[{img}][{mode}][{t}][{op}]")
-            print(f"  GT  : ... {gt_prev} {gt_tok} {gt_next} ...")
-            print(f"  PRED: ... {pred_tok} ...")
+    random.seed(args.seed)
+
+    def show_sample(mode, k=args.k):
+        sampler = samplers[mode]
+        for key, ids in sampler.strata(crit_ids[mode], args.stratify or []).items():
+            n = min(k, len(ids))
+            label = f"[{' / '.join(map(str, key))}] " if key else ""
+            print(f"=== {mode} {label}随机抽样 {n} 条关键错误 ===")
+            for e in sampler.sample(ids, k):
+                print_case(e, mode)
+
+    for i, mode in enumerate(samplers):
+        if i:
             print()
+        show_sample(mode)
 
-    show_sample(vt64_crit, "vt64")
-    print()
-    show_sample(vt100_crit, "vt100")
+    for s in samplers.values():
+        s.close()
+
+
+def main():
+    args = parse_args()
+    paths = typed_paths(args)
+    if args.method == "reservoir":
+        main_reservoir(args, paths)
+    else:
+        main_index(args, paths)
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,143 @@
+# 词级对齐基准：比较 align_tokens（NumPy 波前）和 align_tokens_reference（列表版 DP）
+# 的耗时与峰值内存，并顺便确认两者输出的 ops 完全一致。
+# --hier：多行页面上比较整页对齐 align_tokens 与分层对齐 align_lines 的耗时和编辑代价。
+# --anchored：比较整页对齐与 patience 锚点切段对齐 align_tokens_anchored 的耗时和编辑代价。
+import sys
+import os
+# 动态计算项目根目录 (scripts/xx/xx.py -> ../../ -> root)
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "../../"))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+import argparse
+import random
+import time
+import tracemalloc
+
+from src.alignment import (align_tokens, align_tokens_reference, align_lines, align_tokens_anchored,
+                           ops_cost, check_ops)
+
+IMPLS = {
+    "reference": align_tokens_reference,
+    "wavefront": align_tokens,
+}
+
+
+def make_page(n_tokens, error_rate, rng):
+    """造一对 GT / pred token 序列：词表近似 Zipf，pred 按 error_rate 随机增删改。"""
+    vocab = [f"w{k}" for k in range(2000)]
+    weights = [1.0 / (k + 1) for k in range(len(vocab))]
+    gt = rng.choices(vocab, weights=weights, k=n_tokens)
+    pred = []
+    for tok in gt:
+        r = rng.random()
+        if r < error_rate / 3:
+            continue                                            # del
+        if r < 2 * error_rate / 3:
+            pred.append(rng.choices(vocab, weights=weights)[0])  # sub
+            continue
+        pred.append(tok)
+        if r < error_rate:
+            pred.append(rng.choices(vocab, weights=weights)[0])  # ins
+    return gt, pred
+
+
+def split_into_lines(tokens, rng, words_per_line=12):
+    """按大约 words_per_line 个词一行切开（行长随机浮动）。"""
+    lines, k = [], 0
+    while k < len(tokens):
+        step = max(1, words_per_line + rng.randint(-4, 4))
+        lines.append(tokens[k:k + step])
+        k += step
+    return lines
+
+
+def make_lined_page(n_tokens, error_rate, rng):
+    """多行页面：GT 先切行，错误只落在部分行里，其余行原样保留（与 OCR 的实际情况相近）。"""
+    gt, _ = make_page(n_tokens, 0.0, rng)
+    gt_lines = split_into_lines(gt, rng)
+    pred_lines = []
+    for line in gt_lines:
+        if rng.random() < error_rate * 3:
+            noisy = [t if rng.random() > 0.3 else f"x{rng.randint(0, 99)}" for t in line]
+            pred_lines.append(noisy)
+        else:
+            pred_lines.append(list(line))
+    return gt_lines, pred_lines
+
+
+def bench_hier(sizes, error_rate, rng):
+    print(f"{'n_tokens':>8s} {'flat(s)':>9s} {'hier(s)':>9s} {'flat代价':>9s} {'hier代价':>9s}")
+    for n in sizes:
+        gt_lines, pred_lines = make_lined_page(n, error_rate, rng)
+        gt = [t for line in gt_lines for t in line]
+        pred = [t for line in pred_lines for t in line]
+        t0 = time.perf_counter()
+        flat = align_tokens(gt, pred)
+        t1 = time.perf_counter()
+        hier = align_lines(gt_lines, pred_lines)
+        t2 = time.perf_counter()
+        check_ops(hier, len(gt), len(pred))
+        print(f"{n:8d} {t1 - t0:9.3f} {t2 - t1:9.3f} {ops_cost(flat):9d} {ops_cost(hier):9d}")
+
+
+def bench_anchored(sizes, error_rate, rng):
+    print(f"{'n_tokens':>8s} {'flat(s)':>9s} {'anchor(s)':>9s} {'flat代价':>9s} {'anchor代价':>9s}")
+    for n in sizes:
+        gt, pred = make_page(n, error_rate, rng)
+        t0 = time.perf_counter()
+        flat = align_tokens(gt, pred)
+        t1 = time.perf_counter()
+        anchored = align_tokens_anchored(gt, pred)
+        t2 = time.perf_counter()
+        check_ops(anchored, len(gt), len(pred))
+        print(f"{n:8d} {t1 - t0:9.3f} {t2 - t1:9.3f} {ops_cost(flat):9d} {ops_cost(anchored):9d}")
+
+
+def measure(func, gt, pred):
+    tracemalloc.start()
+    t0 = time.perf_counter()
+    ops = func(gt, pred)
+    elapsed = time.perf_counter() - t0
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return ops, elapsed, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description="align_tokens 时间 / 峰值内存基准")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[200, 500, 1000, 1500])
+    parser.add_argument("--error-rate", type=float, default=0.1)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--skip-reference-above", type=int, default=2000,
+                        help="token 数超过该值时不再跑列表版 DP（太慢、太占内存）")
+    parser.add_argument("--hier", action="store_true",
+                        help="改为比较整页对齐与分层（行 -> 词）对齐")
+    parser.add_argument("--anchored", action="store_true",
+                        help="改为比较整页对齐与 patience 锚点切段对齐")
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    if args.hier:
+        bench_hier(args.sizes, args.error_rate, rng)
+        return
+    if args.anchored:
+        bench_anchored(args.sizes, args.error_rate, rng)
+        return
+    print(f"{'n_tokens':>8s} {'impl':>10s} {'time(s)':>9s} {'peak(MB)':>9s}")
+    for n in args.sizes:
+        gt, pred = make_page(n, args.error_rate, rng)
+        results = {}
+        for name, func in IMPLS.items():
+            if name == "reference" and n > args.skip_reference_above:
+                continue
+            ops, elapsed, peak = measure(func, gt, pred)
+            results[name] = ops
+            print(f"{n:8d} {name:>10s} {elapsed:9.3f} {peak / 2**20:9.1f}")
+        if len(results) == 2:
+            same = results["reference"] == results["wavefront"]
+            print(f"{'':8s} {'ops 一致':>10s} {'✅' if same else '❌'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+# 错误类型分类基准：在带类型的 vt64 错误日志上比较 guess_type（逐条跑正则）
+# 和 classify_many（合并正则 + 记忆化）的耗时，并确认两者结果逐条一致。
+import sys
+import os
+# 动态计算项目根目录 (scripts/xx/xx.py -> ../../ -> root)
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "../../"))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+import argparse
+import json
+import time
+
+from src.taxonomy import guess_type, classify, classify_many
+
+FOX_DIR = os.path.join(PROJECT_ROOT, "data", "Fox")
+EXP_DIR = os.path.join(FOX_DIR, "exp_fox100")
+
+TYPED_VT64 = os.path.join(EXP_DIR, "fox100_errors_vt64_typed.jsonl")
+
+
+def load_tokens(path):
+    """与 3_tag_errors 相同：优先用 gt_token，没有就用 pred_token；同时带回文件里记录的类型。"""
+    tokens, types = [], []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            rec = json.loads(line)
+            tokens.append(rec.get("gt_token") or rec.get("pred_token") or "")
+            types.append(rec.get("type"))
+    return tokens, types
+
+
+def timeit(func, repeat):
+    best = float("inf")
+    out = None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        out = func()
+        best = min(best, time.perf_counter() - t0)
+    return out, best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="guess_type vs classify_many 基准")
+    parser.add_argument("--path", default=TYPED_VT64)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    tokens, file_types = load_tokens(args.path)
+    print(f"读取 {len(tokens)} 个错误 token（不同 token {len(set(tokens))} 个）: {args.path}")
+
+    ref, t_ref = timeit(lambda: [guess_type(t) for t in tokens], args.repeat)
+
+    # 只看合并正则本身（绕过记忆化）
+    nomemo, t_nomemo = timeit(lambda: [classify.__wrapped__(t) for t in tokens], args.repeat)
+
+    def cold():
+        classify.cache_clear()
+        return classify_many(tokens)
+
+    fast_cold, t_cold = timeit(cold, args.repeat)
+    fast_warm, t_warm = timeit(lambda: classify_many(tokens), args.repeat)
+
+    assert nomemo == ref and fast_cold == ref and fast_warm == ref, "classify_many 与 guess_type 结果不一致"
+    n_diff_file = sum(1 for a, b in zip(ref, file_types) if b is not None and a != b)
+
+    print(f"{'guess_type':24s} {t_ref * 1e3:9.2f} ms")
+    print(f"{'合并正则（不缓存）':20s} {t_nomemo * 1e3:9.2f} ms  ({t_ref / t_nomemo:5.1f}x)")
+    print(f"{'classify_many（冷缓存）':20s} {t_cold * 1e3:9.2f} ms  ({t_ref / t_cold:5.1f}x)")
+    print(f"{'classify_many（热缓存）':20s} {t_warm * 1e3:9.2f} ms  ({t_ref / t_warm:5.1f}x)")
+    print(f"✅ 结果一致；与文件中已有 type 字段不同的记录: {n_diff_file}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,501 @@
+# 词级对齐。2_align_errors.py 用它生成 eq/sub/ins/del 操作序列。
+
+from bisect import bisect_left
+
+import numpy as np
+
+from src.edit_distance import levenshtein_bitparallel
+
+# 回溯表里的操作编码（uint8）
+OP_EQ, OP_SUB, OP_DEL, OP_INS = 0, 1, 2, 3
+OP_NAMES = ("eq", "sub", "del", "ins")
+
+# 对齐结果的版本：平局时的操作优先级等会改变输出的规则一改就加一，逐页结果缓存据此失效
+ALIGNMENT_VERSION = 1
+
+
+# ========== 1. 参考实现：列表版 DP ==========
+
+def align_tokens_reference(gt_tokens, pred_tokens):
+    """
+    用 Levenshtein 在“词级”上对齐，返回一个操作序列：
+    每个元素: {"op": "eq/sub/ins/del", "gt_idx": int or None, "pred_idx": int or None}
+    dp / back 都是 Python 二维列表，内存占用大，只作为对照答案保留。
+    """
+    n, m = len(gt_tokens), len(pred_tokens)
+    dp = [[0] * (m + 1) for _ in range(n + 1)]
+    back = [[None] * (m + 1) for _ in range(n + 1)]
+
+    # 初始化边界：全删 / 全插入
+    for i in range(1, n + 1):
+        dp[i][0] = i
+        back[i][0] = ("del", i - 1, 0)
+    for j in range(1, m + 1):
+        dp[0][j] = j
+        back[0][j] = ("ins", 0, j - 1)
+
+    # 动态规划
+    for i in range(1, n + 1):
+        for j in range(1, m + 1):
+            if gt_tokens[i - 1] == pred_tokens[j - 1]:
+                dp[i][j] = dp[i - 1][j - 1]
+                back[i][j] = ("eq", i - 1, j - 1)
+            else:
+                del_cost = dp[i - 1][j] + 1
+                ins_cost = dp[i][j - 1] + 1
+                sub_cost = dp[i - 1][j - 1] + 1
+
+                best = min(del_cost, ins_cost, sub_cost)
+                dp[i][j] = best
+                if best == sub_cost:
+                    back[i][j] = ("sub", i - 1, j - 1)
+                elif best == del_cost:
+                    back[i][j] = ("del", i - 1, j)
+                else:
+                    back[i][j] = ("ins", i, j - 1)
+
+    # 回溯，生成操作序列
+    i, j = n, m
+    ops = []
+    while i > 0 or j > 0:
+        op, pi, pj = back[i][j]
+
+        if op in ("eq", "sub"):
+            gt_idx = i - 1
+            pred_idx = j - 1
+        elif op == "del":
+            gt_idx = i - 1
+            pred_idx = None
+        elif op == "ins":
+            gt_idx = None
+            pred_idx = j - 1
+        else:
+            raise ValueError(f"未知操作: {op}")
+
+        ops.append({
+            "op": op,
+            "gt_idx": gt_idx,
+            "pred_idx": pred_idx,
+        })
+
+        i, j = pi, pj
+
+    ops.reverse()
+    return ops
+
+
+# ========== 2. 紧凑数组 + 反对角线波前 ==========
+
+def encode_tokens(gt_tokens, pred_tokens):
+    """
+    把两侧 token 映射成同一套整数 id（int32 数组），之后只比较整数。
+    如果传进来的已经是整数数组（例如 Vocab.encode 的结果），直接使用，不再重新编码。
+    """
+    if isinstance(gt_tokens, np.ndarray) and isinstance(pred_tokens, np.ndarray):
+        return gt_tokens.astype(np.int32, copy=False), pred_tokens.astype(np.int32, copy=False)
+
+    ids = {}
+    a = np.fromiter((ids.setdefault(t, len(ids)) for t in gt_tokens),
+                    dtype=np.int32, count=len(gt_tokens))
+    b = np.fromiter((ids.setdefault(t, len(ids)) for t in pred_tokens),
+                    dtype=np.int32, count=len(pred_tokens))
+    return a, b
+
+
+def _trivial_ops(n, m, gt_off=0, pred_off=0):
+    # 一侧为空：全删或全插
+    if m == 0:
+        return [{"op": "del", "gt_idx": gt_off + i, "pred_idx": None} for i in range(n)]
+    return [{"op": "ins", "gt_idx": None, "pred_idx": pred_off + j} for j in range(m)]
+
+
+def _wavefront_ops(a, b, gt_off=0, pred_off=0):
+    """
+    在整数数组 a, b 上做波前 DP + 回溯。gt_off / pred_off 会加到输出的下标上，
+    这样 Hirschberg 的子问题也能直接复用。
+    """
+    n, m = len(a), len(b)
+    if n == 0 or m == 0:
+        return _trivial_ops(n, m, gt_off, pred_off)
+
+    b_rev = b[::-1].copy()
+    width = m + 1
+
+    dp = np.empty((n + 1) * width, dtype=np.int32)
+    back = np.empty((n + 1) * width, dtype=np.uint8)
+
+    # 边界：第 0 行全插入，第 0 列全删除
+    dp[:width] = np.arange(width, dtype=np.int32)
+    back[:width] = OP_INS
+    dp[::width] = np.arange(n + 1, dtype=np.int32)
+    back[::width] = OP_DEL
+
+    for d in range(2, n + m + 1):
+        i_lo = max(1, d - m)
+        i_hi = min(n, d - 1)
+        if i_lo > i_hi:
+            continue
+        # 格子 (i, d-i) 在一维数组中的下标是 i*m + d
+        start = i_lo * m + d
+        stop = i_hi * m + d + 1
+        cells = slice(start, stop, m)
+
+        diag = dp[start - width - 1:stop - width - 1:m]
+        up = dp[start - width:stop - width:m]
+        left = dp[start - 1:stop - 1:m]
+
+        # gt[i-1] 与 pred[d-i-1] 比较；pred 反转后也是连续切片
+        eq = a[i_lo - 1:i_hi] == b_rev[m - d + i_lo:m - d + i_hi + 1]
+
+        sub_cost = diag + 1
+        del_cost = up + 1
+        ins_cost = left + 1
+        best = np.minimum(np.minimum(sub_cost, del_cost), ins_cost)
+
+        op = np.where(best == sub_cost, OP_SUB,
+                      np.where(best == del_cost, OP_DEL, OP_INS)).astype(np.uint8)
+        op[eq] = OP_EQ
+        best[eq] = diag[eq]
+
+        dp[cells] = best
+        back[cells] = op
+
+    # 回溯，生成操作序列
+    i, j = n, m
+    ops = []
+    while i > 0 or j > 0:
+        op = int(back[i * width + j])
+        if op == OP_EQ or op == OP_SUB:
+            ops.append({"op": OP_NAMES[op], "gt_idx": gt_off + i - 1, "pred_idx": pred_off + j - 1})
+            i -= 1
+            j -= 1
+        elif op == OP_DEL:
+            ops.append({"op": "del", "gt_idx": gt_off + i - 1, "pred_idx": None})
+            i -= 1
+        else:
+            ops.append({"op": "ins", "gt_idx": None, "pred_idx": pred_off + j - 1})
+            j -= 1
+
+    ops.reverse()
+    return ops
+
+
+def align_tokens(gt_tokens, pred_tokens):
+    """
+    与 align_tokens_reference 输出完全相同的操作序列（包括 sub > del > ins 的平局规则），
+    但代价矩阵用 int32、回溯表用 uint8 的 NumPy 数组保存，每格 5 字节。
+
+    填表按反对角线 d = i + j 推进：同一条反对角线上的格子只依赖 d-1、d-2 两条线，
+    可以一次向量化算完。在按行展开的一维数组里，反对角线正好是步长为 m 的切片，
+    所以不需要花式索引。
+    """
+    a, b = encode_tokens(gt_tokens, pred_tokens)
+    return _wavefront_ops(a, b)
+
+
+# ========== 3. Hirschberg 线性空间对齐 ==========
+
+# 单页 n*m 超过这个格子数就改用 Hirschberg（波前版每格 5 字节，约 80MB）
+HIRSCHBERG_CELLS = 16_000_000
+# 递归到子问题不超过这么多格子时，直接整块填表回溯
+HIRSCHBERG_LEAF_CELLS = 1 << 18
+
+
+def _next_row(prev, i, a_i, b, cols):
+    """
+    由第 i-1 行算第 i 行：先取 min(删除, 替换/相等)，行内“插入”依赖
+    curr[j] = min(base[j], curr[j-1] + 1) 是前缀扫描，
+    等价于 curr[j] = j + min_{k<=j}(base[k] - k)，用 minimum.accumulate 一次算完。
+    """
+    base = np.empty_like(prev)
+    base[0] = i
+    np.minimum(prev[1:] + 1, prev[:-1] + (b != a_i), out=base[1:])
+    return np.minimum.accumulate(base - cols) + cols
+
+
+def _trace_block(a, b, r0, r1, row0, c1, ops_rev):
+    """
+    已知全局 DP 第 r0 行的前 c1+1 列 row0，找出参考回溯路径从 (r1, c1) 倒着走到第 r0 行的那一段，
+    把操作按倒序追加到 ops_rev，返回路径落在第 r0 行的列号。
+
+    与经典 Hirschberg 一样按行二分：先线性空间地推出中间行，递归解决下半块得到路径穿过中间行的列，
+    再递归上半块。不同之处在于子问题都从“真实的全局 DP 行”出发，回溯时的平局判断
+    (sub > del > ins) 与 align_tokens_reference 看到的数值完全相同，所以输出的 ops 也完全相同。
+    """
+    bb = b[:c1]
+    cols = np.arange(c1 + 1, dtype=np.int64)
+
+    if r1 - r0 <= 1 or (r1 - r0) * (c1 + 1) <= HIRSCHBERG_LEAF_CELLS:
+        back = np.empty((r1 - r0, c1 + 1), dtype=np.uint8)
+        prev = row0
+        for k, i in enumerate(range(r0 + 1, r1 + 1)):
+            curr = _next_row(prev, i, a[i - 1], bb, cols)
+            eq = bb == a[i - 1]
+            op = np.where(curr[1:] == prev[:-1] + 1, OP_SUB,
+                          np.where(curr[1:] == prev[1:] + 1, OP_DEL, OP_INS))
+            op[eq] = OP_EQ
+            back[k, 0] = OP_DEL
+            back[k, 1:] = op
+            prev = curr
+
+        i, j = r1, c1
+        while i > r0:
+            op = int(back[i - r0 - 1, j])
+            if op == OP_EQ or op == OP_SUB:
+                ops_rev.append({"op": OP_NAMES[op], "gt_idx": i - 1, "pred_idx": j - 1})
+                i -= 1
+                j -= 1
+            elif op == OP_DEL:
+                ops_rev.append({"op": "del", "gt_idx": i - 1, "pred_idx": None})
+                i -= 1
+            else:
+                ops_rev.append({"op": "ins", "gt_idx": None, "pred_idx": j - 1})
+                j -= 1
+        return j
+
+    mid = (r0 + r1) // 2
+    row_mid = row0
+    for i in range(r0 + 1, mid + 1):
+        row_mid = _next_row(row_mid, i, a[i - 1], bb, cols)
+
+    j_mid = _trace_block(a, b, mid, r1, row_mid, c1, ops_rev)
+    del row_mid
+    return _trace_block(a, b, r0, mid, row0[:j_mid + 1], j_mid, ops_rev)
+
+
+def align_tokens_hirschberg(gt_tokens, pred_tokens):
+    """
+    Hirschberg 式分治对齐：输出与 align_tokens 完全相同的 eq/sub/ins/del 操作序列，
+    但任意时刻只保留 O(log n) 行代价向量和一个不超过 HIRSCHBERG_LEAF_CELLS 的回溯块，
+    内存与 n*m 无关。时间约为波前版的 O(log n) 倍。
+    适用于 vt64 陷入重复循环、pred 长到 8192 token 的病态页面。
+    """
+    a, b = encode_tokens(gt_tokens, pred_tokens)
+    n, m = len(a), len(b)
+    if n == 0 or m == 0:
+        return _trivial_ops(n, m)
+
+    ops_rev = []
+    row0 = np.arange(m + 1, dtype=np.int64)
+    j = _trace_block(a, b, 0, n, row0, m, ops_rev)
+    # 第 0 行只剩全插入
+    for k in range(j - 1, -1, -1):
+        ops_rev.append({"op": "ins", "gt_idx": None, "pred_idx": k})
+
+    ops_rev.reverse()
+    return ops_rev
+
+
+def align_tokens_auto(gt_tokens, pred_tokens, max_cells=HIRSCHBERG_CELLS):
+    """n*m 不超过 max_cells 时用 align_tokens，否则自动切换到 Hirschberg。"""
+    if len(gt_tokens) * len(pred_tokens) > max_cells:
+        return align_tokens_hirschberg(gt_tokens, pred_tokens)
+    return align_tokens(gt_tokens, pred_tokens)
+
+
+# ========== 4. 分层对齐：行 -> 词 -> 字符 ==========
+
+def _align_block(a, b, gt_off, pred_off, max_cells):
+    """对一个子块做词级对齐，下标加上偏移；过大的块同样切换到 Hirschberg。"""
+    if len(a) * len(b) > max_cells:
+        ops = align_tokens_hirschberg(a, b)
+        for step in ops:
+            if step["gt_idx"] is not None:
+                step["gt_idx"] += gt_off
+            if step["pred_idx"] is not None:
+                step["pred_idx"] += pred_off
+        return ops
+    return _wavefront_ops(a, b, gt_off, pred_off)
+
+
+def align_lines(gt_lines, pred_lines, max_cells=HIRSCHBERG_CELLS):
+    """
+    分层对齐。gt_lines / pred_lines 是“每行一个 token 序列”的列表，
+    返回的操作序列与 align_tokens 的格式相同，gt_idx / pred_idx 是把各行拼起来之后的全局下标。
+
+    1. 行级：每行按内容驻留成一个整数 id，用同一个 DP 对齐行序列；
+    2. 词级：完全相同的行直接逐词输出 eq，相邻两行 eq 之间的“缺口”（可能跨多行，
+       能处理断行 / 并行）各自单独做词级 DP。
+
+    一整页的 n*m 大矩阵变成若干个小块，页面越干净块越小。
+    结果是合法的对齐，但不保证与整页 DP 的编辑代价相同：行级 eq 锚点是按行序列最优选的，
+    极少数情况下整页 DP 会把某行的词拆给别处。
+    """
+    gt_len = [len(line) for line in gt_lines]
+    pred_len = [len(line) for line in pred_lines]
+    a, b = encode_tokens([t for line in gt_lines for t in line],
+                         [t for line in pred_lines for t in line])
+    ga = np.concatenate([[0], np.cumsum(gt_len, dtype=np.int64)])
+    pa = np.concatenate([[0], np.cumsum(pred_len, dtype=np.int64)])
+
+    line_ids = {}
+    la = np.fromiter((line_ids.setdefault(a[ga[i]:ga[i + 1]].tobytes(), len(line_ids))
+                      for i in range(len(gt_len))), dtype=np.int32, count=len(gt_len))
+    lb = np.fromiter((line_ids.setdefault(b[pa[j]:pa[j + 1]].tobytes(), len(line_ids))
+                      for j in range(len(pred_len))), dtype=np.int32, count=len(pred_len))
+    line_ops = align_tokens_auto(la, lb, max_cells=max_cells)
+
+    ops = []
+    gi, pj = 0, 0   # 当前缺口在 token 层面的起点
+
+    def flush(gi_end, pj_end):
+        if gi_end > gi or pj_end > pj:
+            ops.extend(_align_block(a[gi:gi_end], b[pj:pj_end], gi, pj, max_cells))
+
+    for step in line_ops:
+        if step["op"] != "eq":
+            continue
+        i, j = step["gt_idx"], step["pred_idx"]
+        flush(int(ga[i]), int(pa[j]))
+        gi, pj = int(ga[i]), int(pa[j])
+        for k in range(gt_len[i]):
+            ops.append({"op": "eq", "gt_idx": gi + k, "pred_idx": pj + k})
+        gi, pj = int(ga[i + 1]), int(pa[j + 1])
+    flush(len(a), len(b))
+    return ops
+
+
+# ========== 5. 锚点切分（patience diff）+ 缺口 DP ==========
+
+# 子问题不超过这么多格子时不再找锚点，直接 DP
+ANCHOR_LEAF_CELLS = 4096
+# 锚点所在的相等片段至少这么长才采用：孤立的唯一词常是预测里的巧合（例如重复循环里
+# 恰好出现一次的词），强制对上反而拉高编辑代价
+ANCHOR_MIN_RUN = 3
+
+
+def _lis(values):
+    """最长严格递增子序列（patience sorting，O(k log k)），返回所选元素的下标。"""
+    tails, tails_at, prev = [], [], [-1] * len(values)
+    for t, v in enumerate(values):
+        p = bisect_left(tails, v)
+        if p == len(tails):
+            tails.append(v)
+            tails_at.append(t)
+        else:
+            tails[p] = v
+            tails_at[p] = t
+        prev[t] = tails_at[p - 1] if p else -1
+    out = []
+    t = tails_at[-1] if tails_at else -1
+    while t >= 0:
+        out.append(t)
+        t = prev[t]
+    out.reverse()
+    return out
+
+
+def _run_length(a, b, i, j):
+    """以 (i, j) 为中心、两侧连续相等的 token 个数（含自身）。"""
+    lo = 0
+    while i - lo > 0 and j - lo > 0 and a[i - lo - 1] == b[j - lo - 1] and lo < ANCHOR_MIN_RUN:
+        lo += 1
+    hi = 0
+    while i + hi + 1 < len(a) and j + hi + 1 < len(b) and a[i + hi + 1] == b[j + hi + 1] and lo + hi < ANCHOR_MIN_RUN:
+        hi += 1
+    return lo + hi + 1
+
+
+def patience_anchors(a, b):
+    """
+    patience diff 的锚点：在 a、b 中都恰好出现一次的 token，按 gt 位置排序后
+    取 pred 位置的最长递增子序列，保证锚点两两不交叉；再去掉前后相等片段短于 ANCHOR_MIN_RUN 的锚点。
+    返回 (gt 下标列表, pred 下标列表)。
+    """
+    ua, ia, ca = np.unique(a, return_index=True, return_counts=True)
+    ub, ib, cb = np.unique(b, return_index=True, return_counts=True)
+    once_a, once_b = ca == 1, cb == 1
+    _, xa, xb = np.intersect1d(ua[once_a], ub[once_b], assume_unique=True, return_indices=True)
+    if len(xa) == 0:
+        return [], []
+    gi = ia[once_a][xa]
+    pj = ib[once_b][xb]
+    order = np.argsort(gi, kind="stable")
+    gi, pj = gi[order].tolist(), pj[order].tolist()
+    keep = [t for t in _lis(pj) if _run_length(a, b, gi[t], pj[t]) >= ANCHOR_MIN_RUN]
+    return [gi[t] for t in keep], [pj[t] for t in keep]
+
+
+def align_tokens_anchored(gt_tokens, pred_tokens, max_cells=HIRSCHBERG_CELLS):
+    """
+    先找 patience 锚点把页面切成互不相关的缺口，只在缺口里跑原来的 DP（_wavefront_ops，
+    过大的缺口照样切 Hirschberg）；缺口仍然很大时在缺口内部继续找锚点（缺口内唯一即可）。
+    GT 与预测大段相同的页面几乎是线性时间。
+
+    锚点是强制的 eq，所以编辑代价可能比整页 DP 大（例如唯一词在两侧位置相差太远），
+    用 anchored_cost_check 对照。
+    """
+    a, b = encode_tokens(gt_tokens, pred_tokens)
+    ops = []
+    # 显式栈代替递归：("seg", gi, gj, pi, pj) 或 ("eq", i, j)，后进先出所以倒序压栈
+    stack = [("seg", 0, len(a), 0, len(b))]
+    while stack:
+        task = stack.pop()
+        if task[0] == "eq":
+            ops.append({"op": "eq", "gt_idx": task[1], "pred_idx": task[2]})
+            continue
+        _, g0, g1, p0, p1 = task
+        sa, sb = a[g0:g1], b[p0:p1]
+        anchors = ([], [])
+        if len(sa) * len(sb) > ANCHOR_LEAF_CELLS:
+            anchors = patience_anchors(sa, sb)
+        if not anchors[0]:
+            ops.extend(_align_block(sa, sb, g0, p0, max_cells))
+            continue
+
+        todo = []
+        i0, j0 = g0, p0
+        for i, j in zip(*anchors):
+            todo.append(("seg", i0, g0 + i, j0, p0 + j))
+            todo.append(("eq", g0 + i, p0 + j))
+            i0, j0 = g0 + i + 1, p0 + j + 1
+        todo.append(("seg", i0, g1, j0, p1))
+        stack.extend(reversed(todo))
+    return ops
+
+
+def anchored_cost_check(gt_tokens, pred_tokens, max_cells=HIRSCHBERG_CELLS):
+    """
+    验证模式：返回 (锚点对齐的编辑代价, 整页最优编辑代价)。
+    最优代价用位并行编辑距离算（只要距离、不回溯），比整页 DP 对齐便宜得多。
+    """
+    a, b = encode_tokens(gt_tokens, pred_tokens)
+    anchored = ops_cost(align_tokens_anchored(a, b, max_cells=max_cells))
+    return anchored, levenshtein_bitparallel(a.tolist(), b.tolist())
+
+
+# 词内字符对齐：格子数不超过这个值时列表版 DP 比 NumPy 波前快（后者每条反对角线都有固定开销），
+# 两者输出完全相同
+CHAR_DP_CELLS = 1024
+
+
+def char_edits(gt_token, pred_token):
+    """
+    替换词内部的字符级差异：[[op, gt_char, pred_char], ...]，只列出非 eq 的字符，
+    ins 的 gt_char、del 的 pred_char 为空串。例如 "modem" -> "rnodem" 得到
+    [["ins", "", "r"], ["sub", "m", "n"]]（平局规则与词级对齐相同）。
+    """
+    gt_chars, pred_chars = list(gt_token), list(pred_token)
+    align = align_tokens_reference if len(gt_chars) * len(pred_chars) <= CHAR_DP_CELLS else align_tokens
+    edits = []
+    for step in align(gt_chars, pred_chars):
+        op = step["op"]
+        if op == "eq":
+            continue
+        g = gt_chars[step["gt_idx"]] if step["gt_idx"] is not None else ""
+        p = pred_chars[step["pred_idx"]] if step["pred_idx"] is not None else ""
+        edits.append([op, g, p])
+    return edits
+
+
+def ops_cost(ops):
+    """操作序列的编辑代价（非 eq 的步数）。"""
+    return sum(1 for step in ops if step["op"] != "eq")
+
+
+def check_ops(ops, n, m):
+    """检查操作序列是合法对齐：两侧下标各自按顺序恰好覆盖 0..n-1 / 0..m-1。"""
+    gt_seen = [s["gt_idx"] for s in ops if s["gt_idx"] is not None]
+    pred_seen = [s["pred_idx"] for s in ops if s["pred_idx"] is not None]
+    assert gt_seen == list(range(n)), "gt 下标没有按顺序覆盖"
+    assert pred_seen == list(range(m)), "pred 下标没有按顺序覆盖"
@@ -0,0 +1,131 @@
+# 通用的磁盘缓存（SQLite）+ 内存 LRU。规范化结果、逐页评测结果等“输入不变、结果不变”的东西都可以放这里。
+
+import hashlib
+import json
+import os
+import sqlite3
+from collections import OrderedDict
+
+# 默认缓存文件：放在 data/cache 下，跨实验目录共用
+DEFAULT_CACHE_PATH = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "cache", "analysis_cache.sqlite"
+)
+
+# SQLite 单条语句的参数个数有上限，批量查询按这个大小分块
+_SQL_BATCH = 500
+
+
+def text_hash(text: str) -> str:
+    """内容寻址用的文本哈希。"""
+    return hashlib.sha1(text.encode("utf-8", "surrogatepass")).hexdigest()
+
+
+def fingerprint_of(*parts) -> str:
+    """把若干“版本要素”（规则表、正则、源码等）拼起来求哈希，作为缓存的版本指纹。"""
+    h = hashlib.sha1()
+    for p in parts:
+        h.update(repr(p).encode("utf-8", "surrogatepass"))
+        h.update(b"\0")
+    return h.hexdigest()[:16]
+
+
+class DiskCache:
+    """
+    键值缓存：key 为字符串，value 为任意可 JSON 序列化的对象。
+
+    - 同一个 SQLite 文件里用 namespace 区分不同用途；
+    - 每个 namespace 绑定一个 fingerprint，打开时会删掉指纹不同的旧条目，
+      所以规则 / 版本一变，旧结果自动失效；
+    - 前面挂一层按条目数限制大小的 LRU，重复访问不必每次查库。
+    """
+
+    def __init__(self, namespace: str, fingerprint: str, path: str = DEFAULT_CACHE_PATH,
+                 memory_items: int = 10000):
+        self.namespace = namespace
+        self.fingerprint = fingerprint
+        self.path = path
+        self.memory_items = memory_items
+        self._lru = OrderedDict()
+
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS cache ("
+            " namespace TEXT NOT NULL, key TEXT NOT NULL, fingerprint TEXT NOT NULL, value TEXT NOT NULL,"
+            " PRIMARY KEY (namespace, key))"
+        )
+        self._conn.execute(
+            "DELETE FROM cache WHERE namespace = ? AND fingerprint != ?", (namespace, fingerprint)
+        )
+        self._conn.commit()
+
+    # ----- 内存 LRU -----
+
+    def _remember(self, key, value):
+        self._lru[key] = value
+        self._lru.move_to_end(key)
+        while len(self._lru) > self.memory_items:
+            self._lru.popitem(last=False)
+
+    # ----- 批量读写 -----
+
+    def get_many(self, keys):
+        """返回 {key: value}，只包含命中的 key。"""
+        found = {}
+        missing = []
+        for k in keys:
+            if k in self._lru:
+                self._lru.move_to_end(k)
+                found[k] = self._lru[k]
+            else:
+                missing.append(k)
+
+        missing = list(dict.fromkeys(missing))
+        for start in range(0, len(missing), _SQL_BATCH):
+            batch = missing[start:start + _SQL_BATCH]
+            rows = self._conn.execute(
+                f"SELECT key, value FROM cache WHERE namespace = ? AND fingerprint = ? "
+                f"AND key IN ({','.join('?' * len(batch))})",
+                (self.namespace, self.fingerprint, *batch),
+            )
+            for k, v in rows:
+                value = json.loads(v)
+                found[k] = value
+                self._remember(k, value)
+        return found
+
+    def put_many(self, items):
+        """items: {key: value} 或 [(key, value), ...]"""
+        if isinstance(items, dict):
+            items = items.items()
+        rows = []
+        for k, v in items:
+            self._remember(k, v)
+            rows.append((self.namespace, k, self.fingerprint, json.dumps(v, ensure_ascii=False)))
+        if rows:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO cache (namespace, key, fingerprint, value) VALUES (?, ?, ?, ?)", rows
+            )
+            self._conn.commit()
+
+    def get(self, key, default=None):
+        return self.get_many([key]).get(key, default)
+
+    def put(self, key, value):
+        self.put_many([(key, value)])
+
+    def __len__(self):
+        (n,) = self._conn.execute(
+            "SELECT COUNT(*) FROM cache WHERE namespace = ? AND fingerprint = ?",
+            (self.namespace, self.fingerprint),
+        ).fetchone()
+        return n
+
+    def close(self):
+        self._conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
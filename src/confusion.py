@@ -0,0 +1,210 @@
+# 字符级混淆统计：在每对 sub 词内部做字符对齐（src.alignment.char_edits），
+# 把 (错误类型, op, gt 字符, pred 字符) 的次数累加起来，找出 1->l、0->O、,->. 这类系统性字形混淆。
+#
+# 两种累加器接口相同、都可以合并（逐页 / 逐进程算出局部结果，再在主进程 merge）：
+#   - ConfusionCounter：精确计数（dict），语料不大时用；
+#   - ConfusionSketch：count-min sketch，内存固定，只对候选重键给出（偏大的）估计，语料很大时用。
+
+import hashlib
+from collections import Counter
+from functools import lru_cache
+
+import numpy as np
+
+from src.alignment import char_edits
+
+CHAR_EDITS_CACHE_SIZE = 1 << 16
+
+
+@lru_cache(maxsize=CHAR_EDITS_CACHE_SIZE)
+def cached_char_edits(gt_token, pred_token):
+    """同一对 (gt, pred) 在语料里常重复出现，字符对齐结果按词对缓存。"""
+    return tuple(tuple(e) for e in char_edits(gt_token, pred_token))
+
+
+def sub_pair_edits(err_type, gt_token, pred_token):
+    """一对 sub 词 -> [(type, op, gt_char, pred_char), ...]"""
+    return [(err_type, op, g, p) for op, g, p in cached_char_edits(gt_token, pred_token)]
+
+
+def _top_by_type(items, k):
+    """[(key, n)] -> {type: [{"op", "gt", "pred", "count"}, ...]}，每类按次数降序取前 k，平局按键排序。"""
+    by_type = {}
+    for key, n in items:
+        by_type.setdefault(key[0], []).append((key, n))
+    out = {}
+    for t in sorted(by_type):
+        rows = sorted(by_type[t], key=lambda kv: (-kv[1], kv[0]))[:k]
+        out[t] = [{"op": key[1], "gt": key[2], "pred": key[3], "count": int(n)} for key, n in rows]
+    return out
+
+
+class ConfusionCounter:
+    """
+    精确计数：{(type, op, gt_char, pred_char): n}。
+        c = ConfusionCounter()
+        c.add_pair("number", "10", "1O")
+        c.merge(other)
+        c.top_k(20)
+    """
+
+    def __init__(self):
+        self.counts = Counter()
+        self.n_pairs = 0
+
+    def __len__(self):
+        return len(self.counts)
+
+    def add_pair(self, err_type, gt_token, pred_token):
+        self.n_pairs += 1
+        for key in sub_pair_edits(err_type, gt_token, pred_token):
+            self.counts[key] += 1
+
+    def add_pairs(self, pairs):
+        for err_type, gt_token, pred_token in pairs:
+            self.add_pair(err_type, gt_token, pred_token)
+        return self
+
+    def merge(self, other):
+        self.counts.update(other.counts)
+        self.n_pairs += other.n_pairs
+        return self
+
+    @property
+    def n_edits(self):
+        return sum(self.counts.values())
+
+    def top_k(self, k=20):
+        return _top_by_type(self.counts.items(), k)
+
+
+def _stable_key(key):
+    # Python 的 hash() 每个进程随机化，sketch 要能跨进程合并，只能用确定的哈希
+    return "\x1f".join(key).encode("utf-8", "surrogatepass")
+
+
+class ConfusionSketch:
+    """
+    count-min sketch 版本：depth × width 的计数表，估计值只会偏大，不会偏小。
+    为了能给出 top-k，另外保留最多 candidates 个候选键（按估计值淘汰）。
+    两个 sketch 只有 width / depth / seed 相同才能合并。
+    """
+
+    def __init__(self, width=1 << 16, depth=4, seed=0, candidates=4096):
+        if depth > 16:
+            raise ValueError("depth 最多 16（每行 4 字节哈希，一次 blake2b 摘要最多 64 字节）")
+        self.width = width
+        self.depth = depth
+        self.seed = seed
+        self.max_candidates = candidates
+        self.table = np.zeros((depth, width), dtype=np.int64)
+        self.candidates = set()
+        self.n_pairs = 0
+        self.n_edits = 0
+        self._salt = seed.to_bytes(8, "little")
+        self._rows = np.arange(depth)
+
+    def _columns(self, keys):
+        """每个键在各行的列号：(len(keys), depth)。"""
+        cols = np.empty((len(keys), self.depth), dtype=np.int64)
+        for i, key in enumerate(keys):
+            digest = hashlib.blake2b(_stable_key(key), digest_size=4 * self.depth, salt=self._salt).digest()
+            cols[i] = np.frombuffer(digest, dtype="<u4")
+        return cols % self.width
+
+    def add_counts(self, counts):
+        """把一份精确计数（dict / Counter）折进 sketch。"""
+        keys = list(counts)
+        if not keys:
+            return self
+        n = np.fromiter((counts[k] for k in keys), dtype=np.int64, count=len(keys))
+        cols = self._columns(keys)
+        for r in range(self.depth):
+            np.add.at(self.table[r], cols[:, r], n)
+        self.n_edits += int(n.sum())
+        self.candidates.update(keys)
+        self._prune()
+        return self
+
+    def add_counter(self, counter):
+        """ConfusionCounter -> sketch（逐页精确计数，再在这里汇总）。"""
+        self.n_pairs += counter.n_pairs
+        return self.add_counts(counter.counts)
+
+    def estimate_many(self, keys):
+        if not keys:
+            return np.zeros(0, dtype=np.int64)
+        return self.table[self._rows, self._columns(keys)].min(axis=1)
+
+    def estimate(self, key):
+        return int(self.estimate_many([key])[0])
+
+    def _prune(self):
+        if len(self.candidates) <= 2 * self.max_candidates:
+            return
+        keys = sorted(self.candidates)
+        est = self.estimate_many(keys)
+        keep = np.argsort(-est, kind="stable")[:self.max_candidates]
+        self.candidates = {keys[i] for i in keep}
+
+    def merge(self, other):
+        if (self.width, self.depth, self.seed) != (other.width, other.depth, other.seed):
+            raise ValueError("width / depth / seed 不同的 sketch 不能合并")
+        self.table += other.table
+        self.candidates |= other.candidates
+        self.n_pairs += other.n_pairs
+        self.n_edits += other.n_edits
+        self._prune()
+        return self
+
+    def __len__(self):
+        return len(self.candidates)
+
+    def top_k(self, k=20):
+        keys = sorted(self.candidates)
+        return _top_by_type(zip(keys, self.estimate_many(keys).tolist()), k)
+
+
+def page_confusion(pairs):
+    """进程池里跑的单页任务：[(type, gt_token, pred_token), ...] -> ConfusionCounter。"""
+    return ConfusionCounter().add_pairs(pairs)
+
+
+def check_sketch(n_pairs=20000, seed=0):
+    """sketch 的估计不小于精确计数；宽度足够时前几名与精确结果相同；分块合并与一次累加相同。"""
+    rng = np.random.default_rng(seed)
+    alphabet = list("0123456789lIO.,-")
+    types = ["number", "word", "punct"]
+    pairs = []
+    for _ in range(n_pairs):
+        gt = "".join(rng.choice(alphabet, size=rng.integers(1, 6)))
+        pred = list(gt)
+        pred[rng.integers(len(pred))] = rng.choice(alphabet[:4])
+        pairs.append((types[rng.integers(3)], gt, "".join(pred)))
+
+    exact = ConfusionCounter().add_pairs(pairs)
+    parts = [ConfusionCounter().add_pairs(pairs[i:i + 1000]) for i in range(0, n_pairs, 1000)]
+    merged = ConfusionCounter()
+    for p in parts:
+        merged.merge(p)
+    assert merged.counts == exact.counts and merged.n_pairs == exact.n_pairs
+
+    sketch = ConfusionSketch(width=1 << 14, candidates=256)
+    halves = [ConfusionSketch(width=1 << 14, candidates=256) for _ in range(2)]
+    for i, p in enumerate(parts):
+        sketch.add_counter(p)
+        halves[i % 2].add_counter(p)
+    halves[0].merge(halves[1])
+    assert np.array_equal(halves[0].table, sketch.table)
+
+    keys = list(exact.counts)
+    assert (sketch.estimate_many(keys) >= np.array([exact.counts[k] for k in keys])).all()
+    top_exact, top_sketch = exact.top_k(5), sketch.top_k(5)
+    assert top_exact == top_sketch, (top_exact, top_sketch)
+    return len(keys)
+
+
+if __name__ == "__main__":
+    print(ConfusionCounter().add_pairs([("number", "10", "1O"), ("word", "modem", "rnodem")]).top_k())
+    n = check_sketch()
+    print(f"✅ 精确计数分块合并一致；sketch 在 {n} 个键上估计不偏小，top-k 与精确结果相同")
@@ -0,0 +1,48 @@
+# 读取 GT 标注和预测文件，并按 image 名对齐。各评测脚本共用。
+
+import json
+
+from src.json_stream import iter_annotations
+
+
+def load_gt(gt_path):
+    """
+    读取 Fox 格式标注，返回 {image: gt_text}（gt_text 取 conversations[1]）。
+    标注数组是逐条流式解析的，不会先把整份 JSON 树建出来。
+    """
+    return {image: gt_text for image, gt_text in iter_annotations(gt_path)}
+
+
+def load_pred(pred_path):
+    """读取推理脚本输出的预测 JSON，返回 {image: pred_text}。"""
+    with open(pred_path, "r", encoding="utf-8") as f:
+        preds = json.load(f)
+    return {p["image"]: p["pred"] for p in preds}
+
+
+def build_pairs(gt_by_image, pred_by_image):
+    """
+    把 GT 和预测按 image 对齐，返回一个列表：
+    [
+      {"image": "...", "gt": "...", "pred": "..."},
+      ...
+    ]
+    """
+    images = sorted(gt_by_image.keys())
+    pairs = []
+    missing = []
+
+    for img in images:
+        if img not in pred_by_image:
+            missing.append(img)
+            continue
+        pairs.append({
+            "image": img,
+            "gt": gt_by_image[img],
+            "pred": pred_by_image[img],
+        })
+
+    if missing:
+        print(f"⚠ 预测中缺少 {len(missing)} 张图片，例如: {missing[:5]}")
+    print(f"✅ 成功对齐图片数量: {len(pairs)}")
+    return pairs
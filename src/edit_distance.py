@@ -0,0 +1,310 @@
+# 编辑距离引擎。CER 等指标都依赖它，参考实现和快速实现放在一起，方便互相校验。
+
+import random
+
+# ========== 1. 参考实现：经典 DP ==========
+
+def levenshtein_distance(a, b) -> int:
+    """
+    计算字符串 a, b 的 Levenshtein 编辑距离（字符级）。
+    这里用经典 DP，仅返回距离，不回溯路径。
+    为了效率，用两行滚动数组。
+    速度慢，但逻辑最直观，作为其他实现的“对照答案”。
+    """
+    n, m = len(a), len(b)
+    if n == 0:
+        return m
+    if m == 0:
+        return n
+
+    # prev[j] = distance(a[:i-1], b[:j])
+    prev = list(range(m + 1))
+    curr = [0] * (m + 1)
+
+    for i in range(1, n + 1):
+        curr[0] = i
+        ca = a[i - 1]
+        for j in range(1, m + 1):
+            cb = b[j - 1]
+            cost = 0 if ca == cb else 1
+            # 删除 a 中一个字符、插入一个字符、替换
+            curr[j] = min(
+                prev[j] + 1,      # deletion
+                curr[j - 1] + 1,  # insertion
+                prev[j - 1] + cost
+            )
+        prev, curr = curr, prev
+
+    return prev[m]
+
+
+# ========== 2. 位并行实现（Myers / Hyyrö） ==========
+
+def build_match_masks(pattern) -> dict:
+    """
+    为 pattern 建立“匹配位表”：peq[c] 的第 i 位为 1 表示 pattern[i] == c。
+    只为 pattern 中出现过的符号建表，所以对任意 Unicode 字符（或任意可哈希 token）都适用。
+    """
+    peq = {}
+    bit = 1
+    for c in pattern:
+        peq[c] = peq.get(c, 0) | bit
+        bit <<= 1
+    return peq
+
+
+def levenshtein_bitparallel(a, b) -> int:
+    """
+    Myers (1999) / Hyyrö (2001) 位并行编辑距离，结果与 levenshtein_distance 完全一致。
+
+    - 把较短的串当作 pattern，每一列的竖直差分 (+1/-1) 压成两个位向量 Pv / Mv；
+    - Python 的 int 是任意精度的，一个 int 就相当于多字 (multi-word) 位向量，
+      pattern 超过 64 个字符时不需要手动分块；
+    - 复杂度 O(ceil(m/w) * n)，对 4k 字符的页面比纯 Python 双重循环快两个数量级。
+
+    a, b 可以是 str，也可以是任意可哈希元素的序列（例如 token id 列表）。
+    """
+    if len(a) < len(b):
+        a, b = b, a
+    # 现在 b 是较短的一方，作为 pattern
+    m = len(b)
+    if m == 0:
+        return len(a)
+
+    peq = build_match_masks(b)
+    mask = (1 << m) - 1
+    last = 1 << (m - 1)
+
+    pv = mask   # 竖直差分为 +1 的位置
+    mv = 0      # 竖直差分为 -1 的位置
+    score = m
+
+    for c in a:
+        eq = peq.get(c, 0)
+        xv = eq | mv
+        xh = ((((eq & pv) + pv) & mask) ^ pv) | eq
+        ph = mv | (~(xh | pv) & mask)
+        mh = pv & xh
+
+        if ph & last:
+            score += 1
+        elif mh & last:
+            score -= 1
+
+        # 全局编辑距离：第 0 行的水平差分恒为 +1，所以移位时补 1
+        ph = ((ph << 1) | 1) & mask
+        mh = (mh << 1) & mask
+        pv = mh | (~(xv | ph) & mask)
+        mv = ph & xv
+
+    return score
+
+
+# ========== 3. 带阈值的编辑距离（Ukkonen 带 + 位并行） ==========
+
+# 每隔多少列检查一次“是否已经必然超过 k”
+BOUNDED_CHECK_EVERY = 32
+
+
+def levenshtein_bounded(a, b, k: int):
+    """
+    k 有界编辑距离：距离 <= k 时返回精确值，否则返回 None。
+
+    Ukkonen (1985)：距离 <= k 的最优路径只经过 |i - j| <= k 的格子。
+    这里在位并行算法上加一个随列下移的窗口：第 j 列只保留 pattern 的第 max(1, j-k) ~ min(m, j+k) 行，
+    位向量宽度不超过 2k+1，复杂度 O(ceil(k/w) * n)，而不是整列的 O(ceil(m/w) * n)。
+    - 窗口上边界之上的格子按“水平差分 +1”处理，新进入窗口的下边界按“竖直差分 +1”处理，
+      两者都只会高估带外格子，而带外格子本来就 > k，所以 <= k 的结果是精确的；
+    - 每 BOUNDED_CHECK_EVERY 列检查一次下界 min_i D[i][j] + |(m-i) - (n-j)|，
+      一旦 > k 立即返回 None。
+    """
+    if len(a) < len(b):
+        a, b = b, a
+    n, m = len(a), len(b)   # a 为文本（列），b 为 pattern（行）
+    if k < 0 or n - m > k:
+        return None
+    if m == 0:
+        return n
+
+    # 匹配位表按 chunk 位切块：窗口宽度 <= 2k+1 <= chunk，每列最多拼接两块，
+    # 取窗口的代价只与 k 有关，不随 pattern 长度 m 增长
+    chunk = 64
+    while chunk < 2 * k + 1:
+        chunk <<= 1
+    n_chunks = (m + chunk - 1) // chunk + 1
+    peq = {}
+    for i, c in enumerate(b):
+        blocks = peq.get(c)
+        if blocks is None:
+            blocks = peq[c] = [0] * n_chunks
+        blocks[i // chunk] |= 1 << (i % chunk)
+
+    lo, hi = 1, min(m, k)   # 当前窗口覆盖的行号（含两端）
+    width = hi - lo + 1
+    pv = (1 << width) - 1   # 第 0 列：D[i][0] = i，竖直差分全为 +1
+    mv = 0
+    top = 0                 # 窗口上方那一行（lo-1）在当前列的值
+
+    for j in range(1, n + 1):
+        # 1) 上边界下移：丢掉窗口最上面的行，把它的值并入 top
+        new_lo = max(1, j - k)
+        while lo < new_lo:
+            if pv & 1:
+                top += 1
+            elif mv & 1:
+                top -= 1
+            pv >>= 1
+            mv >>= 1
+            lo += 1
+            width -= 1
+        # 2) 下边界扩展：新行的竖直差分记为 +1
+        new_hi = min(m, j + k)
+        if new_hi > hi:
+            grow = new_hi - hi
+            pv |= ((1 << grow) - 1) << width
+            width += grow
+            hi = new_hi
+
+        mask = (1 << width) - 1
+        blocks = peq.get(a[j - 1])
+        if blocks is None:
+            eq = 0
+        else:
+            q, off = divmod(lo - 1, chunk)
+            eq = ((blocks[q] | (blocks[q + 1] << chunk)) >> off) & mask
+        xv = eq | mv
+        xh = ((((eq & pv) + pv) & mask) ^ pv) | eq
+        ph = mv | (~(xh | pv) & mask)
+        mh = pv & xh
+        ph = ((ph << 1) | 1) & mask
+        mh = (mh << 1) & mask
+        pv = mh | (~(xv | ph) & mask)
+        mv = ph & xv
+        top += 1
+
+        if j % BOUNDED_CHECK_EVERY == 0 or j == n:
+            # 3) 下界检查：沿窗口累加竖直差分得到整列的值
+            # 窗口上方那一行也要算上：lo = 1 时它就是第 0 行，路径可能从那里经过
+            v = top
+            best = top + abs((m - lo + 1) - (n - j))
+            for t in range(width):
+                v += ((pv >> t) & 1) - ((mv >> t) & 1)
+                bound = v + abs((m - lo - t) - (n - j))
+                if bound < best:
+                    best = bound
+            if best > k:
+                return None
+
+    d = top + bin(pv).count("1") - bin(mv).count("1")
+    return d if d <= k else None
+
+
+def levenshtein_within(a, b, k: int) -> bool:
+    """只回答“距离是否 <= k”，用于 CER 阈值筛查（比如决定是否要换更高分辨率模式重跑）。"""
+    return levenshtein_bounded(a, b, k) is not None
+
+
+def cer_within(gt: str, pred: str, max_cer: float) -> bool:
+    """gt / pred 为规范化后的文本；判断该页 CER 是否 <= max_cer，不需要算出完整距离。"""
+    if not gt:
+        return True   # 与 eval_pairs 一致：空 GT 的 CER 记为 0
+    return levenshtein_within(gt, pred, int(max_cer * len(gt)))
+
+
+# 带宽扩到这个值还没得到结果，就不再加倍，直接交给位并行全量计算
+ADAPTIVE_MAX_BAND = 512
+
+
+def levenshtein_adaptive(a, b, k0: int = 8, max_band: int = ADAPTIVE_MAX_BAND) -> int:
+    """
+    自适应带宽：从窄带 k0 开始算，不够就把带宽加倍。
+    - 几乎全对的页面（典型 vt100）在前几轮就拿到精确值，代价 O(k/w * n)；
+    - 带宽超过 max_band 说明距离本来就大，带状 DP 不再划算，回退到位并行。
+    结果始终是精确的编辑距离。
+    """
+    k = max(k0, abs(len(a) - len(b)))
+    # 带宽接近整列时带状算法已无优势
+    max_band = min(max_band, min(len(a), len(b)) // 4)
+    while k <= max_band:
+        d = levenshtein_bounded(a, b, k)
+        if d is not None:
+            return d
+        k *= 2
+    return levenshtein_bitparallel(a, b)
+
+
+# ========== 4. 后端注册 & 一致性自检 ==========
+
+BACKENDS = {
+    "dp": levenshtein_distance,
+    "bitparallel": levenshtein_bitparallel,
+    "adaptive": levenshtein_adaptive,
+}
+DEFAULT_BACKEND = "bitparallel"
+
+
+def get_backend(name: str):
+    if name not in BACKENDS:
+        raise ValueError(f"未知编辑距离后端: {name}，可选: {sorted(BACKENDS)}")
+    return BACKENDS[name]
+
+
+def _random_pair(rng, max_len):
+    alphabets = ["ab", "abcde", "0123456789,. ", "数字表格一二三", "aé中😀\n "]
+    alphabet = rng.choice(alphabets)
+    a = "".join(rng.choice(alphabet) for _ in range(rng.randint(0, max_len)))
+    if rng.random() < 0.5:
+        # 在 a 上做少量扰动，模拟真实 OCR 的“接近但不相同”
+        b = list(a)
+        for _ in range(rng.randint(0, 10)):
+            pos = rng.randint(0, len(b))
+            r = rng.random()
+            if r < 0.33 and pos < len(b):
+                del b[pos]
+            elif r < 0.66 and pos < len(b):
+                b[pos] = rng.choice(alphabet)
+            else:
+                b.insert(pos, rng.choice(alphabet))
+        b = "".join(b)
+    else:
+        b = "".join(rng.choice(alphabet) for _ in range(rng.randint(0, max_len)))
+    return a, b
+
+
+def check_equivalence(n_trials=1000, max_len=200, seed=0, backend=DEFAULT_BACKEND):
+    """
+    在随机输入上比较 backend 与参考 DP，发现不一致立即抛 AssertionError。
+    输入覆盖：空串、小字母表（大量匹配）、跨 64 位边界的长度、中文/emoji 等非 ASCII 字符。
+    """
+    rng = random.Random(seed)
+    func = get_backend(backend)
+
+    for trial in range(n_trials):
+        a, b = _random_pair(rng, max_len)
+        expected = levenshtein_distance(a, b)
+        got = func(a, b)
+        assert got == expected, f"[{backend}] trial {trial}: {got} != {expected}, a={a!r}, b={b!r}"
+
+    return n_trials
+
+
+def check_bounded(n_trials=300, max_len=200, seed=0):
+    """对每组随机输入，在真实距离附近取若干 k，确认 levenshtein_bounded 在 <= k 时精确、> k 时返回 None。"""
+    rng = random.Random(seed)
+    for trial in range(n_trials):
+        a, b = _random_pair(rng, max_len)
+        expected = levenshtein_distance(a, b)
+        ks = {0, expected - 1, expected, expected + 1, 2 * expected, rng.randint(0, max_len)}
+        for k in sorted(k for k in ks if k >= 0):
+            got = levenshtein_bounded(a, b, k)
+            want = expected if expected <= k else None
+            assert got == want, f"[bounded] trial {trial}, k={k}: {got} != {want}, a={a!r}, b={b!r}"
+    return n_trials
+
+
+if __name__ == "__main__":
+    for name in BACKENDS:
+        n = check_equivalence(backend=name)
+        print(f"✅ {name} 与参考 DP 在 {n} 组随机输入上结果一致")
+    n = check_bounded()
+    print(f"✅ levenshtein_bounded 在 {n} 组随机输入、阈值附近的各个 k 上结果正确")
@@ -0,0 +1,316 @@
+# 列式错误库：把 fox100_errors_*_typed.jsonl 存成按列的 NumPy 数组（.npz），
+# 下游脚本只读需要的一两列，不必逐行 json.loads。
+#
+# 文件布局（np.savez，无 pickle）：
+#   __header__   : uint8 数组，内容是 UTF-8 JSON，记录版本、行数、列定义和各个字典
+#   image        : 图片名字典编码
+#   mode / op / type : 小字典编码（op 与 alignment.OP_NAMES 同编号）
+#   gt_token / pred_token / gt_prev / gt_next : 共用同一个 token 字典
+#   gt_index / pred_index : int32，None 存成 -1
+#   extra_json   : 上面这些列以外的字段（如 --char-detail 的 char_edits），按原顺序存成 JSON 文本，没有时为 ""
+# npz 里的每一列是单独的成员，np.load 只在访问时才读它，所以按列投影是天然的。
+
+import json
+import os
+
+import numpy as np
+
+from src.alignment import OP_NAMES
+
+STORE_VERSION = 2
+
+# 列名 -> 所用字典；None 表示整数列
+COLUMNS = {
+    "image": "images",
+    "mode": "modes",
+    "op": "ops",
+    "gt_token": "tokens",
+    "pred_token": "tokens",
+    "gt_index": None,
+    "pred_index": None,
+    "gt_prev": "tokens",
+    "gt_next": "tokens",
+    "type": "types",
+    "extra_json": "extras",
+}
+# 存放其余字段的列；还原记录时这些字段排在 type 前面（与 2_align_errors -> 3_tag_errors 写出的顺序一致）
+EXTRA_COLUMN = "extra_json"
+# 还原成 JSONL 记录时的字段顺序（与 errors_from_ops + 3_tag_errors 写出的一致）
+RECORD_FIELDS = ["image", "mode", "op", "gt_token", "pred_token", "gt_index", "pred_index",
+                 "gt_prev", "gt_next", "type"]
+
+_HEADER = "__header__"
+
+
+def store_path_for(jsonl_path):
+    """fox100_errors_vt64_typed.jsonl -> fox100_errors_vt64_typed.npz"""
+    root, _ = os.path.splitext(jsonl_path)
+    return root + ".npz"
+
+
+def _code_dtype(n):
+    if n <= 0xFF:
+        return np.uint8
+    if n <= 0xFFFF:
+        return np.uint16
+    return np.int32
+
+
+# ---------- 写 ----------
+
+class ErrorStoreWriter:
+    """
+    逐条追加错误记录，close() 时一次性写出 .npz。
+        with ErrorStoreWriter(path) as w:
+            for rec in records:
+                w.append(rec)
+    """
+
+    def __init__(self, path):
+        self.path = path
+        # ops 字典固定为 OP_NAMES，保证 op 编码在所有文件里一致
+        self.dicts = {name: [] for name in dict.fromkeys(COLUMNS.values()) if name}
+        self.dicts["ops"] = list(OP_NAMES)
+        self._index = {name: {v: i for i, v in enumerate(vals)} for name, vals in self.dicts.items()}
+        self._cols = {c: [] for c in COLUMNS}
+        self.typed = False
+        self.n_rows = 0
+
+    def _encode(self, dict_name, value):
+        idx = self._index[dict_name]
+        code = idx.get(value)
+        if code is None:
+            code = idx[value] = len(self.dicts[dict_name])
+            self.dicts[dict_name].append(value)
+        return code
+
+    def append(self, rec):
+        cols = self._cols
+        for col, dict_name in COLUMNS.items():
+            if col == EXTRA_COLUMN:
+                extra = {k: v for k, v in rec.items() if k not in COLUMNS}
+                cols[col].append(self._encode(dict_name, json.dumps(extra, ensure_ascii=False) if extra else ""))
+            elif dict_name is None:
+                v = rec.get(col)
+                cols[col].append(-1 if v is None else v)
+            elif col == "type":
+                t = rec.get("type")
+                if t is not None:
+                    self.typed = True
+                cols[col].append(self._encode(dict_name, t or ""))
+            else:
+                cols[col].append(self._encode(dict_name, rec.get(col) or ""))
+        self.n_rows += 1
+
+    def extend(self, records):
+        for rec in records:
+            self.append(rec)
+
+    def close(self):
+        arrays = {}
+        for col, dict_name in COLUMNS.items():
+            if dict_name is None:
+                dtype = np.int32
+            else:
+                dtype = _code_dtype(len(self.dicts[dict_name]))
+            arrays[col] = np.asarray(self._cols[col], dtype=dtype)
+
+        header = {
+            "version": STORE_VERSION,
+            "n_rows": self.n_rows,
+            "typed": self.typed,
+            "columns": COLUMNS,
+            "dicts": self.dicts,
+        }
+        arrays[_HEADER] = np.frombuffer(json.dumps(header, ensure_ascii=False).encode("utf-8"), dtype=np.uint8)
+
+        # 先写临时文件再改名，避免中途失败留下半个文件
+        tmp = self.path + ".tmp.npz"
+        np.savez(tmp, **arrays)
+        os.replace(tmp, self.path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, *exc):
+        if exc_type is None:
+            self.close()
+
+
+def write_error_store(path, records):
+    with ErrorStoreWriter(path) as w:
+        w.extend(records)
+
+
+def jsonl_to_store(jsonl_path, store_path=None):
+    """把一份错误 JSONL 转成列式库，返回库文件路径。"""
+    store_path = store_path or store_path_for(jsonl_path)
+    with open(jsonl_path, "r", encoding="utf-8") as f, ErrorStoreWriter(store_path) as w:
+        for line in f:
+            line = line.strip()
+            if line:
+                w.append(json.loads(line))
+    return store_path
+
+
+# ---------- 读 ----------
+
+class ErrorStore:
+    """
+    列式错误库的只读视图。
+        store = ErrorStore(path)
+        cols = store.load(["type", "op"], where={"mode": "vt64"})
+        store.value_counts("type", where={"op": "sub"})
+    where: {列名: 值 或 值的集合}，多个条件取“且”。
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._npz = np.load(path, allow_pickle=False)
+        header = json.loads(self._npz[_HEADER].tobytes().decode("utf-8"))
+        if header.get("version") != STORE_VERSION:
+            raise ValueError(f"{path}: 不支持的错误库版本 {header.get('version')}")
+        self.n_rows = header["n_rows"]
+        self.typed = header["typed"]
+        self.columns = header["columns"]
+        self.dicts = header["dicts"]
+        self._cache = {}
+
+    def __len__(self):
+        return self.n_rows
+
+    def close(self):
+        self._npz.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    # ----- 单列 -----
+
+    def codes(self, col):
+        """某一列的原始整数（字典编码 / 下标），按需读取并缓存。"""
+        if col not in self.columns:
+            raise KeyError(f"未知列: {col}")
+        arr = self._cache.get(col)
+        if arr is None:
+            arr = self._cache[col] = self._npz[col]
+        return arr
+
+    def dictionary(self, col):
+        return self.dicts[self.columns[col]]
+
+    def _value_codes(self, col, values):
+        if isinstance(values, (str, int)) or values is None:
+            values = [values]
+        lookup = {v: i for i, v in enumerate(self.dictionary(col))}
+        return [lookup[v] for v in values if v in lookup]
+
+    def mask(self, where=None):
+        """按 where 条件得到行掩码（bool 数组）。"""
+        m = np.ones(self.n_rows, dtype=bool)
+        for col, values in (where or {}).items():
+            if self.columns[col] is None:
+                if isinstance(values, int) or values is None:
+                    values = [values]
+                vals = [-1 if v is None else v for v in values]
+                m &= np.isin(self.codes(col), vals)
+            else:
+                m &= np.isin(self.codes(col), self._value_codes(col, values))
+        return m
+
+    def decode(self, col, codes):
+        """整数编码 -> 值（对象数组）；下标列把 -1 还原成 None。"""
+        dict_name = self.columns[col]
+        if dict_name is None:
+            out = codes.astype(object)
+            out[codes < 0] = None
+            return out
+        table = np.empty(len(self.dicts[dict_name]), dtype=object)
+        table[:] = self.dicts[dict_name]
+        return table[codes]
+
+    # ----- 投影 + 过滤 -----
+
+    def load(self, columns=None, where=None, decode=True):
+        """
+        只读取 columns 这些列（默认全部），并按 where 过滤行。
+        decode=False 时返回整数编码，适合直接 bincount 统计。
+        """
+        columns = list(columns or RECORD_FIELDS)
+        sel = None if not where else self.mask(where)
+        out = {}
+        for col in columns:
+            codes = self.codes(col)
+            if sel is not None:
+                codes = codes[sel]
+            out[col] = self.decode(col, codes) if decode else codes
+        return out
+
+    def value_counts(self, col, where=None):
+        """某个字典编码列的计数 {值: 次数}，按次数从大到小（次数相同按首次出现顺序）。"""
+        codes = self.load([col], where=where, decode=False)[col]
+        counts = np.bincount(codes, minlength=len(self.dictionary(col)))
+        present, first = np.unique(codes, return_index=True)
+        order = sorted(zip(present.tolist(), first.tolist()), key=lambda x: (-counts[x[0]], x[1]))
+        return {self.dictionary(col)[i]: int(counts[i]) for i, _ in order}
+
+    def records(self, columns=None, where=None):
+        """
+        按原顺序还原成 dict 记录（字段顺序与 JSONL 相同）；未打类型的库不带 type。
+        不指定 columns 时连同 extra_json 里的其余字段一起还原，与 JSONL 原文一致。
+        """
+        if columns:
+            cols = self.load(columns, where=where)
+            for i in range(len(cols[columns[0]])):
+                yield {c: cols[c][i] for c in columns}
+            return
+        base = [c for c in RECORD_FIELDS if c != "type"]
+        tail = ["type"] if self.typed else []
+        cols = self.load(base + tail + [EXTRA_COLUMN], where=where)
+        extras = cols[EXTRA_COLUMN]
+        for i in range(len(extras)):
+            rec = {c: cols[c][i] for c in base}
+            if extras[i]:
+                rec.update(json.loads(extras[i]))
+            for c in tail:
+                rec[c] = cols[c][i]
+            yield rec
+
+
+def stored_version(store_path):
+    """库文件头里记录的版本号（只读 __header__ 一个成员）。"""
+    with np.load(store_path, allow_pickle=False) as z:
+        return json.loads(z[_HEADER].tobytes().decode("utf-8")).get("version")
+
+
+def open_error_store(jsonl_path):
+    """
+    打开 JSONL 对应的列式库；库不存在、比 JSONL 旧或版本不同时先转换一次。
+    下游脚本统一用它，老的实验目录也能直接跑。
+    """
+    store_path = store_path_for(jsonl_path)
+    if not os.path.exists(store_path) or os.path.getmtime(store_path) < os.path.getmtime(jsonl_path) \
+            or stored_version(store_path) != STORE_VERSION:
+        jsonl_to_store(jsonl_path, store_path)
+    return ErrorStore(store_path)
+
+
+def check_roundtrip(jsonl_path):
+    """转换后逐条还原，确认与 JSONL 原文逐字节一致。"""
+    store_path = jsonl_to_store(jsonl_path, store_path_for(jsonl_path))
+    with ErrorStore(store_path) as store, open(jsonl_path, "r", encoding="utf-8") as f:
+        lines = [line.rstrip("\n") for line in f if line.strip()]
+        rebuilt = [json.dumps(rec, ensure_ascii=False) for rec in store.records()]
+    assert rebuilt == lines, f"{jsonl_path}: 还原结果与原文件不一致"
+    size_j = os.path.getsize(jsonl_path)
+    size_s = os.path.getsize(store_path)
+    print(f"✅ {os.path.basename(jsonl_path)}: {len(lines)} 条，JSONL {size_j} B -> npz {size_s} B")
+
+
+if __name__ == "__main__":
+    import sys
+    for p in sys.argv[1:]:
+        check_roundtrip(p)
@@ -0,0 +1,195 @@
+# 词级错误抽取：分词 + 对齐 + 生成错误记录。2_align_errors.py 和融合流水线共用。
+
+from functools import partial
+
+from src.normalization import normalize_text, item_norm  # 使用统一的规范化函数
+from src.alignment import (align_tokens_auto, align_lines, align_tokens_anchored, anchored_cost_check,
+                           char_edits, HIRSCHBERG_CELLS)
+from src.parallel import imap_pages
+
+
+# ---------- 1. 分词 ----------
+
+def tokenize_words(text: str):
+    """
+    先用 normalize_text 做统一规范化，再按空白切分成“词级 token”。
+    注意：split() 会把换行也当成空白处理掉。
+    """
+    return split_words(normalize_text(text))
+
+
+def split_words(norm: str):
+    """对已经规范化过的文本分词（融合流水线里文本只规范化一次）。"""
+    if not norm:
+        return []
+    return norm.split()
+
+
+def split_lines(norm: str):
+    """按行分词：[[行内 token, ...], ...]。拼起来与 split_words 的结果相同。"""
+    if not norm:
+        return []
+    return [line.split() for line in norm.split("\n")]
+
+
+# ---------- 2. 抽取单页错误 ----------
+
+# 对齐方式：flat = 整页一个 token 序列（默认）；hier = 先对齐行，再在缺口里对齐词（src.alignment.align_lines）；
+# anchored = 先用 patience 锚点切段，只在锚点之间的缺口里做 DP（src.alignment.align_tokens_anchored）
+ALIGNERS = ("flat", "hier", "anchored")
+
+
+def align_page(gt_norm, pred_norm, max_cells=HIRSCHBERG_CELLS, aligner="flat", vocab=None):
+    """对已规范化的一页分词 + 对齐，返回 (gt_tokens, pred_tokens, ops)。"""
+    if aligner == "hier":
+        gt_lines, pred_lines = split_lines(gt_norm), split_lines(pred_norm)
+        gt_tokens = [t for line in gt_lines for t in line]
+        pred_tokens = [t for line in pred_lines for t in line]
+        if vocab is not None:
+            vocab.encode(gt_tokens)
+            vocab.encode(pred_tokens)
+        return gt_tokens, pred_tokens, align_lines(gt_lines, pred_lines, max_cells=max_cells)
+    if aligner not in ALIGNERS:
+        raise ValueError(f"未知对齐方式: {aligner}，可选: {ALIGNERS}")
+
+    align = align_tokens_anchored if aligner == "anchored" else align_tokens_auto
+    gt_tokens, pred_tokens = split_words(gt_norm), split_words(pred_norm)
+    if vocab is not None:
+        ops = align(vocab.encode(gt_tokens), vocab.encode(pred_tokens), max_cells=max_cells)
+    else:
+        ops = align(gt_tokens, pred_tokens, max_cells=max_cells)
+    return gt_tokens, pred_tokens, ops
+
+
+def errors_from_ops(image_name, gt_tokens, pred_tokens, ops, mode, char_detail=False):
+    """
+    把对齐操作序列转成错误记录（跳过 eq）。
+    char_detail=True 时 sub 记录多一个 "char_edits" 字段：词内的字符级差异（见 src.alignment.char_edits），
+    其余字段不变，下游按原 schema 读取不受影响。
+    """
+    errors = []
+    for step in ops:
+        op = step["op"]
+        gt_idx = step["gt_idx"]
+        pred_idx = step["pred_idx"]
+
+        if op == "eq":
+            continue  # 正确 token 不记录
+
+        gt_tok = gt_tokens[gt_idx] if gt_idx is not None and 0 <= gt_idx < len(gt_tokens) else ""
+        pred_tok = pred_tokens[pred_idx] if pred_idx is not None and 0 <= pred_idx < len(pred_tokens) else ""
+
+        # 给一点上下文，方便人工检查
+        gt_prev = gt_tokens[gt_idx - 1] if gt_idx is not None and gt_idx - 1 >= 0 else ""
+        gt_next = gt_tokens[gt_idx + 1] if gt_idx is not None and gt_idx + 1 < len(gt_tokens) else ""
+
+        rec = {
+            "image": image_name,
+            "mode": mode,          # vt64 / vt100
+            "op": op,              # sub / ins / del
+            "gt_token": gt_tok,
+            "pred_token": pred_tok,
+            "gt_index": gt_idx,
+            "pred_index": pred_idx,
+            "gt_prev": gt_prev,
+            "gt_next": gt_next,
+        }
+        if char_detail and op == "sub":
+            rec["char_edits"] = char_edits(gt_tok, pred_tok)
+        errors.append(rec)
+
+    return errors
+
+
+def extract_errors_for_page(image_name, gt_text, pred_text, mode, max_cells=HIRSCHBERG_CELLS, vocab=None,
+                            gt_norm=None, pred_norm=None, aligner="flat", char_detail=False):
+    """
+    对单页做：
+      GT / pred 规范化 + 分词 + 对齐
+    返回一个 list，每个元素是一条“非 eq”的错误记录。
+    len(gt_tokens) * len(pred_tokens) 超过 max_cells 时自动改用 Hirschberg 线性空间对齐，
+    避免单个病态页面（比如 vt64 重复到 8192 token）把整个抽取过程撑爆内存。
+    传入 vocab 时 token 先驻留成语料级整数 id，对齐只比较整数数组。
+    gt_norm / pred_norm：已经规范化好的文本（来自规范化缓存），给了就不再现算。
+    aligner / char_detail：见 align_page / errors_from_ops。
+    """
+    gt_norm = gt_norm if gt_norm is not None else normalize_text(gt_text)
+    pred_norm = pred_norm if pred_norm is not None else normalize_text(pred_text)
+    gt_tokens, pred_tokens, ops = align_page(gt_norm, pred_norm, max_cells=max_cells,
+                                             aligner=aligner, vocab=vocab)
+    return errors_from_ops(image_name, gt_tokens, pred_tokens, ops, mode, char_detail=char_detail)
+
+
+# ---------- 3. 逐页批量抽取（可多进程） ----------
+
+def page_errors_job(item, mode, max_cells=HIRSCHBERG_CELLS, aligner="flat", char_detail=False):
+    """
+    进程池里跑的单页任务：分词 + 对齐 + 抽错误。
+    子进程没有语料词表，对齐用页内整数 id；同时把两侧 token 带回主进程，
+    由主进程按页顺序驻留进词表，得到的词表与顺序执行完全相同。
+    """
+    gt_tokens, pred_tokens, ops = align_page(item_norm(item, "gt"), item_norm(item, "pred"),
+                                             max_cells=max_cells, aligner=aligner)
+    errs = errors_from_ops(item["image"], gt_tokens, pred_tokens, ops, mode, char_detail=char_detail)
+    return errs, gt_tokens, pred_tokens
+
+
+def anchored_cost_job(item, max_cells=HIRSCHBERG_CELLS):
+    """锚点对齐的验证：该页锚点对齐与整页最优的编辑代价。"""
+    anchored, optimal = anchored_cost_check(split_words(item_norm(item, "gt")),
+                                            split_words(item_norm(item, "pred")), max_cells=max_cells)
+    return {"image": item["image"], "anchored": anchored, "optimal": optimal}
+
+
+def anchored_cost_report(pairs, max_cells=HIRSCHBERG_CELLS, workers=1):
+    """返回锚点对齐代价与整页 DP 不同的页面列表（空列表表示全部一致）。"""
+    job = partial(anchored_cost_job, max_cells=max_cells)
+    return [r for r in imap_pages(job, pairs, workers=workers) if r["anchored"] != r["optimal"]]
+
+
+# 错误记录里与页面内容无关的字段：逐页结果缓存里不存，取出时再补上
+def strip_page_fields(errors):
+    return [{k: v for k, v in e.items() if k != "image" and k != "mode"} for e in errors]
+
+
+def restore_page_fields(values, image_name, mode):
+    return [{"image": image_name, "mode": mode, **e} for e in values]
+
+
+def page_error_values(item, max_cells=HIRSCHBERG_CELLS, aligner="flat", char_detail=False):
+    """逐页结果缓存里存的值：去掉 image / mode 的错误记录。"""
+    errs, _, _ = page_errors_job(item, mode=None, max_cells=max_cells, aligner=aligner, char_detail=char_detail)
+    return strip_page_fields(errs)
+
+
+def iter_page_errors(pairs, mode, max_cells=HIRSCHBERG_CELLS, vocab=None, workers=1, page_cache=None,
+                     aligner="flat", char_detail=False):
+    """
+    按 image 顺序逐页产出错误记录列表；workers > 1 时分发到进程池。
+    传入 page_cache（src.page_cache.PageResultCache）时只对齐缓存里没有的页面；
+    命中的页面仍在主进程里分词并驻留进词表，词表与全量重算时相同。
+    page_cache 的命名空间要与 aligner / char_detail 对应（见 src.page_cache.page_errors_namespace）。
+    """
+    if page_cache is not None:
+        job = partial(page_error_values, max_cells=max_cells, aligner=aligner, char_detail=char_detail)
+        for item, values in page_cache.imap(job, pairs, workers=workers):
+            if vocab is not None:
+                vocab.encode(split_words(item_norm(item, "gt")))
+                vocab.encode(split_words(item_norm(item, "pred")))
+            yield restore_page_fields(values, item["image"], mode)
+        return
+
+    if workers <= 1:
+        for item in pairs:
+            yield extract_errors_for_page(item["image"], item["gt"], item["pred"],
+                                          mode=mode, max_cells=max_cells, vocab=vocab,
+                                          gt_norm=item.get("gt_norm"), pred_norm=item.get("pred_norm"),
+                                          aligner=aligner, char_detail=char_detail)
+        return
+
+    job = partial(page_errors_job, mode=mode, max_cells=max_cells, aligner=aligner, char_detail=char_detail)
+    for errs, gt_tokens, pred_tokens in imap_pages(job, pairs, workers=workers):
+        if vocab is not None:
+            vocab.encode(gt_tokens)
+            vocab.encode(pred_tokens)
+        yield errs
@@ -0,0 +1,276 @@
+# 流式读取“顶层是一个大数组”的 JSON 文件（Fox / OmniDocBench 的标注就是这种格式）。
+# 一次只解析一个元素，内存与单个元素大小相关，而不是整份文件。
+# 另外可以给标注文件建一个 image -> 字节区间 的紧凑索引（mmap），按图片名随机读取单条标注。
+# 写的方向：PagesJsonWriter 逐页写出 {总计..., "pages": [...]} 格式的统计文件，内存不随页数增长。
+
+import codecs
+import json
+import mmap
+import os
+import shutil
+
+import numpy as np
+
+from src.jsonl_index import edge_hash
+
+INDEX_VERSION = 1
+_CHUNK = 1 << 20
+_WS = " \t\n\r"
+
+
+def iter_json_array(path, chunk_size=_CHUNK, with_offsets=False):
+    """
+    逐个产出顶层数组里的元素。
+    with_offsets=True 时产出 (起始字节, 结束字节, 元素)，字节区间 [start, end) 正好是该元素的 JSON 原文。
+    """
+    decoder = json.JSONDecoder()
+    utf8 = codecs.getincrementaldecoder("utf-8")()
+    buf = ""
+    pos = 0              # buf 内的解析位置
+    cur = 0              # 字节游标所在的 buf 位置（上一个元素的结尾）
+    cur_byte = 0         # buf[cur] 在文件里的字节偏移；只对游标之后的新内容编码，不重复编码前缀
+    started = False
+    eof = False
+    want = chunk_size
+
+    with open(path, "rb") as f:
+        def fill(n):
+            nonlocal buf, pos, cur, cur_byte, eof
+            # 丢掉已经解析过的前缀，再读一块；游标先推进到 pos，跨块保持字节偏移
+            if pos:
+                cur_byte += len(buf[cur:pos].encode("utf-8"))
+                buf = buf[pos:]
+                pos = cur = 0
+            data = f.read(n)
+            if not data:
+                eof = True
+                buf += utf8.decode(b"", final=True)
+            else:
+                buf += utf8.decode(data)
+
+        while True:
+            # 跳过空白和分隔符
+            while True:
+                while pos < len(buf) and buf[pos] in _WS:
+                    pos += 1
+                if pos < len(buf) or eof:
+                    break
+                fill(chunk_size)
+
+            if pos >= len(buf):
+                raise ValueError(f"{path}: JSON 数组没有正常结束")
+            ch = buf[pos]
+            if not started:
+                if ch != "[":
+                    raise ValueError(f"{path}: 顶层不是 JSON 数组")
+                started = True
+                pos += 1
+                continue
+            if ch == "]":
+                return
+            if ch == ",":
+                pos += 1
+                continue
+
+            try:
+                obj, end = decoder.raw_decode(buf, pos)
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+                # 元素还没读全：再读一块（每次失败读入量翻倍，避免超大元素反复重解析）
+                fill(want)
+                want *= 2
+                continue
+            # 数字之类的元素可能恰好在块边界被截断，后面紧跟的必须是分隔符
+            if end >= len(buf) and not eof:
+                fill(want)
+                continue
+            want = chunk_size
+
+            if with_offsets:
+                start_b = cur_byte + len(buf[cur:pos].encode("utf-8"))
+                end_b = start_b + len(buf[pos:end].encode("utf-8"))
+                cur, cur_byte = end, end_b
+                yield start_b, end_b, obj
+            else:
+                yield obj
+            pos = end
+
+
+def gt_text_of(ann):
+    """Fox 标注的 GT 文本取 conversations[1]。"""
+    return ann["conversations"][1]["value"]
+
+
+def iter_annotations(path, chunk_size=_CHUNK):
+    """流式产出 (image, gt_text)。"""
+    for ann in iter_json_array(path, chunk_size=chunk_size):
+        yield ann["image"], gt_text_of(ann)
+
+
+# ---------- 逐页统计文件的流式写出 ----------
+
+class PagesJsonWriter:
+    """
+    w = PagesJsonWriter(out_path)
+    w.add(page_dict)                         # 每页到达时写出，不在内存里攒
+    w.close({"overall_cer": ..., ...})       # 总计最后才知道
+    结果与 json.dump({**totals, "pages": pages}, f, ensure_ascii=False, indent=2) 逐字节相同。
+    总计在 JSON 里排在 pages 前面，所以各页先写进旁边的临时文件，close() 时写完总计再整块拷过去。
+    """
+
+    def __init__(self, out_path):
+        self.out_path = out_path
+        self._spool_path = out_path + ".pages.tmp"
+        self._spool = open(self._spool_path, "w", encoding="utf-8")
+        self.n_pages = 0
+
+    def add(self, page):
+        # 顶层 indent=2 时，pages 里的元素缩进 4 格
+        body = json.dumps(page, ensure_ascii=False, indent=2).replace("\n", "\n    ")
+        self._spool.write((",\n    " if self.n_pages else "\n    ") + body)
+        self.n_pages += 1
+
+    def close(self, totals):
+        self._spool.close()
+        head = json.dumps({**totals, "pages": []}, ensure_ascii=False, indent=2)
+        assert head.endswith("[]\n}")
+        with open(self.out_path, "w", encoding="utf-8") as f:
+            f.write(head[:-len("]\n}")])
+            if self.n_pages:
+                with open(self._spool_path, "r", encoding="utf-8") as spool:
+                    shutil.copyfileobj(spool, f)
+                f.write("\n  ")
+            f.write("]\n}")
+        os.remove(self._spool_path)
+
+
+# ---------- image -> 字节区间 索引 ----------
+
+def index_path_for(path):
+    return path + ".idx.npz"
+
+
+class AnnotationIndex:
+    """
+    idx = AnnotationIndex(ann_path)   # 第一次流式扫一遍建索引，之后直接加载
+    idx.get("en_0.png")              # 只解析这一条标注，返回 gt_text
+    idx.images                       # 文件里的图片名（原顺序）
+    文件内容变化（大小或首尾字节不同）时自动重建；build=False 时不重建，索引缺失或过期直接抛 LookupError。
+    """
+
+    def __init__(self, path, index_path=None, build=True):
+        self.path = path
+        self.index_path = index_path or index_path_for(path)
+        self._f = open(path, "rb")
+        self.size = os.fstat(self._f.fileno()).st_size
+        self._mm = mmap.mmap(self._f.fileno(), 0, access=mmap.ACCESS_READ) if self.size else None
+        try:
+            self.images, self.starts, self.ends = self._load_or_build(build)
+        except LookupError:
+            self.close()
+            raise
+        self.row = {img: i for i, img in enumerate(self.images)}
+
+    def _fingerprint(self):
+        return {"version": INDEX_VERSION, "size": self.size,
+                "edges": edge_hash(self._mm, self.size) if self._mm is not None else ""}
+
+    def _load_or_build(self, build=True):
+        fp = self._fingerprint()
+        if os.path.exists(self.index_path):
+            with np.load(self.index_path, allow_pickle=False) as z:
+                meta = json.loads(z["meta"].tobytes().decode("utf-8"))
+                if meta.get("fingerprint") == fp:
+                    return meta["images"], z["starts"], z["ends"]
+        if not build:
+            raise LookupError(f"{self.index_path}: 索引不存在或已过期")
+
+        images, starts, ends = [], [], []
+        for start, end, ann in iter_json_array(self.path, with_offsets=True):
+            images.append(ann["image"])
+            starts.append(start)
+            ends.append(end)
+        starts = np.asarray(starts, dtype=np.int64)
+        ends = np.asarray(ends, dtype=np.int64)
+
+        meta = {"fingerprint": fp, "images": images}
+        tmp = self.index_path + ".tmp.npz"
+        np.savez(tmp, starts=starts, ends=ends,
+                 meta=np.frombuffer(json.dumps(meta, ensure_ascii=False).encode("utf-8"), dtype=np.uint8))
+        os.replace(tmp, self.index_path)
+        return images, starts, ends
+
+    def __len__(self):
+        return len(self.images)
+
+    def __contains__(self, image):
+        return image in self.row
+
+    def get_annotation(self, image):
+        i = self.row[image]
+        return json.loads(self._mm[int(self.starts[i]):int(self.ends[i])])
+
+    def get(self, image):
+        return gt_text_of(self.get_annotation(image))
+
+    def close(self):
+        if self._mm is not None:
+            self._mm.close()
+        self._f.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def cached_length(path):
+    """标注索引已存在且与文件一致时返回条目数；否则返回 None，不会为此把整份文件扫一遍。"""
+    if not os.path.exists(index_path_for(path)):
+        return None
+    try:
+        with AnnotationIndex(path, build=False) as idx:
+            return len(idx)
+    except LookupError:
+        return None
+
+
+def check_stream(path, chunk_sizes=(7, 64, 4096, _CHUNK)):
+    """对照 json.load 检查：各种块大小下元素一致，字节区间能还原出同一个元素，索引随机读取一致。"""
+    with open(path, "r", encoding="utf-8") as f:
+        expected = json.load(f)
+    with open(path, "rb") as f:
+        raw = f.read()
+    for cs in chunk_sizes:
+        got = list(iter_json_array(path, chunk_size=cs, with_offsets=True))
+        assert [o for _, _, o in got] == expected, f"chunk_size={cs}: 元素不一致"
+        assert all(json.loads(raw[s:e]) == o and raw[s:e].strip() == raw[s:e] for s, e, o in got), \
+            f"chunk_size={cs}: 字节区间不对"
+    with AnnotationIndex(path) as idx:
+        for ann in expected:
+            assert idx.get(ann["image"]) == gt_text_of(ann)
+    print(f"✅ {os.path.basename(path)}: {len(expected)} 条，流式读取 / 索引与 json.load 一致")
+
+
+if __name__ == "__main__":
+    import sys
+    import tempfile
+
+    for p in sys.argv[1:]:
+        check_stream(p)
+
+    # 非 ASCII、转义、嵌套、数字元素等边界情况
+    sample = [{"image": "a.png", "conversations": [{"value": "q"}, {"value": '中文 “引号” \\" \\\\ ]},["'}]},
+              {"image": "b.png", "conversations": [{"value": ""}, {"value": "x" * 5000 + "é"}]}]
+    with tempfile.TemporaryDirectory() as d:
+        p = os.path.join(d, "sample.json")
+        with open(p, "w", encoding="utf-8") as f:
+            json.dump(sample, f, ensure_ascii=False, indent=2)
+        check_stream(p)
+        p2 = os.path.join(d, "numbers.json")
+        with open(p2, "w", encoding="utf-8") as f:
+            f.write("[1, 22, 333 ,4444,\n 55555]")
+        assert list(iter_json_array(p2, chunk_size=3)) == [1, 22, 333, 4444, 55555]
+    print("✅ 边界情况正常")
@@ -0,0 +1,181 @@
+# JSONL 行偏移索引：给错误日志建一个 sidecar 索引（xxx.jsonl.idx.npz），记录每条非空行的起始字节。
+# 之后按行号随机读取只需 mmap + 定位，不必把整份日志解析一遍；文件只是变长时增量补齐索引。
+
+import hashlib
+import json
+import mmap
+import os
+
+import numpy as np
+
+INDEX_VERSION = 2
+
+# 判断“文件是不是被整体重写了”：对比已索引部分开头和结尾这么多字节的哈希
+_CHECK_BYTES = 4096
+# 扫描换行符时每次读入的块大小
+_SCAN_CHUNK = 64 << 20
+
+# str.isspace() 为真的 ASCII 字节；含有其它 ASCII 字节的行一定不是空白行
+_SOLID_BYTES = np.ones(256, dtype=bool)
+_SOLID_BYTES[[0x09, 0x0A, 0x0B, 0x0C, 0x0D, 0x1C, 0x1D, 0x1E, 0x1F, 0x20]] = False
+_SOLID_BYTES[0x80:] = False   # 非 ASCII 字节要解码后才知道是不是空白（如 U+3000）
+
+
+def index_path_for(jsonl_path):
+    return jsonl_path + ".idx.npz"
+
+
+def edge_hash(mm, end):
+    """[0, end) 这一段开头和结尾各 _CHECK_BYTES 字节的哈希。"""
+    h = hashlib.sha1(mm[:min(end, _CHECK_BYTES)])
+    h.update(mm[max(0, end - _CHECK_BYTES):end])
+    return h.hexdigest()
+
+
+def is_blank_line(raw: bytes) -> bool:
+    """与各脚本逐行读取时的 `if line.strip()` 相同的判空规则（按 UTF-8 解码后看 str.strip）。"""
+    return not raw.decode("utf-8", "replace").strip()
+
+
+def _scan_lines(mm, start, size):
+    """
+    从 start 扫到 size，返回 (非空行起始偏移数组, 已索引到的位置)。
+    只收录以换行结尾的完整行；末尾还没写完的半行留给下次增量刷新。
+    """
+    starts = []
+    pos = start
+    for chunk_start in range(start, size, _SCAN_CHUNK):
+        chunk_end = min(size, chunk_start + _SCAN_CHUNK)
+        buf = np.frombuffer(mm[chunk_start:chunk_end], dtype=np.uint8)
+        nl = np.flatnonzero(buf == 0x0A) + chunk_start
+        if len(nl) == 0:
+            continue
+        line_starts = np.concatenate(([pos], nl[:-1] + 1)).astype(np.int64)
+        # 每行是否含有 ASCII 非空白字节（向量化）；每段 [行首, 下一行首) 只多包含本行的换行符。
+        # 跨块的首行只看本块里的部分，没找到时与其余行一样走下面的精确判断
+        rel_starts = np.maximum(line_starts - chunk_start, 0)
+        keep = np.logical_or.reduceat(_SOLID_BYTES[buf[:nl[-1] - chunk_start + 1]], rel_starts)
+        for i in np.flatnonzero(~keep):
+            keep[i] = not is_blank_line(mm[line_starts[i]:nl[i]])
+        starts.append(line_starts[keep])
+        pos = int(nl[-1]) + 1
+    offsets = np.concatenate(starts) if starts else np.zeros(0, dtype=np.int64)
+    return offsets, pos
+
+
+class JsonlIndex:
+    """
+    index = JsonlIndex(path)       # 第一次会建索引，之后按需增量刷新
+    len(index)                     # 非空行数（与 json.loads 逐行读取时的记录数一致）
+    index.read(i) / index.read_many(ids)
+    """
+
+    def __init__(self, path, index_path=None):
+        self.path = path
+        self.index_path = index_path or index_path_for(path)
+        self._f = open(path, "rb")
+        self.size = os.fstat(self._f.fileno()).st_size
+        self._mm = mmap.mmap(self._f.fileno(), 0, access=mmap.ACCESS_READ) if self.size else None
+        self.offsets = self._load_or_build()
+
+    # ----- 建索引 / 增量刷新 -----
+
+    def _load_or_build(self):
+        if self._mm is None:
+            return np.zeros(0, dtype=np.int64)
+        offsets, indexed_to = None, 0
+        if os.path.exists(self.index_path):
+            with np.load(self.index_path, allow_pickle=False) as z:
+                meta = json.loads(z["meta"].tobytes().decode("utf-8"))
+                done = meta.get("indexed_to", -1)
+                # 版本一致、文件没有变短、已索引部分仍以换行结尾、其首尾内容没变
+                # -> 认为只是在末尾追加了内容，从 indexed_to 接着扫
+                if (meta.get("version") == INDEX_VERSION
+                        and 0 <= done <= self.size
+                        and (done == 0 or self._mm[done - 1:done] == b"\n")
+                        and meta["edges"] == edge_hash(self._mm, done)):
+                    offsets, indexed_to = z["offsets"], done
+
+        if offsets is not None and indexed_to == self.size:
+            return offsets
+
+        new, indexed_to = _scan_lines(self._mm, indexed_to, self.size)
+        offsets = new if offsets is None else np.concatenate((offsets, new))
+        self._save(offsets, indexed_to)
+        return offsets
+
+    def _save(self, offsets, indexed_to):
+        meta = {
+            "version": INDEX_VERSION,
+            "indexed_to": indexed_to,
+            "edges": edge_hash(self._mm, indexed_to),
+        }
+        tmp = self.index_path + ".tmp.npz"
+        np.savez(tmp, offsets=offsets,
+                 meta=np.frombuffer(json.dumps(meta).encode("utf-8"), dtype=np.uint8))
+        os.replace(tmp, self.index_path)
+
+    # ----- 随机读取 -----
+
+    def __len__(self):
+        return len(self.offsets)
+
+    def read_line(self, i) -> bytes:
+        start = int(self.offsets[i])
+        end = self._mm.find(b"\n", start)
+        return self._mm[start:end if end >= 0 else self.size]
+
+    def read(self, i):
+        return json.loads(self.read_line(i))
+
+    def read_many(self, ids):
+        """按给定顺序读取若干条记录；只解析这几行。"""
+        return [self.read(i) for i in ids]
+
+    def close(self):
+        if self._mm is not None:
+            self._mm.close()
+        self._f.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def check_index(jsonl_path):
+    """对照逐行读取检查索引：行数一致、每条记录一致；再模拟追加写入检查增量刷新。"""
+    with open(jsonl_path, "r", encoding="utf-8") as f:
+        expected = [json.loads(line) for line in f if line.strip()]
+    with JsonlIndex(jsonl_path) as idx:
+        assert len(idx) == len(expected), (len(idx), len(expected))
+        assert idx.read_many(range(len(idx))) == expected
+    print(f"✅ {os.path.basename(jsonl_path)}: {len(expected)} 行，索引读取一致")
+
+
+if __name__ == "__main__":
+    import sys
+    import tempfile
+
+    for p in sys.argv[1:]:
+        check_index(p)
+
+    # 增量刷新：先索引前半截（最后一行不完整），再追加剩余内容
+    if sys.argv[1:]:
+        with open(sys.argv[1], "rb") as f:
+            data = f.read()
+        with tempfile.TemporaryDirectory() as d:
+            tmp = os.path.join(d, "part.jsonl")
+            cut = len(data) // 2
+            with open(tmp, "wb") as f:
+                f.write(data[:cut])
+            JsonlIndex(tmp).close()
+            with open(tmp, "ab") as f:
+                f.write(data[cut:])
+            check_index(tmp)
+            # 整体重写（内容变了）时必须重建
+            with open(tmp, "wb") as f:
+                f.write(b"\n" + data)
+            check_index(tmp)
+        print("✅ 增量刷新 / 重写检测正常")
@@ -0,0 +1,89 @@
+# 评测配置清单（manifest）：一份 JSON 列出要比较的 N 个推理配置，
+# 代替各脚本里写死的 PRED_VT64_PATH / PRED_VT100_PATH。
+#
+# 格式：
+# {
+#   "name": "fox100_modes",
+#   "configs": [
+#     {"name": "vt64", "pred": "preds_vt64.json",
+#      "base_size": 512, "image_size": 512, "crop_mode": false, "prompt": "<image>\nFree OCR."},
+#     ...
+#   ]
+# }
+# name 同时是输出文件名里的模式名（stats_{name}_pages.json 等）；pred 为相对路径时相对于实验目录。
+# base_size / image_size / crop_mode / prompt 只用于报表，对应 DeepSeek-OCR config.py 里的模式说明。
+
+import json
+import os
+
+REQUIRED_KEYS = ("name", "pred")
+INFO_KEYS = ("base_size", "image_size", "crop_mode", "prompt")
+
+PROMPT_FREE_OCR = "<image>\nFree OCR."
+
+# 不给 manifest 时的默认配置：与原来写死的 vt64 / vt100 相同
+DEFAULT_CONFIGS = [
+    {"name": "vt64", "pred": "preds_vt64.json",
+     "base_size": 512, "image_size": 512, "crop_mode": False, "prompt": PROMPT_FREE_OCR},
+    {"name": "vt100", "pred": "preds_vt100.json",
+     "base_size": 640, "image_size": 640, "crop_mode": False, "prompt": PROMPT_FREE_OCR},
+]
+
+
+def resolve_configs(configs, exp_dir):
+    """校验配置并把 pred 解析成绝对路径；返回新的 list，不改动传入的 dict。"""
+    out = []
+    seen = set()
+    for i, cfg in enumerate(configs):
+        missing = [k for k in REQUIRED_KEYS if k not in cfg]
+        if missing:
+            raise ValueError(f"manifest 第 {i} 个配置缺少字段: {missing}")
+        name = cfg["name"]
+        if name in seen:
+            raise ValueError(f"manifest 里配置名重复: {name}")
+        seen.add(name)
+
+        cfg = dict(cfg)
+        if not os.path.isabs(cfg["pred"]):
+            cfg["pred"] = os.path.join(exp_dir, cfg["pred"])
+        out.append(cfg)
+    return out
+
+
+def load_manifest(path, exp_dir):
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    configs = data["configs"] if isinstance(data, dict) else data
+    return resolve_configs(configs, exp_dir)
+
+
+def describe(cfg):
+    """报表里的一列简短说明，例如 "512/512" 或 "1024/640 crop"。"""
+    if "base_size" not in cfg:
+        return ""
+    s = f"{cfg['base_size']}/{cfg.get('image_size', cfg['base_size'])}"
+    return s + (" crop" if cfg.get("crop_mode") else "")
+
+
+def write_comparison_table(path, summaries, configs):
+    """所有配置一张表（Markdown），列与 results/reports/fox100_key_errors_table.md 一致并加上 CER。"""
+    cfg_by_name = {c["name"]: c for c in configs}
+    lines = [
+        "| Config | Size | Prompt | Pages | CER | Total errors | Critical errors | Critical / all (%) "
+        "| ECI_all | ECI_crit | ECI_crit / ECI_all (%) |",
+        "|--------|------|--------|------:|----:|-------------:|----------------:|-------------------:"
+        "|--------:|---------:|-----------------------:|",
+    ]
+    for s in summaries:
+        cfg = cfg_by_name[s["mode"]]
+        prompt = cfg.get("prompt", "").replace("<image>", "").strip().replace("\n", " ").replace("|", "\\|")
+        total_err, total_w = s["total_err"], s["total_weight"]
+        crit_share = s["critical_err"] / total_err if total_err else 0.0
+        w_share = s["critical_weight"] / total_w if total_w else 0.0
+        lines.append(
+            f"| {s['mode']} | {describe(cfg)} | {prompt} | {s['n_pages']} | {s['overall_cer']:.2%} "
+            f"| {total_err:,} | {s['critical_err']:,} | {crit_share:.2%} "
+            f"| {total_w:,.1f} | {s['critical_weight']:,.1f} | {w_share:.2%} |"
+        )
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("\n".join(lines) + "\n")
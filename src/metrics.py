@@ -1,8 +1,11 @@
+import numpy as np
+
 # 数学符号提升至 3.0 (同数字级)
 WEIGHTS = {
     "word": 1.0, "punct": 0.5,
     "number": 3.0, "number+unit": 3.0, "money": 3.0, "date": 3.0,
     "math_symbol": 3.0, "negation": 2.0, "comparator": 2.0,
+    "hallucinated_repetition": 1.0,
 }
 CRITICAL_TYPES = {"number", "number+unit", "money", "date", "math_symbol", "negation", "comparator"}
 
@@ -18,3 +21,84 @@ def compute_stats(records):
     return {"total_err": total_err, "total_weight": total_weight, 
             "critical_err": crit_err, "critical_weight": crit_weight}
 
+
+
+class ErrorStatsAccumulator:
+    """
+    compute_stats 的流式版本：不需要先把全部记录读进内存。
+      - add(rec) / add_type(t)：逐条累加；
+      - add_type_codes(codes, type_names)：类型已字典编码（如列式错误库的 type 列）时，用 bincount 一次累加；
+      - merge(other)：合并另一份部分结果（分片 / 多进程各算一份再合起来），与一次算完完全相同。
+    计数按类型记录，权重由计数乘 WEIGHTS 得到；WEIGHTS 都是二进制下精确的小数，
+    所以总权重与 compute_stats 逐条相加的结果逐位相同。
+    """
+
+    def __init__(self):
+        self.counts = {}   # 类型 -> 条数（按首次出现顺序）
+
+    def add_type(self, t, n=1):
+        self.counts[t] = self.counts.get(t, 0) + n
+
+    def add(self, rec):
+        self.add_type(rec.get("type", "word"))
+
+    def add_records(self, records):
+        for rec in records:
+            self.add(rec)
+        return self
+
+    def add_type_codes(self, codes, type_names):
+        counts = np.bincount(np.asarray(codes), minlength=len(type_names))
+        for i in np.flatnonzero(counts):
+            self.add_type(type_names[i], int(counts[i]))
+        return self
+
+    def merge(self, other):
+        for t, n in other.counts.items():
+            self.add_type(t, n)
+        return self
+
+    @property
+    def weights(self):
+        """类型 -> 该类型错误的总权重。"""
+        return {t: n * WEIGHTS.get(t, 1.0) for t, n in self.counts.items()}
+
+    def stats(self):
+        """与 compute_stats 返回的 dict 相同。"""
+        total_err = 0; total_weight = 0.0
+        crit_err = 0; crit_weight = 0.0
+        for t, w in self.weights.items():
+            n = self.counts[t]
+            total_err += n; total_weight += w
+            if t in CRITICAL_TYPES:
+                crit_err += n; crit_weight += w
+        return {"total_err": total_err, "total_weight": total_weight,
+                "critical_err": crit_err, "critical_weight": crit_weight}
+
+
+def check_accumulator(records, n_shards=4):
+    """逐条 / 分片合并 / 编码数组三种方式累加，都应与 compute_stats 相同。"""
+    records = list(records)
+    expected = compute_stats(records)
+
+    one = ErrorStatsAccumulator().add_records(records)
+    merged = ErrorStatsAccumulator()
+    for s in range(n_shards):
+        merged.merge(ErrorStatsAccumulator().add_records(records[s::n_shards]))
+    names = sorted({r.get("type", "word") for r in records})
+    codes = [names.index(r.get("type", "word")) for r in records]
+    coded = ErrorStatsAccumulator().add_type_codes(codes, names)
+
+    for acc in (one, merged, coded):
+        assert acc.stats() == expected, (acc.stats(), expected)
+    return expected
+
+
+if __name__ == "__main__":
+    import json
+    import sys
+    for path in sys.argv[1:]:
+        with open(path, "r", encoding="utf-8") as f:
+            recs = [json.loads(line) for line in f if line.strip()]
+        print(path, check_accumulator(recs))
+    print("✅ ErrorStatsAccumulator 与 compute_stats 一致")
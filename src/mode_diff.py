@@ -0,0 +1,197 @@
+# 跨模式错误对比：原来的报表只比较 vt64 / vt100 的总数，看不出“哪些错误被高分辨率修好了、
+# 又新出了哪些”。这里把两个模式的带类型错误按 (image, gt_index) 做哈希连接，逐个 GT 位置分类：
+#   fixed      : A 有错，B 对了
+#   regressed  : A 对了，B 出错
+#   persistent : 两边都错（op / 预测词可以不同，看转移矩阵）
+#   new        : B 多插入的内容（ins 没有 GT 位置，按页内预测词匹配；A 里没有对应插入的算 new，
+#                A 有而 B 没有的算 fixed，两边都有的算 persistent）
+# 另外按错误类型给出状态转移矩阵 ok / sub / del / ins -> ok / sub / del / ins。
+# 每个模式建一次哈希索引，连接是线性的；N 个模式只需各读一次错误库。
+
+import numpy as np
+
+from src.error_store import open_error_store
+
+STATUSES = ("fixed", "regressed", "persistent", "new")
+STATES = ("ok", "sub", "del", "ins")
+
+# (image_id, gt_index) 打包成一个整数键；gt_index 小于 2^32
+_KEY_SHIFT = 32
+
+
+class ModeErrors:
+    """
+    一个模式的错误，按连接需要建好索引：
+      positions : {(image_id << 32) | gt_index: 行号}，sub / del 记录；
+      inserts   : {image_id: {pred_token: [行号, ...]}}，ins 记录。
+    image_id 在所有模式之间共用（image_ids 字典），这样不同错误库的图片编码可以直接比较。
+    """
+
+    def __init__(self, mode, typed_path, image_ids, images=None):
+        self.mode = mode
+        with open_error_store(typed_path) as store:
+            columns = ["image", "op", "gt_index", "gt_token", "pred_token"] + (["type"] if store.typed else [])
+            cols = store.load(columns, decode=False)
+            id_of = np.array([image_ids.setdefault(name, len(image_ids)) for name in store.dictionary("image")],
+                             dtype=np.int64)
+            image = id_of[cols["image"]]
+            self.op = store.decode("op", cols["op"])
+            self.gt_token = store.decode("gt_token", cols["gt_token"])
+            self.pred_token = store.decode("pred_token", cols["pred_token"])
+            self.type = store.decode("type", cols["type"]) if store.typed else np.full(len(image), "word", object)
+        gt_index = cols["gt_index"].astype(np.int64)
+        self.image = image
+        self.gt_index = gt_index
+
+        keep = np.ones(len(image), dtype=bool)
+        if images is not None:
+            wanted = np.zeros(len(image_ids) + 1, dtype=bool)
+            wanted[[image_ids[name] for name in images if name in image_ids]] = True
+            keep = wanted[image]
+        is_pos = keep & (gt_index >= 0)
+        rows = np.flatnonzero(is_pos)
+        keys = (image[rows] << _KEY_SHIFT) | gt_index[rows]
+        self.positions = dict(zip(keys.tolist(), rows.tolist()))
+
+        self.inserts = {}
+        for i in np.flatnonzero(keep & (gt_index < 0)).tolist():
+            self.inserts.setdefault(int(image[i]), {}).setdefault(self.pred_token[i], []).append(i)
+
+
+class DiffResult:
+    """两模式对比的累加结果；records=True 时保留每个位置的明细。"""
+
+    def __init__(self, mode_a, mode_b, image_names, keep_records=False):
+        self.mode_a = mode_a
+        self.mode_b = mode_b
+        self.image_names = image_names
+        self.counts = dict.fromkeys(STATUSES, 0)
+        self.by_type = {}
+        self.transitions = {}
+        self.pages = {}
+        self.records = [] if keep_records else None
+
+    def add(self, status, a, i, b, j):
+        """a / b：两个模式的 ModeErrors；i / j：行号，该模式在这个位置没有错误时为 None。"""
+        src = a if i is not None else b
+        row = i if i is not None else j
+        t = src.type[row]
+        img = int(src.image[row])
+        s_from = a.op[i] if i is not None else "ok"
+        s_to = b.op[j] if j is not None else "ok"
+
+        self.counts[status] += 1
+        self.by_type.setdefault(t, dict.fromkeys(STATUSES, 0))[status] += 1
+        matrix = self.transitions.setdefault(t, {s: dict.fromkeys(STATES, 0) for s in STATES})
+        matrix[s_from][s_to] += 1
+        self.pages.setdefault(img, dict.fromkeys(STATUSES, 0))[status] += 1
+        if self.records is not None:
+            gt_index = int(src.gt_index[row])
+            self.records.append({
+                "image": self.image_names[img],
+                "gt_index": None if gt_index < 0 else gt_index,
+                "gt_token": src.gt_token[row],
+                "type": t,
+                "status": status,
+                self.mode_a: None if i is None else {"op": a.op[i], "pred_token": a.pred_token[i]},
+                self.mode_b: None if j is None else {"op": b.op[j], "pred_token": b.pred_token[j]},
+            })
+
+    def to_dict(self):
+        return {
+            "from": self.mode_a,
+            "to": self.mode_b,
+            "counts": self.counts,
+            "by_type": {t: self.by_type[t] for t in sorted(self.by_type)},
+            "transitions": {t: self.transitions[t] for t in sorted(self.transitions)},
+            "pages": [{"image": self.image_names[img], **self.pages[img]}
+                      for img in sorted(self.pages, key=lambda k: self.image_names[k])],
+        }
+
+
+def diff_modes(a, b, image_names, keep_records=False):
+    """
+    a -> b 的逐位置对比（a 通常是低分辨率 / 基线模式）。两次字典遍历 + 每页一次插入匹配，线性时间。
+    image_names：image_id -> 图片名（共用 image_ids 字典反查得到）。
+    """
+    res = DiffResult(a.mode, b.mode, image_names, keep_records)
+    pos_b = b.positions
+    for key, i in a.positions.items():
+        j = pos_b.get(key)
+        res.add("fixed" if j is None else "persistent", a, i, b, j)
+    pos_a = a.positions
+    for key, j in pos_b.items():
+        if key not in pos_a:
+            res.add("regressed", a, None, b, j)
+
+    for img in sorted(a.inserts.keys() | b.inserts.keys()):
+        ins_a = a.inserts.get(img, {})
+        ins_b = b.inserts.get(img, {})
+        for tok in sorted(ins_a.keys() | ins_b.keys()):
+            rows_a, rows_b = ins_a.get(tok, []), ins_b.get(tok, [])
+            n = min(len(rows_a), len(rows_b))
+            for i, j in zip(rows_a[:n], rows_b[:n]):
+                res.add("persistent", a, i, b, j)
+            for i in rows_a[n:]:
+                res.add("fixed", a, i, b, None)
+            for j in rows_b[n:]:
+                res.add("new", a, None, b, j)
+    return res
+
+
+def load_modes(typed_paths, images=None):
+    """{mode: typed_path} -> ({mode: ModeErrors}, image_names)；images 给定时只看这些页面。"""
+    image_ids = {}
+    loaded = {mode: ModeErrors(mode, path, image_ids, images) for mode, path in typed_paths.items()}
+    image_names = [None] * len(image_ids)
+    for name, k in image_ids.items():
+        image_names[k] = name
+    return loaded, image_names
+
+
+def mode_pairs(modes, baseline=None):
+    """对比哪些模式对：默认相邻两两（按清单顺序，如分辨率从低到高）；给了 baseline 就都和它比。"""
+    if baseline is None:
+        return list(zip(modes, modes[1:]))
+    return [(baseline, m) for m in modes if m != baseline]
+
+
+def _nested_loop_diff(recs_a, recs_b):
+    """朴素实现对照（平方时间）：只统计 sub / del 位置的三类状态。"""
+    counts = dict.fromkeys(STATUSES, 0)
+    pos = lambda recs: [r for r in recs if r["gt_index"] is not None]
+    for ra in pos(recs_a):
+        hit = any(rb["image"] == ra["image"] and rb["gt_index"] == ra["gt_index"] for rb in pos(recs_b))
+        counts["persistent" if hit else "fixed"] += 1
+    for rb in pos(recs_b):
+        if not any(ra["image"] == rb["image"] and ra["gt_index"] == rb["gt_index"] for ra in pos(recs_a)):
+            counts["regressed"] += 1
+    return counts
+
+
+if __name__ == "__main__":
+    import json
+    import os
+    import sys
+    import time
+
+    exp_dir = sys.argv[1] if len(sys.argv) > 1 else os.path.join("data", "Fox", "exp_fox100")
+    paths = {m: os.path.join(exp_dir, f"fox100_errors_{m}_typed.jsonl") for m in ("vt64", "vt100")}
+    t0 = time.perf_counter()
+    modes, names = load_modes(paths)
+    res = diff_modes(modes["vt64"], modes["vt100"], names, keep_records=True)
+    dt = time.perf_counter() - t0
+
+    recs = {}
+    for m, p in paths.items():
+        with open(p, "r", encoding="utf-8") as f:
+            recs[m] = [json.loads(line) for line in f if line.strip()]
+    expected = _nested_loop_diff(recs["vt64"], recs["vt100"])
+    n_ins = {m: sum(r["op"] == "ins" for r in rs) for m, rs in recs.items()}
+    ins_counts = {s: sum(r["status"] == s for r in res.records if r["gt_index"] is None) for s in STATUSES}
+    for s in ("fixed", "regressed", "persistent"):
+        assert res.counts[s] - ins_counts[s] == expected[s], (s, res.counts, expected)
+    assert ins_counts["fixed"] + ins_counts["persistent"] == n_ins["vt64"]
+    assert ins_counts["new"] + ins_counts["persistent"] == n_ins["vt100"]
+    assert sum(res.counts.values()) == len(res.records)
+    print(f"✅ 哈希连接与朴素嵌套循环一致（{dt * 1000:.1f}ms）：", res.counts)
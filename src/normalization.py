@@ -1,9 +1,12 @@
 # 公用工具。用于清理文本格式，几乎所有评测脚本都引用它。
 
 # text_normalize.py
+import inspect
 import unicodedata
 import re
 
+from src.cache import DiskCache, DEFAULT_CACHE_PATH, text_hash, fingerprint_of
+
 # 一些常见的引号、破折号统一成 ASCII 版本
 _TRANS_TABLE = str.maketrans({
     "“": '"', "”": '"', "„": '"', "«": '"', "»": '"',
@@ -12,12 +15,16 @@ _TRANS_TABLE = str.maketrans({
     "…": "...",
 })
 
+# 规范化用到的正则，预编译一次
+_INLINE_SPACE_RE = re.compile(r"[ \t]+")
+_HYPHEN_BREAK_RE = re.compile(r"([A-Za-z])-\n([A-Za-z])")
+
 def _fix_hyphen_breaks(text: str) -> str:
     """
     把像 "infor-\nmation" 这种断行，合并成 "information"。
     只在字母-字母的地方合并，避免破坏真正的减号。
     """
-    return re.sub(r"([A-Za-z])-\n([A-Za-z])", r"\1\2", text)
+    return _HYPHEN_BREAK_RE.sub(r"\1\2", text)
 
 def normalize_text(s: str) -> str:
     """
@@ -43,7 +50,7 @@ def normalize_text(s: str) -> str:
 
     # 4) 合并连续空格/Tab 为一个空格（不动换行）
     #    注意这里不把 \n 换成空格，只是压缩行内空白
-    s = re.sub(r"[ \t]+", " ", s)
+    s = _INLINE_SPACE_RE.sub(" ", s)
 
     # 5) 处理断词：word-\nword -> wordword
     s = _fix_hyphen_breaks(s)
@@ -53,3 +60,86 @@ def normalize_text(s: str) -> str:
 
     return s
 
+
+# ========== 规范化结果缓存 ==========
+# 同一份 GT 每个脚本、每个模式都要规范化一遍；结果只取决于输入文本和规则本身，
+# 所以按 (文本哈希, 规则指纹) 存到磁盘，下次直接取。
+
+# 规则里有代码改动但指纹算不出来的情况（比如改了调用顺序以外的地方）时手动加一
+NORMALIZATION_VERSION = 1
+
+# 规则指纹：替换表 + 正则 + 两个函数的源码 + Unicode 版本（NFKC 结果随 Unicode 版本变）。
+# 任何一项变化，旧缓存在打开时自动清掉。
+NORMALIZATION_FINGERPRINT = fingerprint_of(
+    NORMALIZATION_VERSION,
+    sorted(_TRANS_TABLE.items()),
+    _INLINE_SPACE_RE.pattern,
+    _HYPHEN_BREAK_RE.pattern,
+    inspect.getsource(_fix_hyphen_breaks),
+    inspect.getsource(normalize_text),
+    unicodedata.unidata_version,
+)
+
+
+class NormalizationCache:
+    """
+    normalize_text 的持久化缓存：磁盘 SQLite + 内存 LRU，批量查、批量写。
+    用法：
+        cache = NormalizationCache()
+        norms = cache.normalize_many(texts)   # 与 [normalize_text(t) for t in texts] 相同
+    """
+
+    NAMESPACE = "normalize_text"
+
+    def __init__(self, path: str = DEFAULT_CACHE_PATH, memory_items: int = 10000):
+        self.store = DiskCache(self.NAMESPACE, NORMALIZATION_FINGERPRINT, path=path,
+                               memory_items=memory_items)
+        self.hits = 0
+        self.misses = 0
+
+    def get_many(self, texts):
+        """返回 {文本哈希: 规范化结果}，只含命中的条目。"""
+        return self.store.get_many([text_hash(t) for t in texts])
+
+    def put_many(self, texts, norms):
+        self.store.put_many([(text_hash(t), n) for t, n in zip(texts, norms)])
+
+    def normalize_many(self, texts):
+        texts = ["" if t is None else t for t in texts]
+        keys = [text_hash(t) for t in texts]
+        found = self.store.get_many(keys)
+
+        new = {}
+        for k, t in zip(keys, texts):
+            if k not in found and k not in new:
+                new[k] = normalize_text(t)
+        self.store.put_many(new)
+        self.hits += len(texts) - len(new)
+        self.misses += len(new)
+
+        return [found[k] if k in found else new[k] for k in keys]
+
+    def close(self):
+        self.store.close()
+
+
+def attach_normalized(pairs, cache, fields=("gt", "pred")):
+    """
+    给每个 {"image", "gt", "pred"} 条目补上 "gt_norm" / "pred_norm"（原地修改并返回）。
+    cache 为 None 时什么都不做，下游照常现算。
+    """
+    if cache is None:
+        return pairs
+    for field in fields:
+        norms = cache.normalize_many([item[field] for item in pairs])
+        for item, norm in zip(pairs, norms):
+            item[field + "_norm"] = norm
+    return pairs
+
+
+def item_norm(item, field):
+    """取条目里已经规范化好的文本；没有就现算。"""
+    key = field + "_norm"
+    if key in item:
+        return item[key]
+    return normalize_text(item[field])
@@ -0,0 +1,82 @@
+# 逐页结果缓存：只重算 GT / 预测文本有变化的页面。
+# 键 = (GT 原文哈希, 预测原文哈希)，命名空间的指纹包含规范化规则和对齐算法版本，
+# 规则一变，旧结果在打开缓存时自动清掉。语料级汇总仍由各页数值（缓存的或新算的）累加得到。
+
+from src.cache import DiskCache, DEFAULT_CACHE_PATH, text_hash, fingerprint_of
+from src.normalization import NORMALIZATION_FINGERPRINT
+from src.alignment import ALIGNMENT_VERSION
+from src.parallel import imap_pages
+
+# 各类逐页结果的缓存指纹
+PAGE_CER_FINGERPRINT = fingerprint_of("page_cer", 1, NORMALIZATION_FINGERPRINT)
+PAGE_WER_FINGERPRINT = fingerprint_of("page_wer", 1, NORMALIZATION_FINGERPRINT)
+PAGE_ERRORS_FINGERPRINT = fingerprint_of("page_errors", 1, NORMALIZATION_FINGERPRINT, ALIGNMENT_VERSION)
+# 融合流水线：CER + 错误记录一起缓存（错误类型不缓存，每次按当前 taxonomy 现分类）
+PAGE_ANALYSIS_FINGERPRINT = fingerprint_of("page_analysis", 1, NORMALIZATION_FINGERPRINT, ALIGNMENT_VERSION)
+
+def page_errors_namespace(aligner="flat", char_detail=False):
+    """
+    错误记录缓存的命名空间：默认的整页对齐沿用 "page_errors"，
+    其它对齐方式 / 带字符级明细的结果各用一个命名空间，互不覆盖。
+    """
+    name = "page_errors" if aligner == "flat" else f"page_errors_{aligner}"
+    return name + "_chars" if char_detail else name
+
+
+# 新算的结果攒够这么多页写一次库
+_FLUSH_EVERY = 256
+
+
+def page_key(item) -> str:
+    return text_hash(item["gt"] or "") + ":" + text_hash(item["pred"] or "")
+
+
+class PageResultCache:
+    """
+    cache = PageResultCache("page_cer", PAGE_CER_FINGERPRINT)
+    for item, value in cache.imap(func, items, workers=4):
+        ...
+    value 必须能 JSON 序列化，且不能包含与页面内容无关的字段（image / mode 由调用方补上），
+    这样同一对文本换了文件名也能命中。
+    """
+
+    def __init__(self, namespace, fingerprint, path=DEFAULT_CACHE_PATH, key=page_key):
+        self.store = DiskCache(namespace, fingerprint, path=path, memory_items=0)
+        self.key = key
+        self.hits = 0
+        self.misses = 0
+
+    def imap(self, func, items, workers=1):
+        """按输入顺序产出 (item, func(item))；命中缓存的页面不调用 func，未命中的分发到进程池。"""
+        items = list(items)
+        keys = [self.key(it) for it in items]
+        found = self.store.get_many(keys)
+
+        # 只算缓存里没有的；同一对文本在本批里出现多次时只算第一次
+        todo = {}
+        for it, k in zip(items, keys):
+            if k not in found and k not in todo:
+                todo[k] = it
+        computed = imap_pages(func, list(todo.values()), workers=workers)
+        pending = []
+        try:
+            for item, key in zip(items, keys):
+                if key in found:
+                    self.hits += 1
+                    yield item, found[key]
+                    continue
+                value = next(computed)
+                self.misses += 1
+                found[key] = value
+                pending.append((key, value))
+                if len(pending) >= _FLUSH_EVERY:
+                    self.store.put_many(pending)
+                    pending = []
+                yield item, value
+        finally:
+            # 调用方提前关闭生成器时，已算好的结果也要落盘
+            self.store.put_many(pending)
+            computed.close()
+
+    def close(self):
+        self.store.close()
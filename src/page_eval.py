@@ -0,0 +1,84 @@
+# 逐页评测的公共流程：1_calc_cer.py（字符级 CER）和 7_calc_wer.py（词级 WER）都走这里。
+# 每页结果按 image 顺序流式收回（进程池 / 逐页结果缓存），收到就交给 PagesJsonWriter 写出，
+# 内存不随页数增长；整体值 = 各页编辑距离之和 / 各页 GT 长度之和。
+
+from functools import partial
+
+from src.edit_distance import get_backend, DEFAULT_BACKEND
+from src.json_stream import PagesJsonWriter
+from src.parallel import imap_pages
+
+
+class PageMetric:
+    """
+    一种逐页指标。value(item, backend=...) 返回不含 image 的
+    {count_key: GT 长度, "edit_distance": 距离, name: 比率}，可以直接放进逐页结果缓存。
+      name      : "cer" / "wer"，也决定整体值的键 overall_{name}
+      count_key : 每页 GT 长度的键，如 "n_char"
+      total_key : 整体 GT 长度的键，如 "total_chars"
+      unit      : 打印用的单位名，如 "字符"
+      label     : 打印时接在模式名后面的说明，如 " WER"
+    """
+
+    def __init__(self, name, value, count_key, total_key, unit, label=""):
+        self.name = name
+        self.value = value
+        self.count_key = count_key
+        self.total_key = total_key
+        self.unit = unit
+        self.label = label
+
+    def stats(self, item, backend=DEFAULT_BACKEND):
+        """单页统计 dict：{"image", count_key, "edit_distance", name}。"""
+        return {"image": item["image"], **self.value(item, backend=backend)}
+
+
+def eval_pairs(metric, pairs, out_path, tag="vt64", backend=DEFAULT_BACKEND, workers=1, page_cache=None):
+    """
+    计算每页指标和整体指标，写入 out_path (JSON)，返回整体值。
+    backend: 编辑距离后端，见 src.edit_distance.BACKENDS。
+    workers: >1 时按页分块分发到进程池；结果按 image 顺序收回，输出与顺序执行逐字节相同。
+    page_cache: 逐页结果缓存；只重算 GT / 预测有变化的页面，整体值由各页数值重新累加。
+    """
+    get_backend(backend)  # 先校验后端名，避免子进程里才报错
+    name = metric.name.upper()
+    writer = PagesJsonWriter(out_path)
+    total_count = 0
+    total_dist = 0
+
+    print(f"\n=== 开始评测 {tag}{metric.label}，样本数 = {len(pairs)}，后端 = {backend}，进程数 = {workers} ===")
+
+    if page_cache is not None:
+        job = partial(metric.value, backend=backend)
+        page_iter = ({"image": item["image"], **value}
+                     for item, value in page_cache.imap(job, pairs, workers=workers))
+    else:
+        page_iter = imap_pages(partial(metric.stats, backend=backend), pairs, workers=workers)
+
+    for i, stats in enumerate(page_iter):
+        count = stats[metric.count_key]
+        dist = stats["edit_distance"]
+
+        total_count += count
+        total_dist += dist
+        writer.add(stats)
+
+        if i < 3:
+            print(f"[样例 {i}] {stats['image']}: {metric.count_key}={count}, dist={dist}, "
+                  f"{name}={stats[metric.name]:.4f}")
+
+    overall = total_dist / total_count if total_count > 0 else 0.0
+
+    # 总计最后写在 pages 前面
+    writer.close({
+        f"overall_{metric.name}": overall,
+        metric.total_key: total_count,
+        "total_edit_distance": total_dist,
+    })
+
+    print(f"\n✅ {tag}{metric.label} 评测完成：")
+    print(f"   总{metric.unit}数 = {total_count}")
+    print(f"   总编辑距离 = {total_dist}")
+    print(f"   整体 {name} = {overall:.4%}")
+    print(f"   详细结果已保存到: {out_path}")
+    return overall
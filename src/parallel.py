@@ -0,0 +1,34 @@
+# 多进程逐页评测的小工具。1_calc_cer.py / 2_align_errors.py 的 --workers 都走这里。
+
+import multiprocessing
+
+
+def auto_chunksize(n_items: int, workers: int, max_chunk: int = 16) -> int:
+    """
+    每个进程一次领取多少页：页数多时成块分发减少进程间通信，
+    但块不能太大，否则个别超长页面会拖住整块、各进程负载不均。
+    """
+    if workers <= 1 or n_items <= 0:
+        return 1
+    return max(1, min(max_chunk, n_items // (workers * 4)))
+
+
+def imap_pages(func, items, workers: int = 1, chunksize: int = None):
+    """
+    按输入顺序逐条产出 func(item) 的结果（生成器）。
+    - workers <= 1：在当前进程里顺序执行，和原来的 for 循环完全一样；
+    - workers > 1：用进程池 imap 分块分发，结果按输入顺序流式返回，
+      调用方边收边写文件，内存不随页数增长，输出与顺序执行逐字节相同。
+    func 必须是模块顶层函数（或其 functools.partial），才能被 pickle 到子进程。
+    """
+    if workers is None or workers <= 1:
+        for item in items:
+            yield func(item)
+        return
+
+    if chunksize is None:
+        n_items = len(items) if hasattr(items, "__len__") else 0
+        chunksize = auto_chunksize(n_items, workers)
+
+    with multiprocessing.Pool(processes=workers) as pool:
+        yield from pool.imap(func, items, chunksize=chunksize)
@@ -0,0 +1,223 @@
+# 融合流水线：每页只读一次、规范化一次，一遍算完 CER、词级对齐、错误类型和 ECI/KER，
+# 产物与 1_calc_cer → 2_align_errors → 3_tag_errors → 4_calc_ker → 5_summ_errors 分开跑时相同。
+
+import json
+from collections import Counter
+from contextlib import ExitStack
+from functools import partial
+
+from src.normalization import normalize_text, item_norm
+from src.edit_distance import get_backend, DEFAULT_BACKEND
+from src.alignment import align_tokens_auto, HIRSCHBERG_CELLS
+from src.errors import split_words, errors_from_ops, strip_page_fields, restore_page_fields
+from src.metrics import ErrorStatsAccumulator
+from src.parallel import imap_pages
+from src.error_store import ErrorStoreWriter, store_path_for
+from src.cache import text_hash
+from src.repetition import detect_repetition, loop_start, repetition_type, write_repetition_report
+
+
+# ---------- 1. 单页分析 ----------
+
+def analyze_page(item, mode, backend=DEFAULT_BACKEND, max_cells=HIRSCHBERG_CELLS):
+    """
+    item: {"image", "gt_norm", "pred"}，其中 GT 已经规范化过（所有模式共用一份）；
+    若条目里已有 "pred_norm"（来自规范化缓存）则直接使用。
+    返回 (页面 CER 统计, 错误记录, gt_tokens, pred_tokens)；token 交给主进程驻留进词表。
+    """
+    gt_norm = item["gt_norm"]
+    pred_norm = item_norm(item, "pred")
+
+    dist = get_backend(backend)(gt_norm, pred_norm)
+    n_char = len(gt_norm)
+    stats = {
+        "image": item["image"],
+        "n_char": n_char,
+        "edit_distance": dist,
+        "cer": dist / n_char if n_char > 0 else 0.0,
+    }
+
+    gt_tokens = split_words(gt_norm)
+    pred_tokens = split_words(pred_norm)
+    ops = align_tokens_auto(gt_tokens, pred_tokens, max_cells=max_cells)
+    errors = errors_from_ops(item["image"], gt_tokens, pred_tokens, ops, mode)
+    return stats, errors, gt_tokens, pred_tokens
+
+
+# ---------- 2. 整个模式 ----------
+
+def normalize_gt(gt_by_image, cache=None):
+    """GT 在整个运行中只规范化一次，所有模式共用；给了 cache 则跨运行复用。"""
+    if cache is None:
+        return {img: normalize_text(text) for img, text in gt_by_image.items()}
+    images = list(gt_by_image)
+    norms = cache.normalize_many([gt_by_image[img] for img in images])
+    return dict(zip(images, norms))
+
+
+def build_items(gt_norm_by_image, pred_by_image):
+    """与 dataset.build_pairs 相同的对齐规则（按 image 排序、跳过缺失），但携带规范化后的 GT。"""
+    items = []
+    missing = []
+    for img in sorted(gt_norm_by_image):
+        if img not in pred_by_image:
+            missing.append(img)
+            continue
+        items.append({"image": img, "gt_norm": gt_norm_by_image[img], "pred": pred_by_image[img]})
+    if missing:
+        print(f"⚠ 预测中缺少 {len(missing)} 张图片，例如: {missing[:5]}")
+    print(f"✅ 成功对齐图片数量: {len(items)}")
+    return items
+
+
+def write_cer_stats(out_path, page_stats, total_chars, total_dist):
+    """与 1_calc_cer.eval_pairs 写出的 JSON 格式完全一致。"""
+    overall_cer = total_dist / total_chars if total_chars > 0 else 0.0
+    with open(out_path, "w", encoding="utf-8") as f:
+        json.dump({
+            "overall_cer": overall_cer,
+            "total_chars": total_chars,
+            "total_edit_distance": total_dist,
+            "pages": page_stats,
+        }, f, ensure_ascii=False, indent=2)
+    return overall_cer
+
+
+class ModeWriter:
+    """
+    一个模式（配置）的输出端：逐页接收 analyze_page 的结果，写出
+      out_paths["stats"]  -> stats_{mode}_pages.json
+      out_paths["errors"] -> fox100_errors_{mode}.jsonl
+      out_paths["typed"]  -> fox100_errors_{mode}_typed.jsonl（以及同名 .npz 列式错误库）
+      out_paths["repetition"] -> fox100_repetition_{mode}.json（repetition=True 时）
+    close() 返回该模式的汇总 dict（CER、ECI/KER、类型分布）。
+    repetition=True：逐页检测预测的重复循环（src/repetition.py），循环区间里的错误归为幻觉重复类型。
+    """
+
+    def __init__(self, mode, out_paths, vocab, repetition=False):
+        self.mode = mode
+        self.out_paths = out_paths
+        self.vocab = vocab
+        self.repetition = repetition
+        self.repetition_reports = []
+        self.page_stats = []
+        self.total_chars = 0
+        self.total_dist = 0
+        self.acc = ErrorStatsAccumulator()
+
+        # 列式库最先打开、最后关闭，保证它比 JSONL 新，open_error_store 不会重复转换
+        self._files = ExitStack()
+        self.store = self._files.enter_context(ErrorStoreWriter(store_path_for(out_paths["typed"])))
+        self.f_err = self._files.enter_context(open(out_paths["errors"], "w", encoding="utf-8"))
+        self.f_typed = self._files.enter_context(open(out_paths["typed"], "w", encoding="utf-8"))
+
+    def add_page(self, stats, errors, gt_tokens, pred_tokens):
+        self.page_stats.append(stats)
+        self.total_chars += stats["n_char"]
+        self.total_dist += stats["edit_distance"]
+
+        vocab = self.vocab
+        vocab.encode(gt_tokens)
+        pred_ids = vocab.encode(pred_tokens)
+
+        start = None
+        if self.repetition:
+            report = detect_repetition(pred_ids.tolist())
+            self.repetition_reports.append({"image": stats["image"], **report})
+            start = loop_start(report)
+
+        for rec in errors:
+            # 与 3_tag_errors 相同：优先用 gt_token，没有就用 pred_token
+            t = vocab.type_of(rec["gt_token"] or rec["pred_token"] or "")
+            t = repetition_type(rec, t, start)
+            self.acc.add_type(t)
+            # 带类型的记录 = 原记录末尾追加 "type"，直接拼接字符串，不必再序列化一遍
+            line = json.dumps(rec, ensure_ascii=False)
+            self.f_err.write(line + "\n")
+            self.f_typed.write(line[:-1] + ', "type": ' + json.dumps(t, ensure_ascii=False) + "}\n")
+            rec["type"] = t
+            self.store.append(rec)
+
+    def close(self):
+        self._files.close()
+        overall_cer = write_cer_stats(self.out_paths["stats"], self.page_stats,
+                                      self.total_chars, self.total_dist)
+        summary = {
+            "mode": self.mode,
+            "n_pages": len(self.page_stats),
+            "overall_cer": overall_cer,
+            "total_chars": self.total_chars,
+            "total_edit_distance": self.total_dist,
+            **self.acc.stats(),
+            "type_counts": dict(Counter(self.acc.counts).most_common()),
+        }
+        if self.repetition:
+            write_repetition_report(self.out_paths["repetition"], self.mode, self.repetition_reports)
+            summary["n_loop_pages"] = sum(r["is_loop"] for r in self.repetition_reports)
+        return summary
+
+
+def _analyze_task(task, backend=DEFAULT_BACKEND, max_cells=HIRSCHBERG_CELLS):
+    mode, item = task
+    return analyze_page(item, mode, backend=backend, max_cells=max_cells)
+
+
+def task_key(task):
+    """逐页结果缓存的键：规范化后的 GT（已含规范化版本）+ 预测原文。"""
+    _, item = task
+    return text_hash(item["gt_norm"]) + ":" + text_hash(item["pred"] or "")
+
+
+def _analyze_task_value(task, backend=DEFAULT_BACKEND, max_cells=HIRSCHBERG_CELLS):
+    """缓存里存的单页结果：CER 数值 + 去掉 image / mode 的错误记录。"""
+    stats, errors, _, _ = _analyze_task(task, backend=backend, max_cells=max_cells)
+    return {
+        "n_char": stats["n_char"],
+        "edit_distance": stats["edit_distance"],
+        "cer": stats["cer"],
+        "errors": strip_page_fields(errors),
+    }
+
+
+def _iter_cached(tasks, page_cache, backend, max_cells, workers):
+    """与 imap_pages(_analyze_task, ...) 产出相同的 (stats, errors, gt_tokens, pred_tokens)，但命中缓存的页面不重算。"""
+    job = partial(_analyze_task_value, backend=backend, max_cells=max_cells)
+    for (mode, item), value in page_cache.imap(job, tasks, workers=workers):
+        stats = {"image": item["image"], "n_char": value["n_char"],
+                 "edit_distance": value["edit_distance"], "cer": value["cer"]}
+        errors = restore_page_fields(value["errors"], item["image"], mode)
+        yield stats, errors, split_words(item["gt_norm"]), split_words(item_norm(item, "pred"))
+
+
+def run_modes(runs, vocab, backend=DEFAULT_BACKEND, max_cells=HIRSCHBERG_CELLS, workers=1, page_cache=None,
+              repetition=False):
+    """
+    一次跑完多个模式（配置）。runs: [(mode, out_paths, items), ...]。
+    所有配置的页面排成一条任务流交给同一个进程池，配置之间也并行；
+    结果按顺序流回主进程，由各自的 ModeWriter 写出，词表 / 类型缓存在配置之间共用。
+    page_cache（PageResultCache，键为 task_key）：只重算 GT / 预测有变化的页面，汇总由各页数值重新累加。
+    repetition：见 ModeWriter；检测在主进程里对已驻留的 pred id 做，与缓存无关。
+    返回各配置的汇总 dict 列表（顺序同 runs）。
+    """
+    tasks = [(mode, item) for mode, _, items in runs for item in items]
+    if page_cache is not None:
+        results = _iter_cached(tasks, page_cache, backend, max_cells, workers)
+    else:
+        job = partial(_analyze_task, backend=backend, max_cells=max_cells)
+        results = imap_pages(job, tasks, workers=workers)
+
+    summaries = []
+    for mode, out_paths, items in runs:
+        writer = ModeWriter(mode, out_paths, vocab, repetition=repetition)
+        for _ in range(len(items)):
+            writer.add_page(*next(results))
+        summaries.append(writer.close())
+    results.close()
+    return summaries
+
+
+def run_mode(items, mode, out_paths, vocab, backend=DEFAULT_BACKEND,
+             max_cells=HIRSCHBERG_CELLS, workers=1):
+    """一遍跑完一个模式，写出的产物见 ModeWriter；返回该模式的汇总 dict。"""
+    return run_modes([(mode, out_paths, items)], vocab, backend=backend,
+                     max_cells=max_cells, workers=workers)[0]
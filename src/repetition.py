@@ -0,0 +1,229 @@
+# 重复循环检测：vt64 等低分辨率模式常陷入“刷屏式”重复（同一串数字 / 短语一直循环到 max_tokens），
+# 原来只能从 vLLM 脚本里“没有 end_of_sentence”间接猜测。这里对预测的 token 序列直接检测：
+#   - 后缀自动机（线性时间）：最长的重复子串、出现次数最多的重复子串；
+#   - Z 函数（线性时间）：结尾处的循环——起点、周期、重复次数、覆盖率。
+# 结尾循环足够长时判为幻觉重复，循环区间里的 ins / sub 错误归入 REPETITION_TYPE。
+
+import json
+
+from src.taxonomy import REPETITION_TYPE
+
+# 判为循环的条件：周期至少重复这么多次，且循环区间至少这么多个 token
+LOOP_MIN_REPEATS = 3
+LOOP_MIN_TOKENS = 16
+# 周期上限（token 数）；更长的“周期”已经不像生成循环
+LOOP_MAX_PERIOD = 256
+# “出现最多的重复子串”只看长度不小于这个值的子串，否则总是某个高频单词
+FREQUENT_MIN_LEN = 3
+
+
+class SuffixAutomaton:
+    """
+    序列（任意可哈希元素）的后缀自动机，O(n) 个状态、均摊 O(n) 构建。
+    每个状态记录 length（最长串长度）、link、occ（出现次数）、end（第一次出现的结束位置）。
+    """
+
+    def __init__(self, seq):
+        self.next = [{}]
+        self.link = [-1]
+        self.length = [0]
+        self.end = [-1]
+        self._cloned = [False]
+        last = 0
+        for pos, x in enumerate(seq):
+            last = self._extend(last, x, pos)
+        self.occ = self._count_occurrences()
+
+    def _new_state(self, length, end, trans=None, link=-1, cloned=False):
+        self.next.append(dict(trans) if trans else {})
+        self.link.append(link)
+        self.length.append(length)
+        self.end.append(end)
+        self._cloned.append(cloned)
+        return len(self.length) - 1
+
+    def _extend(self, last, x, pos):
+        nxt, link, length = self.next, self.link, self.length
+        cur = self._new_state(length[last] + 1, pos)
+        p = last
+        while p != -1 and x not in nxt[p]:
+            nxt[p][x] = cur
+            p = link[p]
+        if p == -1:
+            link[cur] = 0
+            return cur
+        q = nxt[p][x]
+        if length[p] + 1 == length[q]:
+            link[cur] = q
+            return cur
+        clone = self._new_state(length[p] + 1, self.end[q], nxt[q], link[q], cloned=True)
+        while p != -1 and nxt[p].get(x) == q:
+            nxt[p][x] = clone
+            p = link[p]
+        link[q] = clone
+        link[cur] = clone
+        return cur
+
+    def _count_occurrences(self):
+        # 非克隆状态各计 1 次，按 length 从长到短沿 link 累加（计数排序，线性）
+        n_states = len(self.length)
+        occ = [0 if c else 1 for c in self._cloned]
+        occ[0] = 0
+        buckets = [[] for _ in range(max(self.length) + 1)]
+        for s in range(1, n_states):
+            buckets[self.length[s]].append(s)
+        for bucket in reversed(buckets):
+            for s in bucket:
+                occ[self.link[s]] += occ[s]
+        return occ
+
+    def longest_repeat(self):
+        """出现至少两次的最长子串：(start, length, count)；没有时返回 None。"""
+        best = None
+        for s in range(1, len(self.length)):
+            if self.occ[s] >= 2 and (best is None or self.length[s] > self.length[best]):
+                best = s
+        return None if best is None else self._describe(best, self.length[best])
+
+    def most_frequent_repeat(self, min_len=FREQUENT_MIN_LEN):
+        """长度不小于 min_len 的子串里出现次数最多的（同次数取更长）：(start, length, count)。"""
+        best = None
+        for s in range(1, len(self.length)):
+            if self.length[s] < min_len or self.occ[s] < 2:
+                continue
+            if best is None or (self.occ[s], self.length[s]) > (self.occ[best], self.length[best]):
+                best = s
+        return None if best is None else self._describe(best, self.length[best])
+
+    def _describe(self, s, length):
+        return {"start": self.end[s] - length + 1, "length": length, "count": self.occ[s]}
+
+
+def z_function(seq):
+    """z[i] = seq 与 seq[i:] 的最长公共前缀长度（z[0] 记为 n）。"""
+    n = len(seq)
+    z = [0] * n
+    if n:
+        z[0] = n
+    left = right = 0
+    for i in range(1, n):
+        if i < right:
+            z[i] = min(right - i, z[i - left])
+        while i + z[i] < n and seq[z[i]] == seq[i + z[i]]:
+            z[i] += 1
+        if i + z[i] > right:
+            left, right = i, i + z[i]
+    return z
+
+
+def tail_loop(seq, min_repeats=LOOP_MIN_REPEATS, max_period=LOOP_MAX_PERIOD):
+    """
+    结尾处的循环：找周期 p，使 seq 的某个后缀以 p 为周期且至少重复 min_repeats 次，
+    取覆盖最长的（同覆盖取最小周期）。对反转序列做 Z 函数：以 p 为周期的最长后缀长度 = p + z[p]。
+    返回 {"start", "period", "repeats", "span"}，没有时返回 None。
+    """
+    n = len(seq)
+    z = z_function(seq[::-1])
+    best_p, best_span = 0, 0
+    for p in range(1, min(max_period, n // min_repeats) + 1):
+        span = p + z[p]
+        if span >= min_repeats * p and span > best_span:
+            best_p, best_span = p, span
+    if not best_p:
+        return None
+    return {"start": n - best_span, "period": best_p, "repeats": best_span / best_p, "span": best_span}
+
+
+def detect_repetition(tokens, min_tokens=LOOP_MIN_TOKENS):
+    """
+    单页预测的重复报告（下标都是 token 下标，与错误记录的 pred_index 一致）：
+    {
+      "n_tokens", "is_loop",
+      "loop": {"start", "period", "repeats", "span", "coverage"} 或 None,
+      "longest_repeat": {"start", "length", "count"} 或 None,
+      "most_frequent_repeat": {...} 或 None,
+    }
+    """
+    ids = {}
+    seq = [ids.setdefault(t, len(ids)) for t in tokens]
+    n = len(seq)
+    loop = tail_loop(seq) if n else None
+    if loop is not None:
+        loop["coverage"] = loop["span"] / n
+    sam = SuffixAutomaton(seq)
+    return {
+        "n_tokens": n,
+        "is_loop": loop is not None and loop["span"] >= min_tokens,
+        "loop": loop,
+        "longest_repeat": sam.longest_repeat(),
+        "most_frequent_repeat": sam.most_frequent_repeat(),
+    }
+
+
+def loop_start(report):
+    """判为循环时返回循环起点（pred token 下标），否则 None。"""
+    if not report or not report["is_loop"]:
+        return None
+    return report["loop"]["start"]
+
+
+def in_loop(rec, start):
+    """错误记录是否落在循环区间里：只看 ins / sub（del 没有 pred 位置）。"""
+    return start is not None and rec["op"] != "del" and rec["pred_index"] is not None \
+        and rec["pred_index"] >= start
+
+
+def repetition_type(rec, t, start):
+    """
+    错误类型的最终值：落在循环区间里的改为 REPETITION_TYPE，其余保持 t。
+    GT 里本来就有的重复会被对齐成 eq，不会产生错误记录，不受影响。
+    """
+    return REPETITION_TYPE if in_loop(rec, start) else t
+
+
+def write_repetition_report(path, mode, reports):
+    """reports: [{"image", **detect_repetition(...)}, ...]，按页顺序。"""
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({
+            "mode": mode,
+            "n_pages": len(reports),
+            "n_loop_pages": sum(r["is_loop"] for r in reports),
+            "pages": reports,
+        }, f, ensure_ascii=False, indent=2)
+
+
+def _brute_force_check(seq):
+    """朴素实现对照：最长重复子串的长度、给定子串的出现次数。"""
+    n = len(seq)
+    subs = {}
+    for i in range(n):
+        for j in range(i + 1, n + 1):
+            subs.setdefault(tuple(seq[i:j]), []).append(i)
+    sam = SuffixAutomaton(seq)
+    rep = [k for k, v in subs.items() if len(v) >= 2]
+    got = sam.longest_repeat()
+    assert (got["length"] if got else 0) == max((len(k) for k in rep), default=0)
+    if got:
+        sub = tuple(seq[got["start"]:got["start"] + got["length"]])
+        assert len(subs[sub]) == got["count"], (sub, got)
+
+
+if __name__ == "__main__":
+    import random
+    import time
+
+    rng = random.Random(0)
+    for _ in range(300):
+        _brute_force_check([rng.choice("ab") for _ in range(rng.randint(0, 30))])
+    print("✅ 后缀自动机与朴素实现一致")
+
+    words = [f"w{k}" for k in range(500)]
+    head = [rng.choice(words) for _ in range(1200)]
+    unit = ["1", "2", "3", "4", "5", "6", "7"]
+    looped = head + unit * 1000 + unit[:3]
+    t0 = time.perf_counter()
+    rep = detect_repetition(looped)
+    dt = time.perf_counter() - t0
+    assert rep["is_loop"] and rep["loop"]["start"] == 1200 and rep["loop"]["period"] == 7, rep["loop"]
+    assert not detect_repetition(head)["is_loop"]
+    print(f"✅ {len(looped)} token 的循环页面 {dt * 1000:.1f}ms：", rep["loop"])
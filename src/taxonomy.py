@@ -1,40 +1,129 @@
 import re
+from functools import lru_cache
 
 NEG_WORDS = {"not", "no", "never", "none", "cannot", "can't", "n't"}
 COMPARATORS = {">", "<", ">=", "<=", "≥", "≤", "≠", "≈", "="}
 
-def guess_type(token: str) -> str:
-    if not token or not token.strip(): return "blank"
-    tok = token.strip()
-    lower = tok.lower()
+# 不按 token 内容判断的类型：预测陷入重复循环时，循环区间里的错误统一归为此类（见 src/repetition.py）
+REPETITION_TYPE = "hallucinated_repetition"
 
+# 数字+单位规则用到的单位库
+_UNITS = r"(%|kg|g|mg|µg|km|m|cm|mm|ml|l|°c|°f|k|hz|khz|mhz|ghz|kb|mb|gb|tb|s|sec|min|hr|usd|eur|cny|aud|cad)"
+
+# 规则表：(类型, 作用对象, 规则)；顺序即优先级，第一条整体匹配的规则决定类型，都不匹配为 word。
+# 作用对象 "tok" 是去掉首尾空白的 token，"lower" 是它的小写。
+# guess_type 逐条判断，classify 用下面合并成的大正则，两者共用这一张表。
+_RULES = [
     # 1. 日期 (增强: 支持 Jan 10, 2023 等)
-    if re.fullmatch(r"\d{4}[-/]\d{1,2}[-/]\d{1,2}", tok) or \
-       re.fullmatch(r"\d{1,2}[-/]\d{1,2}[-/]\d{2,4}", tok) or \
-       re.match(r"^(jan|feb|mar|apr|may|jun|jul|aug|sep|oct|nov|dec)[a-z]*\.?\s+\d{1,2},?\s+\d{4}$", lower):
-        return "date"
-    
+    ("date", "tok", r"\d{4}[-/]\d{1,2}[-/]\d{1,2}"),
+    ("date", "tok", r"\d{1,2}[-/]\d{1,2}[-/]\d{2,4}"),
+    ("date", "lower", r"(?:jan|feb|mar|apr|may|jun|jul|aug|sep|oct|nov|dec)[a-z]*\.?\s+\d{1,2},?\s+\d{4}"),
     # 2. 货币 (严格匹配符号)
-    if re.match(r"^[$£€¥]s?[\d,.]*$", tok) or re.match(r"^[\d,.]*[$£€¥]$", tok):
-        return "money"
-    
+    ("money", "tok", r"[$£€¥]s?[\d,.]*"),
+    ("money", "tok", r"[\d,.]*[$£€¥]"),
     # 3. 数字+单位 (增强单位库)
-    units = r"(%|kg|g|mg|µg|km|m|cm|mm|ml|l|°c|°f|k|hz|khz|mhz|ghz|kb|mb|gb|tb|s|sec|min|hr|usd|eur|cny|aud|cad)"
-    if re.fullmatch(r"-?[\d,.]+\s*" + units, lower):
-        return "number+unit"
-    
+    ("number+unit", "lower", r"-?[\d,.]+\s*" + _UNITS.replace("(", "(?:", 1)),
     # 4. 纯数字 (排除 1.2.3 等版本号)
-    if re.fullmatch(r"-?\$?\d{1,3}(,\d{3})*(\.\d+)?%?", tok) or re.fullmatch(r"\d+", tok):
-        return "number"
-    
-    if lower in NEG_WORDS: return "negation"
-    if tok in COMPARATORS: return "comparator"
-    
+    ("number", "tok", r"-?\$?\d{1,3}(?:,\d{3})*(?:\.\d+)?%?"),
+    ("number", "tok", r"\d+"),
+    ("negation", "lower", "|".join(re.escape(w) for w in sorted(NEG_WORDS))),
+    ("comparator", "tok", "|".join(re.escape(c) for c in sorted(COMPARATORS))),
     # 5. 数学符号 (严格单字符或特定符号，防止单词连字符误判)
-    if re.fullmatch(r"[+×÷=<>≠≤≥≈±^|/]", tok) or (tok == "-" and len(tok) == 1):
-        return "math_symbol"
-    
-    if re.fullmatch(r"[.,;:!?()\[\]\"\"''`{}]+", tok): return "punct"
-    
+    ("math_symbol", "tok", r"[+×÷=<>≠≤≥≈±^|/]|-"),
+    ("punct", "tok", r"[.,;:!?()\[\]\"\"''`{}]+"),
+]
+
+_RULE_RES = [(t, side, re.compile(pat)) for t, side, pat in _RULES]
+
+
+def guess_type(token: str) -> str:
+    """逐条规则判断（参考实现）；批量分类用 classify / classify_many。"""
+    if not token or not token.strip(): return "blank"
+    tok = token.strip()
+    lower = tok.lower()
+    for t, side, rx in _RULE_RES:
+        if rx.fullmatch(tok if side == "tok" else lower):
+            return t
     return "word"
 
+
+# ========== 批量分类：预编译的合并规则 ==========
+# guess_type 对每个 token 依次跑十来个正则。这里把 _RULES 按相同优先级合并成一个带命名组的
+# 大正则，每个 token 只做一次 fullmatch，结果再按 token 记忆化。
+#
+# 有的规则看原始 token（tok），有的看小写（lower），所以匹配对象是 "tok\0lower"：
+#   - 看 tok 的规则写成   (?P<name>规则)\0.*
+#   - 看 lower 的规则写成 [^\0]*\0(?P<name>规则)
+# 各分支按 _RULES 的顺序排列，正则从左到右尝试，第一个能整体匹配的分支就是结果，
+# 因而与 guess_type 逐条判断完全等价。token 里本身带 \0 时退回 guess_type。
+
+
+def _compile_rules(rules):
+    branches = []
+    group_types = {}
+    for k, (t, side, pat) in enumerate(rules):
+        name = f"r{k}"
+        group_types[name] = t
+        if side == "tok":
+            branches.append(f"(?P<{name}>{pat})\0.*")
+        else:
+            branches.append(f"[^\0]*\0(?P<{name}>{pat})")
+    return re.compile("|".join(branches), re.DOTALL), group_types
+
+
+_RULES_RE, _GROUP_TYPES = _compile_rules(_RULES)
+
+# 记忆化的上限（不同 token 数）；错误 token 高度重复，一般远用不满
+CLASSIFY_CACHE_SIZE = 1 << 16
+
+
+@lru_cache(maxsize=CLASSIFY_CACHE_SIZE)
+def classify(token: str) -> str:
+    """与 guess_type 结果相同，但只做一次合并正则匹配，并按 token 缓存。"""
+    if not token or not token.strip(): return "blank"
+    tok = token.strip()
+    if "\0" in tok:
+        return guess_type(token)
+    m = _RULES_RE.fullmatch(tok + "\0" + tok.lower())
+    if m is None:
+        return "word"
+    return _GROUP_TYPES[m.lastgroup]
+
+
+def classify_many(tokens):
+    """批量分类：返回与 tokens 等长的类型列表，等价于 [guess_type(t) for t in tokens]。"""
+    return [classify(t) for t in tokens]
+
+
+def check_classify(tokens, verbose=True):
+    """对照 guess_type 检查 classify_many，返回不一致的 token 列表。"""
+    tokens = list(tokens)
+    bad = [t for t, c in zip(tokens, classify_many(tokens)) if c != guess_type(t)]
+    if verbose:
+        print(f"classify_many vs guess_type: {len(tokens)} 个 token，不一致 {len(bad)} 个")
+    return bad
+
+
+def _random_tokens(n, seed=0):
+    """造一批覆盖各条规则边界的随机 token（数字、货币、单位、日期、符号、大小写混杂）。"""
+    import random
+    rng = random.Random(seed)
+    alphabet = list("0123456789,.-/$£€¥%:;!?()[]\"'`{}+×÷=<>≠≤≥≈±^| \t\nabcdefgkmlsuyKMGSJANFEBİµ°")
+    pieces = ["jan", "Feb", "MAY", "sept", "2023", "10,", "kg", "°C", "MHz", "usd", "n't", "Not",
+              "never", ">=", "≠", "$", "1,234.5", "-", "12/31/99", "2024-1-5", "K", "\u212a"]
+    out = []
+    for _ in range(n):
+        parts = []
+        for _ in range(rng.randint(1, 4)):
+            if rng.random() < 0.5:
+                parts.append(rng.choice(pieces))
+            else:
+                parts.append("".join(rng.choice(alphabet) for _ in range(rng.randint(1, 4))))
+        out.append(rng.choice(["", " "]).join(parts))
+    return out
+
+
+if __name__ == "__main__":
+    bad = check_classify(_random_tokens(50000))
+    assert not bad, bad[:20]
+    print("✅ classify_many 与 guess_type 一致")
@@ -0,0 +1,131 @@
+# GT 文本的 token 数统计（build_fox_subset.py 按 token 数挑页面用）：
+#   - 批量：一次把一批文本送进 fast tokenizer（Rust 端并行），而不是逐条调用；
+#   - 多进程：workers > 1 时每个子进程各加载一份 tokenizer，按批分发；
+#   - 缓存：结果按 (文本哈希, tokenizer 指纹) 存进 DiskCache，GT 不变就不必再跑 tokenizer。
+# tokenizer 指纹直接由模型目录里的 tokenizer 文件算出，不需要先加载 tokenizer，
+# 所以缓存全部命中时整个流程不会加载 transformers。
+
+import glob
+import hashlib
+import os
+
+from src.cache import DiskCache, DEFAULT_CACHE_PATH, text_hash, fingerprint_of
+from src.parallel import imap_pages
+
+# 计数方式变了（比如改成带 special tokens）时手动加一
+TOKEN_COUNT_VERSION = 1
+
+# 每批送进 tokenizer 的文本条数
+TOKENIZE_BATCH = 256
+
+# 决定分词结果的文件；权重等大文件不参与指纹
+_TOKENIZER_FILE_PATTERNS = ("tokenizer*.json", "special_tokens_map.json", "added_tokens.json",
+                            "vocab.*", "merges.txt", "*.model", "*.tiktoken")
+
+
+def tokenizer_fingerprint(model_path):
+    """
+    模型目录：对 tokenizer 相关文件的内容求哈希；
+    不是本地目录（HF hub 名称）时只能用名称本身。
+    """
+    if not os.path.isdir(model_path):
+        return fingerprint_of(TOKEN_COUNT_VERSION, "name", model_path)
+    files = sorted({p for pat in _TOKENIZER_FILE_PATTERNS for p in glob.glob(os.path.join(model_path, pat))})
+    if not files:
+        raise FileNotFoundError(f"{model_path} 里没有 tokenizer 文件")
+    h = hashlib.sha1()
+    for p in files:
+        h.update(os.path.basename(p).encode("utf-8"))
+        with open(p, "rb") as f:
+            h.update(hashlib.sha1(f.read()).digest())
+    return fingerprint_of(TOKEN_COUNT_VERSION, h.hexdigest())
+
+
+def load_tokenizer(model_path):
+    from transformers import AutoTokenizer
+    return AutoTokenizer.from_pretrained(model_path)
+
+
+def count_tokens_batch(tokenizer, texts):
+    """一批文本的 token 数（不加 special tokens，与逐条 tokenizer(t, add_special_tokens=False) 相同）。"""
+    enc = tokenizer(list(texts), add_special_tokens=False)
+    return [len(ids) for ids in enc["input_ids"]]
+
+
+# ----- 多进程：每个子进程第一次用到时加载一份 tokenizer -----
+
+_WORKER_TOKENIZERS = {}
+
+
+def _count_batch_job(job):
+    model_path, texts = job
+    tok = _WORKER_TOKENIZERS.get(model_path)
+    if tok is None:
+        tok = _WORKER_TOKENIZERS[model_path] = load_tokenizer(model_path)
+    return count_tokens_batch(tok, texts)
+
+
+class TokenCounter:
+    """
+    counter = TokenCounter(model_path, batch_size=256, workers=4)
+    counts = counter.count_many(texts)     # 与逐条调用 tokenizer 的结果相同
+    cache=False 时不读写磁盘缓存；tokenizer 只在有未命中的文本时才加载。
+    """
+
+    NAMESPACE = "token_count"
+
+    def __init__(self, model_path, batch_size=TOKENIZE_BATCH, workers=1, cache=True,
+                 cache_path=DEFAULT_CACHE_PATH, memory_items=10000):
+        self.model_path = model_path
+        self.batch_size = batch_size
+        self.workers = workers
+        self.fingerprint = tokenizer_fingerprint(model_path)
+        self.store = DiskCache(self.NAMESPACE, self.fingerprint, path=cache_path,
+                               memory_items=memory_items) if cache else None
+        self.tokenizer = None
+        self.hits = 0
+        self.misses = 0
+
+    def _ensure_tokenizer(self):
+        if self.tokenizer is None:
+            print(f"\n=== 加载 tokenizer: {self.model_path} ===")
+            self.tokenizer = load_tokenizer(self.model_path)
+            print("词表大小 vocab_size:", self.tokenizer.vocab_size)
+        return self.tokenizer
+
+    def _compute(self, texts):
+        batches = [texts[i:i + self.batch_size] for i in range(0, len(texts), self.batch_size)]
+        if self.workers > 1 and len(batches) > 1:
+            jobs = [(self.model_path, b) for b in batches]
+            parts = imap_pages(_count_batch_job, jobs, workers=self.workers, chunksize=1)
+        else:
+            tok = self._ensure_tokenizer()
+            parts = (count_tokens_batch(tok, b) for b in batches)
+        return [n for part in parts for n in part]
+
+    def count_many(self, texts):
+        texts = ["" if t is None else t for t in texts]
+        keys = [text_hash(t) for t in texts]
+        found = self.store.get_many(keys) if self.store is not None else {}
+
+        todo = {}
+        for k, t in zip(keys, texts):
+            if k not in found and k not in todo:
+                todo[k] = t
+        new = dict(zip(todo, self._compute(list(todo.values())))) if todo else {}
+        if self.store is not None:
+            self.store.put_many(new)
+        self.hits += len(texts) - len(new)
+        self.misses += len(new)
+
+        return [found[k] if k in found else new[k] for k in keys]
+
+    def close(self):
+        if self.store is not None:
+            self.store.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,83 @@
+# 语料级 token 驻留表（interning）。对齐、打标签等阶段共用同一套整数 id。
+
+import json
+
+import numpy as np
+
+from src.taxonomy import classify
+
+VOCAB_VERSION = 1
+
+
+class Vocab:
+    """
+    把规范化后的 token 映射成稠密整数 id（按首次出现顺序编号）。
+
+    - encode(): token 列表 -> int32 数组，对齐阶段直接比较整数；
+    - type_of() / type_of_id(): 每个词表条目只分类一次（taxonomy.classify，结果与 guess_type 相同），之后按 id / token 查表即可，
+      不必对每条错误记录重新跑一遍正则；
+    - save() / load(): 与预测文件放在一起，后续脚本直接复用。
+      类型表不落盘，加载后按当前的 taxonomy 规则重新计算，避免规则改了还用旧结果。
+    """
+
+    def __init__(self, tokens=None):
+        self.tokens = []
+        self.ids = {}
+        self._types = []
+        for tok in tokens or []:
+            self.intern(tok)
+
+    def __len__(self):
+        return len(self.tokens)
+
+    def __contains__(self, token):
+        return token in self.ids
+
+    def intern(self, token: str) -> int:
+        idx = self.ids.get(token)
+        if idx is None:
+            idx = len(self.tokens)
+            self.ids[token] = idx
+            self.tokens.append(token)
+            self._types.append(None)
+        return idx
+
+    def encode(self, tokens) -> np.ndarray:
+        intern = self.intern
+        return np.fromiter((intern(t) for t in tokens), dtype=np.int32, count=len(tokens))
+
+    def decode(self, ids):
+        return [self.tokens[i] for i in ids]
+
+    def type_of_id(self, idx: int) -> str:
+        """按 id 取类型；每个条目只在第一次被问到时分类。"""
+        t = self._types[idx]
+        if t is None:
+            t = self._types[idx] = classify(self.tokens[idx])
+        return t
+
+    def type_of(self, token: str) -> str:
+        idx = self.ids.get(token)
+        if idx is None:
+            return classify(token)
+        return self.type_of_id(idx)
+
+    @property
+    def types(self):
+        """与 tokens 一一对应的完整类型表。"""
+        return [self.type_of_id(i) for i in range(len(self.tokens))]
+
+    def save(self, path):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({
+                "version": VOCAB_VERSION,
+                "tokens": self.tokens,
+            }, f, ensure_ascii=False)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        if data.get("version") != VOCAB_VERSION:
+            raise ValueError(f"词表版本不匹配: {data.get('version')} != {VOCAB_VERSION}")
+        return cls(data["tokens"])
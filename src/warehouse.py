@@ -0,0 +1,260 @@
+# 错误仓库：把每页 CER 统计（1_calc_cer / 流水线的 stats_{mode}_pages.json）、带类型的错误
+# （3_tag_errors 的 fox100_errors_{mode}_typed.jsonl）和页面元数据（build_fox_subset 的 n_tokens）
+# 装进一个本地 SQLite 库，建好 image / mode / type / op 索引，跨模式、跨页面的问题直接写 SQL，
+# 不用每次再写脚本重扫 JSONL。（环境里没有 DuckDB，用标准库 sqlite3。）
+#
+#   with open_warehouse(path, exp_dir, ["vt64", "vt100"]) as wh:   # 源文件有变化的自动重新导入
+#       wh.error_stats("vt64")          # 与 4_calc_ker 相同的 ECI / KER
+#       wh.type_counts("vt64")          # 与 5_summ_errors 相同的类型分布
+#       wh.query("SELECT ... FROM errors JOIN pages USING (mode, image) ...")
+
+import json
+import os
+import sqlite3
+
+from src.error_store import open_error_store, RECORD_FIELDS
+from src.metrics import WEIGHTS, CRITICAL_TYPES
+
+WAREHOUSE_VERSION = 1
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS sources (
+    kind TEXT NOT NULL, mode TEXT NOT NULL, path TEXT NOT NULL,
+    size INTEGER NOT NULL, mtime_ns INTEGER NOT NULL,
+    PRIMARY KEY (kind, mode));
+CREATE TABLE IF NOT EXISTS pages (
+    mode TEXT NOT NULL, image TEXT NOT NULL,
+    n_char INTEGER, edit_distance INTEGER, cer REAL,
+    PRIMARY KEY (mode, image));
+CREATE TABLE IF NOT EXISTS errors (
+    id INTEGER PRIMARY KEY,
+    mode TEXT NOT NULL, image TEXT NOT NULL, op TEXT NOT NULL,
+    gt_token TEXT, pred_token TEXT, gt_index INTEGER, pred_index INTEGER,
+    gt_prev TEXT, gt_next TEXT, type TEXT);
+CREATE TABLE IF NOT EXISTS page_meta (image TEXT PRIMARY KEY, n_tokens INTEGER, idx INTEGER);
+CREATE TABLE IF NOT EXISTS weights (type TEXT PRIMARY KEY, weight REAL NOT NULL, critical INTEGER NOT NULL);
+CREATE INDEX IF NOT EXISTS idx_errors_mode_type ON errors (mode, type);
+CREATE INDEX IF NOT EXISTS idx_errors_image ON errors (image, mode, gt_index);
+CREATE INDEX IF NOT EXISTS idx_errors_type ON errors (type);
+CREATE INDEX IF NOT EXISTS idx_errors_op ON errors (op, mode);
+CREATE INDEX IF NOT EXISTS idx_pages_image ON pages (image);
+"""
+
+_TABLES = ("sources", "pages", "errors", "page_meta", "weights")
+
+# 每种源文件导入到哪张表
+_SOURCE_TABLES = {"stats": "pages", "errors": "errors", "page_meta": "page_meta"}
+
+
+class Warehouse:
+    """
+    ingest_*：导入一个源文件（源文件大小 / 修改时间没变就跳过，force=True 强制重导）；
+    drop：源文件没了时删掉它导入过的行，免得查询拿到过期结果；
+    query / error_stats / type_counts / mode_summary：查询接口。
+    """
+
+    def __init__(self, path):
+        self.path = path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.executescript(_SCHEMA)
+        row = self._conn.execute("SELECT value FROM meta WHERE key = 'version'").fetchone()
+        if row is None or int(row["value"]) != WAREHOUSE_VERSION:
+            # 版本不同：表结构可能变了，清空重建
+            for t in _TABLES:
+                self._conn.execute(f"DROP TABLE IF EXISTS {t}")
+            self._conn.executescript(_SCHEMA)
+            self._conn.execute("INSERT OR REPLACE INTO meta VALUES ('version', ?)", (str(WAREHOUSE_VERSION),))
+        self._sync_weights()
+        self._conn.commit()
+
+    def _sync_weights(self):
+        # 权重表每次打开都按当前 metrics 重写，改了 WEIGHTS 不必重导错误
+        self._conn.execute("DELETE FROM weights")
+        self._conn.executemany("INSERT INTO weights VALUES (?, ?, ?)",
+                               [(t, w, int(t in CRITICAL_TYPES)) for t, w in WEIGHTS.items()])
+
+    # ----- 导入 -----
+
+    def _source_state(self, path):
+        st = os.stat(path)
+        return st.st_size, st.st_mtime_ns
+
+    def _is_current(self, kind, mode, path):
+        row = self._conn.execute("SELECT path, size, mtime_ns FROM sources WHERE kind = ? AND mode = ?",
+                                 (kind, mode)).fetchone()
+        return row is not None and row["path"] == os.path.abspath(path) \
+            and (row["size"], row["mtime_ns"]) == self._source_state(path)
+
+    def _mark(self, kind, mode, path):
+        self._conn.execute("INSERT OR REPLACE INTO sources VALUES (?, ?, ?, ?, ?)",
+                           (kind, mode, os.path.abspath(path), *self._source_state(path)))
+
+    def ingest_stats(self, mode, path, force=False):
+        """每页 CER 统计 -> pages。返回是否真的导入了。"""
+        if not force and self._is_current("stats", mode, path):
+            return False
+        with open(path, "r", encoding="utf-8") as f:
+            pages = json.load(f)["pages"]
+        with self._conn:
+            self._conn.execute("DELETE FROM pages WHERE mode = ?", (mode,))
+            self._conn.executemany(
+                "INSERT INTO pages VALUES (?, ?, ?, ?, ?)",
+                [(mode, p["image"], p["n_char"], p["edit_distance"], p["cer"]) for p in pages])
+            self._mark("stats", mode, path)
+        return True
+
+    def ingest_errors(self, mode, typed_path, force=False):
+        """带类型的错误 -> errors（经列式错误库读取，按原顺序编号，id 即首次出现顺序）。"""
+        if not force and self._is_current("errors", mode, typed_path):
+            return False
+        with open_error_store(typed_path) as store:
+            columns = [c for c in RECORD_FIELDS if c != "type" or store.typed]
+            cols = store.load(columns)
+            n = store.n_rows
+        types = cols["type"] if "type" in cols else [None] * n
+        rows = zip([mode] * n, cols["image"], cols["op"], cols["gt_token"], cols["pred_token"],
+                   cols["gt_index"], cols["pred_index"], cols["gt_prev"], cols["gt_next"], types)
+        with self._conn:
+            self._conn.execute("DELETE FROM errors WHERE mode = ?", (mode,))
+            self._conn.executemany(
+                "INSERT INTO errors (mode, image, op, gt_token, pred_token, gt_index, pred_index,"
+                " gt_prev, gt_next, type) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)
+            self._mark("errors", mode, typed_path)
+        return True
+
+    def ingest_page_meta(self, path, force=False):
+        """build_fox_subset 的 selected_pages_raw.json（image, n_tokens, idx）-> page_meta。"""
+        if not force and self._is_current("page_meta", "", path):
+            return False
+        with open(path, "r", encoding="utf-8") as f:
+            pages = json.load(f)
+        with self._conn:
+            self._conn.execute("DELETE FROM page_meta")
+            self._conn.executemany("INSERT INTO page_meta VALUES (?, ?, ?)",
+                                   [(p["image"], p.get("n_tokens"), p.get("idx")) for p in pages])
+            self._mark("page_meta", "", path)
+        return True
+
+    def drop(self, kind, mode):
+        """删掉某个源文件导入的行及其 sources 记录；返回之前是否导入过。"""
+        table = _SOURCE_TABLES[kind]
+        with self._conn:
+            if kind == "page_meta":
+                self._conn.execute("DELETE FROM page_meta")
+            else:
+                self._conn.execute(f"DELETE FROM {table} WHERE mode = ?", (mode,))
+            cur = self._conn.execute("DELETE FROM sources WHERE kind = ? AND mode = ?", (kind, mode))
+        return cur.rowcount > 0
+
+    # ----- 查询 -----
+
+    def query(self, sql, params=()):
+        """执行任意只读 SQL，返回 [dict, ...]。"""
+        return [dict(r) for r in self._conn.execute(sql, params)]
+
+    def modes(self):
+        return [r["mode"] for r in self._conn.execute("SELECT DISTINCT mode FROM errors ORDER BY mode")]
+
+    def count(self, table):
+        return self._conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+
+    def error_stats(self, mode):
+        """与 metrics.compute_stats 相同的 dict；没在权重表里的类型按 1.0、非关键计。"""
+        r = self._conn.execute(
+            "SELECT COUNT(*) AS total_err,"
+            " TOTAL(COALESCE(w.weight, 1.0)) AS total_weight,"
+            " COALESCE(SUM(COALESCE(w.critical, 0)), 0) AS critical_err,"
+            " TOTAL(COALESCE(w.weight, 1.0) * COALESCE(w.critical, 0)) AS critical_weight"
+            " FROM errors e LEFT JOIN weights w ON w.type = COALESCE(e.type, 'word')"
+            " WHERE e.mode = ?", (mode,)).fetchone()
+        return dict(r)
+
+    def type_counts(self, mode):
+        """{type: 条数}，按条数降序，同数按首次出现顺序（与 ErrorStore.value_counts / Counter.most_common 相同）。"""
+        rows = self._conn.execute(
+            "SELECT type, COUNT(*) AS n FROM errors WHERE mode = ?"
+            " GROUP BY type ORDER BY n DESC, MIN(id)", (mode,))
+        return {r["type"]: r["n"] for r in rows}
+
+    def mode_summary(self, mode):
+        """与流水线 ModeWriter.close() 返回的汇总 dict 相同的字段。"""
+        p = self._conn.execute(
+            "SELECT COUNT(*) AS n_pages, TOTAL(n_char) AS chars, TOTAL(edit_distance) AS dist"
+            " FROM pages WHERE mode = ?", (mode,)).fetchone()
+        total_chars, total_dist = int(p["chars"]), int(p["dist"])
+        return {
+            "mode": mode,
+            "n_pages": p["n_pages"],
+            "overall_cer": total_dist / total_chars if total_chars > 0 else 0.0,
+            "total_chars": total_chars,
+            "total_edit_distance": total_dist,
+            **self.error_stats(mode),
+            "type_counts": self.type_counts(mode),
+        }
+
+    def fixed_errors(self, mode_a, mode_b, critical_only=True, min_tokens=None):
+        """
+        mode_a 有、mode_b 在同一页同一 GT 位置没有错误的记录（即 mode_b “修好了”的错误）。
+        min_tokens：只看 GT token 数超过该值的页面（需要已导入 page_meta）。
+        ins 错误没有 GT 位置，不参与比较。
+        """
+        sql = ["SELECT e.* FROM errors e"]
+        if critical_only:
+            sql.append("JOIN weights w ON w.type = e.type AND w.critical = 1")
+        if min_tokens is not None:
+            sql.append("JOIN page_meta m ON m.image = e.image AND m.n_tokens > :min_tokens")
+        sql.append("WHERE e.mode = :a AND e.gt_index IS NOT NULL"
+                   " AND NOT EXISTS (SELECT 1 FROM errors f WHERE f.image = e.image AND f.mode = :b"
+                   " AND f.gt_index = e.gt_index)"
+                   " ORDER BY e.id")
+        return self.query(" ".join(sql), {"a": mode_a, "b": mode_b, "min_tokens": min_tokens})
+
+    def close(self):
+        self._conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def mode_sources(exp_dir, mode):
+    """一个模式在实验目录里的源文件（与 run_pipeline.mode_paths 的命名一致）。"""
+    return {
+        "stats": os.path.join(exp_dir, f"stats_{mode}_pages.json"),
+        "errors": os.path.join(exp_dir, f"fox100_errors_{mode}_typed.jsonl"),
+    }
+
+
+def open_warehouse(path, exp_dir, modes, page_meta_path=None, force=False, verbose=False, require=()):
+    """
+    打开仓库，并把 modes 里源文件有变化（或还没导入）的部分重新导入。
+    源文件不存在时删掉它以前导入的行；require 里列出的源（"stats" / "errors"）不存在则直接报错。
+    """
+    wh = Warehouse(path)
+    jobs = []
+    for mode in modes:
+        src = mode_sources(exp_dir, mode)
+        jobs.append(("stats", wh.ingest_stats, mode, src["stats"]))
+        jobs.append(("errors", wh.ingest_errors, mode, src["errors"]))
+    if page_meta_path is None:
+        page_meta_path = os.path.join(exp_dir, "selected_pages_raw.json")
+    jobs.append(("page_meta", lambda _, p, force: wh.ingest_page_meta(p, force=force), "", page_meta_path))
+
+    try:
+        for kind, ingest, mode, src_path in jobs:
+            if not os.path.exists(src_path):
+                if kind in require:
+                    raise FileNotFoundError(f"找不到 {src_path}（{mode} 的 {kind} 源文件）")
+                if wh.drop(kind, mode) and verbose:
+                    print(f"  ⚠ {os.path.basename(src_path)} 不存在，已删除之前导入的行")
+            elif ingest(mode, src_path, force=force) and verbose:
+                print(f"  导入 {os.path.basename(src_path)}")
+    except BaseException:
+        wh.close()
+        raise
+    return wh
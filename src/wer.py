@@ -0,0 +1,57 @@
+# 词错误率（WER）。分词与 2_align_errors 相同（规范化后按空白切分，见 src.errors.split_words），
+# 两侧 token 先编码成整数 id（与对齐共用 alignment.encode_tokens / Vocab），再交给 src.edit_distance
+# 的后端算词级编辑距离：位并行后端的匹配位表按 id 建，每个 token 只哈希一次，比逐格比较字符串的 DP 快两个数量级。
+
+import random
+
+from src.errors import split_words
+from src.alignment import encode_tokens
+from src.normalization import item_norm
+from src.edit_distance import get_backend, levenshtein_distance, BACKENDS, DEFAULT_BACKEND
+from src.page_eval import PageMetric
+
+
+def word_edit_distance(gt_tokens, pred_tokens, backend=DEFAULT_BACKEND, vocab=None) -> int:
+    """传入 vocab 时用语料级 id（与 errors.align_page 相同），否则按页编码。"""
+    if vocab is not None:
+        a, b = vocab.encode(gt_tokens), vocab.encode(pred_tokens)
+    else:
+        a, b = encode_tokens(gt_tokens, pred_tokens)
+    # 后端逐个取元素查位表，Python int 比 numpy 标量快
+    return get_backend(backend)(a.tolist(), b.tolist())
+
+
+def page_wer_value(item, backend=DEFAULT_BACKEND):
+    """单页 WER；与 1_calc_cer.page_cer_value 同样不含 image，可以直接放进逐页结果缓存。"""
+    gt_tokens = split_words(item_norm(item, "gt"))
+    pred_tokens = split_words(item_norm(item, "pred"))
+    dist = word_edit_distance(gt_tokens, pred_tokens, backend=backend)
+    n_word = len(gt_tokens)
+    return {
+        "n_word": n_word,
+        "edit_distance": dist,
+        "wer": dist / n_word if n_word > 0 else 0.0,
+    }
+
+
+WER_METRIC = PageMetric("wer", page_wer_value, count_key="n_word", total_key="total_words", unit="词",
+                        label=" WER")
+
+
+def check_word_backends(n_trials=500, seed=0):
+    """在随机 token 序列上确认各后端的词级距离与参考 DP 相同（含跨 64 位的长度）。"""
+    rng = random.Random(seed)
+    for trial in range(n_trials):
+        vocab = [f"w{k}" for k in range(rng.choice([2, 10, 500]))]
+        a = [rng.choice(vocab) for _ in range(rng.randint(0, 150))]
+        b = [t for t in a if rng.random() > 0.1] + [rng.choice(vocab) for _ in range(rng.randint(0, 5))]
+        expected = levenshtein_distance(a, b)
+        for name in BACKENDS:
+            got = word_edit_distance(a, b, backend=name)
+            assert got == expected, f"[{name}] trial {trial}: {got} != {expected}"
+    return n_trials
+
+
+if __name__ == "__main__":
+    n = check_word_backends()
+    print(f"✅ 各后端的词级编辑距离与参考 DP 在 {n} 组随机输入上一致")